@@ -25,7 +25,7 @@ except FileNotFoundError:
     REQUIRED = []
 
 # What packages are optional?
-EXTRAS = {"test": ["pytest", "pytest-cov"]}
+EXTRAS = {"test": ["pytest", "pytest-cov"], "parquet": ["pyarrow"]}
 
 
 def get_version():
@@ -5,11 +5,15 @@ from .datasets import (
     fetch_criteo, fetch_hillstrom,
     fetch_megafon
 )
+from .features import fetch_x5_client_features
+from .synthetic import make_uplift_classification, make_uplift_regression
 
 __all__ = [
     'get_data_dir',
     'clear_data_dir',
     'fetch_x5', 'fetch_lenta',
     'fetch_criteo', 'fetch_hillstrom',
-    'fetch_megafon'
+    'fetch_megafon',
+    'fetch_x5_client_features',
+    'make_uplift_classification', 'make_uplift_regression'
 ]
\ No newline at end of file
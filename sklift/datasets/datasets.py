@@ -1,7 +1,15 @@
+import glob
 import hashlib
+import json
 import os
 import shutil
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 import requests
 from sklearn.utils import Bunch
@@ -27,32 +35,198 @@ def _create_data_dir(path):
     Args:
         path (str): The path to scikit-uplift data dir.
     """
-    if not os.path.isdir(path):
-        os.makedirs(path)
+    os.makedirs(path, exist_ok=True)
 
 
-def _download(url, dest_path, content_length_header_key='Content-Length', desc=None):
+class _RangeNotSupported(Exception):
+    """The server replied to a Range request with the whole file."""
+
+
+def _is_retryable(error):
+    """Connection errors, timeouts, truncated responses and server errors are retried."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError))
+
+
+def _with_retries(func, max_retries, backoff_factor):
+    """Call ``func``, retrying the retryable errors with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return func()
+        except requests.RequestException as e:
+            if attempt == max_retries or not _is_retryable(e):
+                raise
+        time.sleep(backoff_factor * 2 ** attempt)
+
+
+def _request(method, url, headers, timeout):
+    req = requests.request(method, url, headers=headers, stream=True, timeout=timeout, allow_redirects=True)
+    try:
+        req.raise_for_status()
+    except requests.HTTPError:
+        req.close()
+        raise
+    return req
+
+
+class _RangedDownload:
+    """Download of a file in byte ranges, which may be resumed after an interruption.
+
+    The ranges are written into the ``.part`` file at their offsets. Every range flushes its data and records
+    the number of written bytes in the ``.part.json`` state file every ``checkpoint_size`` bytes and when
+    interrupted, so a later download continues from the last checkpoint.
+    """
+
+    def __init__(self, url, part_path, total_size, n_segments, progress_bar):
+        self.url = url
+        self.part_path = part_path
+        self.state_path = part_path + '.json'
+        self.total_size = total_size
+        self.progress_bar = progress_bar
+        self._lock = threading.Lock()
+
+        bounds = np.linspace(0, total_size, max(1, min(n_segments, total_size)) + 1).astype(np.int64)
+        self.segments = [[int(start), int(end), 0] for start, end in zip(bounds[:-1], bounds[1:])]
+        state = self._read_state()
+        resumable = os.path.isfile(part_path) and os.path.getsize(part_path) == total_size and \
+            state.get('url') == url and state.get('total_size') == total_size
+        if resumable:
+            self.segments = state['segments']
+        else:
+            with open(part_path, 'wb') as fd:
+                fd.truncate(total_size)
+        progress_bar.update(sum(done for _, _, done in self.segments))
+
+    def _read_state(self):
+        try:
+            with open(self.state_path) as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _checkpoint(self, segment, done):
+        """Record the flushed bytes of the segment in the state file."""
+        with self._lock:
+            segment[2] = done
+            with open(self.state_path, 'w') as state_file:
+                json.dump({'url': self.url, 'total_size': self.total_size, 'segments': self.segments},
+                          state_file)
+
+    def _fetch_rest(self, segment, chunk_size, checkpoint_size, timeout):
+        start, end, done = segment
+        if start + done >= end:
+            return
+        req = _request('GET', self.url, {'Range': f'bytes={start + done}-{end - 1}'}, timeout)
+        if req.status_code != 206:
+            req.close()
+            raise _RangeNotSupported(self.url)
+        checkpointed = done
+        with req, open(self.part_path, 'r+b') as fd:
+            fd.seek(start + done)
+            try:
+                for chunk in req.iter_content(chunk_size=chunk_size):
+                    chunk = chunk[:end - start - done]
+                    fd.write(chunk)
+                    done += len(chunk)
+                    self.progress_bar.update(len(chunk))
+                    if done - checkpointed >= checkpoint_size:
+                        fd.flush()
+                        self._checkpoint(segment, done)
+                        checkpointed = done
+            finally:
+                fd.flush()
+                self._checkpoint(segment, done)
+        if start + done < end:
+            raise requests.ConnectionError(f"The connection to {self.url} was closed before the end of "
+                                           f"bytes {start}-{end - 1}")
+
+    def fetch_segment(self, idx, chunk_size, checkpoint_size, max_retries, backoff_factor, timeout):
+        """Download the rest of the ``idx``-th range, reconnecting from the last written byte on errors."""
+        _with_retries(lambda: self._fetch_rest(self.segments[idx], chunk_size, checkpoint_size, timeout),
+                      max_retries, backoff_factor)
+
+    def remove_state(self):
+        if os.path.isfile(self.state_path):
+            os.remove(self.state_path)
+
+
+def _probe(url, content_length_header_key, max_retries, backoff_factor, timeout):
+    """Return the size of the file and whether the server accepts Range requests, (0, False) if unknown."""
+    try:
+        with _with_retries(lambda: _request('HEAD', url, {}, timeout), max_retries, backoff_factor) as head:
+            total_size = int(head.headers.get(content_length_header_key, 0))
+            accepts_ranges = head.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    except (requests.RequestException, ValueError):
+        return 0, False
+    return total_size, accepts_ranges and total_size > 0
+
+
+def _download_sequential(url, part_path, content_length_header_key, progress_bar, chunk_size, timeout):
+    """Download the whole file with a single GET request."""
+    with _request('GET', url, {}, timeout) as req, open(part_path, 'wb') as fd:
+        total_size = int(req.headers.get(content_length_header_key, 0))
+        progress_bar.reset(total=total_size or None)
+        for chunk in req.iter_content(chunk_size=chunk_size):
+            progress_bar.update(len(chunk))
+            fd.write(chunk)
+    if total_size and os.path.getsize(part_path) != total_size:
+        raise requests.ConnectionError(f"The connection to {url} was closed before the end of the file")
+
+
+def _download(url, dest_path, content_length_header_key='Content-Length', desc=None, n_segments=4,
+              max_retries=5, backoff_factor=0.5, chunk_size=2 ** 20, checkpoint_size=2 ** 24, timeout=60):
     """Download the file from url and save it locally.
 
+    If the server supports HTTP Range requests, the file is downloaded in ``n_segments`` byte ranges in parallel,
+    and an interrupted download is resumed by the next call. Otherwise, e.g. if the server rejects the HEAD request
+    or ignores the Range header, the file is downloaded with a single GET request. The data is written to
+    ``dest_path + '.part'`` and moved to ``dest_path`` once complete, so an interrupted download never leaves
+    a partial file at ``dest_path``. Connection errors and server errors are retried with exponential backoff.
+
     Args:
         url (str): URL address, must be a string.
         dest_path (str): Destination of the file.
         content_length_header_key (str): The key in the HTTP response headers that lists the response size in bytes.
             Used for progress bar.
+        desc (str): The description of the progress bar.
+        n_segments (int): The number of byte ranges downloaded in parallel.
+        max_retries (int): The number of retries of every request.
+        backoff_factor (float): The delay before the i-th retry is ``backoff_factor * 2 ** i`` seconds.
+        chunk_size (int): The number of bytes written at once.
+        checkpoint_size (int): The number of bytes of a range written between records of its progress.
+        timeout (float): Timeout of the connection and of the reading in seconds.
     """
-    if isinstance(url, str):
-        req = requests.get(url, stream=True)
-        req.raise_for_status()
-
-        with open(dest_path, "wb") as fd:
-            total_size_in_bytes = int(req.headers.get(content_length_header_key, 0))
-            progress_bar = tqdm(desc=desc, total=total_size_in_bytes, unit='iB', unit_scale=True)
-            for chunk in req.iter_content(chunk_size=2 ** 20):
-                progress_bar.update(len(chunk))
-                fd.write(chunk)
-    else:
+    if not isinstance(url, str):
         raise TypeError("URL must be a string")
 
+    part_path = dest_path + '.part'
+    total_size, accepts_ranges = _probe(url, content_length_header_key, max_retries, backoff_factor, timeout)
+
+    with tqdm(desc=desc, total=total_size, unit='iB', unit_scale=True) as progress_bar:
+        if accepts_ranges:
+            download = _RangedDownload(url, part_path, total_size, n_segments, progress_bar)
+            try:
+                with ThreadPoolExecutor(max_workers=len(download.segments)) as executor:
+                    futures = [
+                        executor.submit(download.fetch_segment, idx, chunk_size, checkpoint_size, max_retries,
+                                        backoff_factor, timeout)
+                        for idx in range(len(download.segments))
+                    ]
+                    for future in futures:
+                        future.result()
+            except _RangeNotSupported:
+                accepts_ranges = False
+            download.remove_state()
+        if not accepts_ranges:
+            # without Range support an interrupted download restarts from the beginning
+            _with_retries(
+                lambda: _download_sequential(url, part_path, content_length_header_key, progress_bar, chunk_size,
+                                             timeout),
+                max_retries, backoff_factor
+            )
+    os.replace(part_path, dest_path)
+
 
 def _get_data(data_home, url, dest_subdir, dest_filename, download_if_missing,
               content_length_header_key='Content-Length', desc=None):
@@ -94,15 +268,374 @@ def _get_data(data_home, url, dest_subdir, dest_filename, download_if_missing,
     return dest_path
 
 
-def _get_file_hash(path):
+_MANIFEST_FILENAME = 'manifest.json'
+_manifest_lock = threading.Lock()
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def _update_manifest(manifest_path, filename, entry):
+    """Record the entry of the file in the manifest, replacing the manifest atomically."""
+    with _manifest_lock:
+        manifest = _read_manifest(manifest_path)
+        manifest[filename] = entry
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+            os.replace(tmp_path, manifest_path)
+        except OSError as e:
+            warnings.warn(f"Failed to update the manifest {manifest_path}: {e}")
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
+
+def _get_file_hash(path, chunk_size=2 ** 20, use_manifest=True):
     """Сompute the hash value for a file by using md5 algorithm.
 
+    The file is read in chunks of ``chunk_size`` bytes. The hash is recorded in the ``manifest.json`` file next to
+    the file together with its size and modification time, and the recorded hash is returned while they are
+    unchanged, so the file is not read again.
+
         Args:
             path (str): The path to file
+            chunk_size (int): The number of bytes read at once.
+            use_manifest (bool): Whether to trust and update the manifest.
+
+        Returns:
+            string: md5 hash of the file.
     """
+    stat = os.stat(path)
+    manifest_path = os.path.join(os.path.dirname(os.path.abspath(path)), _MANIFEST_FILENAME)
+    filename = os.path.basename(path)
+    if use_manifest:
+        entry = _read_manifest(manifest_path).get(filename)
+        if isinstance(entry, dict) and entry.get('size') == stat.st_size and \
+                entry.get('mtime_ns') == stat.st_mtime_ns and 'md5' in entry:
+            return entry['md5']
+
+    md5 = hashlib.md5()
     with open(path, 'rb') as file_to_check:
-        data = file_to_check.read()    
-        return hashlib.md5(data).hexdigest()
+        for chunk in iter(lambda: file_to_check.read(chunk_size), b''):
+            md5.update(chunk)
+    file_hash = md5.hexdigest()
+
+    if use_manifest:
+        _update_manifest(manifest_path, filename,
+                         {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'md5': file_hash})
+    return file_hash
+
+
+def _parquet_engine_available():
+    """Check if pandas can read and write Parquet files."""
+    for engine in ('pyarrow', 'fastparquet'):
+        try:
+            __import__(engine)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+def _columnar_cache_path(csv_path, file_hash, read_params):
+    """Return the path of the columnar copy of the file, keyed by the hash of the source and the parsing options."""
+    params_key = hashlib.md5(repr(sorted(read_params.items())).encode()).hexdigest()
+    return f"{_strip_csv_ext(csv_path)}.{file_hash}.{params_key}.parquet"
+
+
+def _remove_stale_copies(csv_path, file_hash, ext, remove):
+    """Remove the copies of the file with the extension, which were made from another version of the file.
+
+    Copies of the same version made with other parsing options are kept.
+    """
+    prefix = _strip_csv_ext(csv_path) + '.'
+    for path in glob.glob(glob.escape(prefix) + '*' + ext):
+        if path[len(prefix):-len(ext)].split('.')[0] != file_hash:
+            remove(path)
+
+
+def _strip_csv_ext(path):
+    for ext in ('.csv.gz', '.csv'):
+        if path.endswith(ext):
+            return path[:-len(ext)]
+    return path
+
+
+def _hash_sample_mask(keys, sample_frac, random_state):
+    """Select rows by a seeded hash of their keys, so the same rows are selected on every call.
+
+    Args:
+        keys (1d array-like): Row keys, e.g. row numbers or customer ids.
+        sample_frac (float): The expected fraction of selected rows.
+        random_state (int): Seed of the hash.
+
+    Returns:
+        array (shape (n_rows,)): boolean mask of selected rows.
+    """
+    # the keys are hashed again together with the seed, since numeric keys are hashed without a hash key
+    hashes = pd.util.hash_array(pd.util.hash_array(np.asarray(keys)) ^ np.uint64(random_state))
+    # the 53 highest bits of the hash give a uniform number in [0, 1)
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2. ** -53 < sample_frac
+
+
+def _select_rows(data, nrows=None, sample_frac=None, random_state=0, sample_key=None, keys=None):
+    """Keep the first ``nrows`` rows of the data, then the rows selected by :func:`_hash_sample_mask`.
+
+    The rows are identified by ``sample_key`` column or, if None, by their position in the file,
+    i.e. the index of the data. If ``keys`` are given, only the rows with these ``sample_key`` values are kept.
+    """
+    if nrows is not None:
+        data = data.iloc[:nrows]
+    if keys is not None:
+        data = data[data[sample_key].isin(keys)]
+    if sample_frac is not None:
+        keys = data.index if sample_key is None else data[sample_key]
+        data = data[_hash_sample_mask(keys, sample_frac, random_state)]
+    return data
+
+
+def _check_selection(columns=None, nrows=None, sample_frac=None, random_state=0):
+    if columns is not None and (isinstance(columns, str) or not all(isinstance(col, str) for col in columns)):
+        raise ValueError(f"The columns must be a list of column names. Got value columns={columns}.")
+    if nrows is not None and (isinstance(nrows, bool) or not isinstance(nrows, int) or nrows <= 0):
+        raise ValueError(f"The nrows must be a positive integer. Got value nrows={nrows}.")
+    if sample_frac is not None and not (isinstance(sample_frac, (int, float)) and 0 < sample_frac <= 1):
+        raise ValueError(f"The sample_frac must be in range (0, 1]. Got value sample_frac={sample_frac}.")
+    if isinstance(random_state, bool) or not isinstance(random_state, int) or random_state < 0:
+        raise ValueError(f"The random_state must be a non-negative integer. Got value random_state={random_state}.")
+
+
+def _usecols(columns, label_cols):
+    """Return the columns to parse: the selected features together with all target and treatment columns."""
+    if columns is None:
+        return None
+    return list(label_cols) + [col for col in columns if col not in label_cols]
+
+
+def _read_csv(csv_path, file_hash, columnar_cache=True, usecols=None, nrows=None, sample_frac=None,
+              random_state=0, sample_key=None, keys=None, **read_params):
+    """Read the dataset file into a DataFrame.
+
+    On the first call a typed Parquet copy of the data is written next to the file, later calls read the copy
+    instead of parsing the compressed csv. The copy is keyed by the hash of the source file and the parsing
+    options, so it is rebuilt when any of them changes. Copies made with other parsing options are kept, copies
+    of other versions of the file are removed. Writing the copy requires pyarrow or fastparquet, which are
+    optional dependencies (``pip install scikit-uplift[parquet]``): without them the cache is silently skipped
+    and the csv is parsed on every call.
+
+    Columns and rows are selected while parsing: only ``usecols`` are parsed, at most ``nrows`` rows are read
+    and the sampled rows are selected chunk by chunk, so the whole file is never held in memory. The copy is
+    written by full reads only, and read with column projection once it exists. Reads of the first ``nrows``
+    rows parse only these rows of the csv and do not use the copy.
+
+    Args:
+        csv_path (str): The path to the csv file.
+        file_hash (str): md5 hash of the csv file.
+        columnar_cache (bool): Whether to use the columnar copy. Ignored if neither pyarrow nor fastparquet
+            is installed.
+        usecols (list, optional): Columns to read.
+        nrows (int, optional): The number of rows to read from the beginning of the file.
+        sample_frac (float, optional): The fraction of rows selected by a seeded hash.
+        random_state (int): Seed of the hash.
+        sample_key (str, optional): The column identifying the sampled rows, the row number if None.
+        keys (array-like, optional): If set, only the rows with these values of ``sample_key`` column are read.
+        **read_params: Parameters passed to :func:`pandas.read_csv`.
+
+    Returns:
+        DataFrame: data.
+    """
+    use_cache = columnar_cache and _parquet_engine_available()
+    cache_path = _columnar_cache_path(csv_path, file_hash, read_params)
+    if use_cache and nrows is None and os.path.isfile(cache_path):
+        data = pd.read_parquet(cache_path, columns=usecols)
+        return _select_rows(data, None, sample_frac, random_state, sample_key, keys)
+
+    if sample_frac is not None or keys is not None:
+        reader = pd.read_csv(csv_path, usecols=usecols, nrows=nrows, chunksize=2 ** 20, **read_params)
+        try:
+            chunks = [_select_rows(chunk, None, sample_frac, random_state, sample_key, keys) for chunk in reader]
+        finally:
+            reader.close()
+        return pd.concat(chunks)
+    if not use_cache or usecols is not None or nrows is not None:
+        return pd.read_csv(csv_path, usecols=usecols, nrows=nrows, **read_params)
+
+    data = pd.read_csv(csv_path, **read_params)
+    _remove_stale_copies(csv_path, file_hash, '.parquet', os.remove)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError, TypeError) as e:
+        warnings.warn(f"Failed to write the columnar copy of {csv_path}: {e}")
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+    return data
+
+
+def _compact_dtypes(data, max_category_ratio=0.5):
+    """Downcast the columns of the DataFrame to compact dtypes.
+
+    Floats are cast to float32, 0/1 integer flags to uint8, other integers to the smallest integer dtype
+    holding their range and string columns with at most ``max_category_ratio`` distinct values per row
+    to category. Nullable extension dtypes are kept.
+
+    Returns:
+        tuple: (compact DataFrame, memory report dict with ``original_bytes``, ``compact_bytes`` and ``ratio``)
+    """
+    original_bytes = int(data.memory_usage(deep=True).sum())
+    dtypes = {}
+    for col, values in data.items():
+        dtype = values.dtype
+        if pd.api.types.is_extension_array_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_float_dtype(dtype):
+            dtypes[col] = np.float32
+        elif pd.api.types.is_integer_dtype(dtype) and len(values):
+            min_value, max_value = values.min(), values.max()
+            if min_value >= 0 and max_value <= 1:
+                dtypes[col] = np.uint8
+            else:
+                dtypes[col] = np.promote_types(np.min_scalar_type(min_value), np.min_scalar_type(max_value))
+        elif dtype == object and values.nunique() <= max(1, max_category_ratio * len(values)):
+            dtypes[col] = 'category'
+
+    data = data.astype(dtypes)
+    compact_bytes = int(data.memory_usage(deep=True).sum())
+    return data, _memory_report(original_bytes, compact_bytes)
+
+
+def _memory_report(original_bytes, compact_bytes):
+    return {
+        'original_bytes': original_bytes,
+        'compact_bytes': compact_bytes,
+        'ratio': original_bytes / compact_bytes if compact_bytes else np.inf,
+    }
+
+
+def _load_memmap(csv_path, file_hash, label_cols, columnar_cache=True, compact=False, **read_params):
+    """Load the dataset as memory-mapped numpy arrays.
+
+    On the first call the features are written as one row-major ``.npy`` matrix and every label column as
+    a separate ``.npy`` vector into a folder next to the csv file. Later calls map these files into memory
+    without reading them, so worker processes loading the same dataset share one copy in the page cache.
+    The folder is keyed by the hash of the source file and the parsing options, folders made from other versions
+    of the file are removed.
+
+    Args:
+        csv_path (str): The path to the csv file.
+        file_hash (str): md5 hash of the csv file.
+        label_cols (list): Names of target and treatment columns stored separately from the features.
+        columnar_cache (bool): Whether to use the columnar copy when converting the data.
+        compact (bool): Whether to store the features as float32.
+        **read_params: Parameters passed to :func:`pandas.read_csv`.
+
+    Returns:
+        tuple: (feature matrix, dict of label vectors by column name, feature names)
+    """
+    store_params = dict(read_params, compact=True) if compact else read_params
+    store_path = _columnar_cache_path(csv_path, file_hash, store_params)[:-len('.parquet')] + '.npy'
+
+    if not os.path.isdir(store_path):
+        data = _read_csv(csv_path, file_hash, columnar_cache, **read_params)
+        # files mapped by earlier calls stay readable after removal on POSIX, and are skipped on Windows
+        _remove_stale_copies(csv_path, file_hash, '.npy', lambda path: shutil.rmtree(path, ignore_errors=True))
+
+        # every writer fills its own folder, processes loading the file at once keep the first complete store
+        tmp_path = tempfile.mkdtemp(prefix=os.path.basename(store_path) + '.', suffix='.tmp',
+                                    dir=os.path.dirname(store_path))
+        try:
+            features = data.drop(label_cols, axis=1)
+            np.save(os.path.join(tmp_path, 'X.npy'),
+                    np.ascontiguousarray(features.to_numpy(dtype=np.float32 if compact else None)))
+            for col in label_cols:
+                if pd.api.types.is_extension_array_dtype(data[col]) and hasattr(data[col].dtype, 'numpy_dtype'):
+                    values = data[col].to_numpy(dtype=data[col].dtype.numpy_dtype)
+                else:
+                    values = data[col].to_numpy()
+                if values.dtype == object:
+                    values = values.astype(str)
+                np.save(os.path.join(tmp_path, f'{col}.npy'), values)
+            with open(os.path.join(tmp_path, 'feature_names.txt'), 'w') as f:
+                f.write('\n'.join(features.columns))
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        try:
+            os.replace(tmp_path, store_path)
+        except OSError:
+            # another process has already stored the data
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(store_path):
+                raise
+
+    X = np.load(os.path.join(store_path, 'X.npy'), mmap_mode='r')
+    labels = {col: np.load(os.path.join(store_path, f'{col}.npy'), mmap_mode='r') for col in label_cols}
+    with open(os.path.join(store_path, 'feature_names.txt')) as f:
+        feature_names = f.read().split('\n')
+    return X, labels, feature_names
+
+
+def _select_labels(labels, cols):
+    """Return a label vector, or a matrix of label columns if several columns are selected."""
+    if isinstance(cols, list):
+        return np.column_stack([labels[col] for col in cols])
+    return labels[cols]
+
+
+def _iter_csv(csv_path, chunksize, target_col, treatment_col, label_cols, compact=False, sample_frac=None,
+              random_state=0, **read_params):
+    """Read the dataset file incrementally and yield (data, target, treatment) batches.
+
+    The dtypes are fixed by the first batch: numeric features are cast to float64 (float32 if ``compact``),
+    so that missing values in later batches do not change the dtypes, and all other columns keep the dtypes
+    of the first batch.
+
+    Args:
+        csv_path (str): The path to the csv file.
+        chunksize (int): The number of rows in a batch.
+        target_col (str or list): Name(s) of the target column(s).
+        treatment_col (str or list): Name(s) of the treatment column(s).
+        label_cols (list): Names of all target and treatment columns dropped from the features.
+        compact (bool): Whether to cast numeric features to float32. Other :func:`_compact_dtypes` rules are not
+            applied, since integer ranges and categories of later batches are not known from the first one.
+        sample_frac (float, optional): The fraction of rows of every batch selected by a seeded hash of row numbers.
+        random_state (int): Seed of the hash.
+        **read_params: Parameters passed to :func:`pandas.read_csv`.
+
+    Yields:
+        tuple: (data, target, treatment) of a batch.
+    """
+    dtypes, float_dtype = None, np.float32 if compact else np.float64
+    reader = pd.read_csv(csv_path, chunksize=chunksize, **read_params)
+    try:
+        for chunk in reader:
+            if dtypes is None:
+                dtypes = {
+                    col: float_dtype if col not in label_cols and pd.api.types.is_numeric_dtype(dtype)
+                    and not pd.api.types.is_bool_dtype(dtype) else dtype
+                    for col, dtype in chunk.dtypes.items()
+                }
+            chunk = _select_rows(chunk.astype(dtypes, copy=False), None, sample_frac, random_state)
+            yield chunk.drop(label_cols, axis=1), chunk[target_col], chunk[treatment_col]
+    finally:
+        reader.close()
+
+
+def _check_chunksize(chunksize, as_memmap=False):
+    if chunksize is not None:
+        if isinstance(chunksize, bool) or not isinstance(chunksize, int) or chunksize <= 0:
+            raise ValueError(f"The chunksize must be a positive integer. Got value chunksize={chunksize}.")
+        if as_memmap:
+            raise ValueError("The chunksize can not be used together with as_memmap=True, "
+                             "slice the memory-mapped arrays instead.")
 
 
 def clear_data_dir(path=None):
@@ -117,7 +650,9 @@ def clear_data_dir(path=None):
         shutil.rmtree(path, ignore_errors=True)
 
 
-def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, return_X_y_t=False):
+def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, return_X_y_t=False,
+                columnar_cache=True, chunksize=None, compact=False, columns=None, nrows=None, sample_frac=None,
+                random_state=0):
     """Load and return the Lenta dataset (classification).
 
     An uplift modeling dataset containing data about Lenta's customers grociery shopping and
@@ -139,6 +674,24 @@ def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, retu
         download_if_missing (bool): Download the data if not present. Raises an IOError if False and data is missing.
         return_X_y_t (bool): If True, returns (data, target, treatment) instead of a Bunch object.
 
+        columnar_cache (bool, default=True): Whether to store a typed Parquet copy of the data next to
+            the downloaded file on the first call and read it on later calls. Requires pyarrow or fastparquet,
+            ignored otherwise.
+        chunksize (int, optional): If set, return an iterator over (data, target, treatment) batches of
+            ``chunksize`` rows read incrementally from the compressed file instead of loading the whole dataset.
+            Numeric features are float64 in every batch.
+        compact (bool, default=False): If True, load floats as float32, 0/1 integer flags as uint8, other integers
+            as the smallest integer dtype and strings with few distinct values as category. The Bunch then has
+            a ``memory_report`` dict with ``original_bytes``, ``compact_bytes`` and their ``ratio``. Together with
+            ``chunksize`` only numeric features are cast to float32 and labels keep their dtypes, since the value
+            ranges and categories of the whole file are not known from one batch.
+        columns (list, optional): Names of the features to load. Only these columns, the target and the treatment
+            are parsed.
+        nrows (int, optional): The number of rows to read from the beginning of the file.
+        sample_frac (float, optional): The fraction of rows to load. The rows are selected by a hash of their
+            number in the file seeded with ``random_state``, so repeated calls return the same rows and the file
+            is never loaded in full.
+        random_state (int, default=0): Seed of the hash used by ``sample_frac``.
     Returns:
         Bunch or tuple: dataset.
 
@@ -156,6 +709,9 @@ def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, retu
         Tuple:
             tuple (data, target, treatment) if `return_X_y_t` is True
 
+        Iterator:
+            iterator over (data, target, treatment) batches if `chunksize` is set
+
     Example::
 
         from sklift.datasets import fetch_lenta
@@ -177,6 +733,9 @@ def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, retu
 
         :func:`.fetch_megafon`: Load and return the MegaFon Uplift Competition dataset (classification).
     """
+    _check_chunksize(chunksize)
+    _check_selection(columns, nrows, sample_frac, random_state)
+
     lenta_metadata = {
         'desc': 'Lenta dataset',
         'url': 'https://sklift.s3.eu-west-2.amazonaws.com/lenta_dataset.csv.gz',
@@ -196,7 +755,15 @@ def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, retu
     target_col = 'response_att'
     treatment_col = 'group'
 
-    data = pd.read_csv(csv_path)
+    label_cols = [target_col, treatment_col]
+    if chunksize is not None:
+        return _iter_csv(csv_path, chunksize, target_col, treatment_col, label_cols, compact, sample_frac,
+                         random_state, usecols=_usecols(columns, label_cols), nrows=nrows)
+
+    data = _read_csv(csv_path, lenta_metadata['hash'], columnar_cache, _usecols(columns, label_cols), nrows,
+                     sample_frac, random_state)
+    if compact:
+        data, memory_report = _compact_dtypes(data)
     treatment, target = data[treatment_col], data[target_col]
 
     data = data.drop([target_col, treatment_col], axis=1)
@@ -209,11 +776,80 @@ def fetch_lenta(data_home=None, dest_subdir=None, download_if_missing=True, retu
     with open(os.path.join(module_path, 'descr', 'lenta.rst')) as rst_file:
         fdescr = rst_file.read()
 
-    return Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
-                 feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    dataset = Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
+                    feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    if compact:
+        dataset.memory_report = memory_report
+    return dataset
+
+
+class _Lazy:
+    """Value of a :class:`_LazyBunch` computed by ``load`` on the first access."""
+
+    def __init__(self, load):
+        self.load = load
+
+    def __repr__(self):
+        return '<not loaded>'
+
+
+class _LazyBunch(Bunch):
+    """Bunch, which loads the values given as :class:`_Lazy` on the first access and keeps them."""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, _Lazy):
+            value = value.load()
+            self[key] = value
+        return value
+
 
+_X5_METADATA = {
+    'desc_train': 'Part 1: X5 train',
+    'desc_clients': 'Part 2: X5 clients',
+    'desc_purchases': 'Part 3: X5 purchases',
+    'url_train': 'https://sklift.s3.eu-west-2.amazonaws.com/uplift_train.csv.gz',
+    'url_clients': 'https://sklift.s3.eu-west-2.amazonaws.com/clients.csv.gz',
+    'url_purchases': 'https://sklift.s3.eu-west-2.amazonaws.com/purchases.csv.gz',
+    'hash_train': '2720bbb659daa9e0989b2777b6a42d19',
+    'hash_clients': 'b9cdeb2806b732771de03e819b3354c5',
+    'hash_purchases': '48d2de13428e24e8b61d66fef02957a8'
+}
 
-def fetch_x5(data_home=None, dest_subdir=None, download_if_missing=True):
+
+def _fetch_file(url, file_hash, desc, data_home, dest_subdir, download_if_missing):
+    """Download the file of a dataset if missing and check its hash.
+
+    Returns:
+        string: The path to the file.
+    """
+    filename = url.split('/')[-1]
+    csv_path = _get_data(data_home=data_home, url=url, dest_subdir=dest_subdir, dest_filename=filename,
+                         download_if_missing=download_if_missing, desc=desc)
+
+    if _get_file_hash(csv_path) != file_hash:
+        raise ValueError(f"The {filename} file is broken, please clean the directory "
+                         f"with the clean_data_dir() function, and run the function again")
+    return csv_path
+
+
+def _fetch_table(url, file_hash, desc, data_home, dest_subdir, download_if_missing, columnar_cache=True,
+                 compact=False, usecols=None, **select_rows):
+    """Download, check and read one file of a dataset.
+
+    Returns:
+        tuple: (data, memory report), the report is None if not compact.
+    """
+    csv_path = _fetch_file(url, file_hash, desc, data_home, dest_subdir, download_if_missing)
+    data = _read_csv(csv_path, file_hash, columnar_cache, usecols, **select_rows)
+    memory_report = None
+    if compact:
+        data, memory_report = _compact_dtypes(data)
+    return data, memory_report
+
+
+def fetch_x5(data_home=None, dest_subdir=None, download_if_missing=True, columnar_cache=True, compact=False,
+             columns=None, nrows=None, sample_frac=None, random_state=0, lazy_purchases=False):
     """Load and return the X5 RetailHero dataset (classification).
 
     The dataset contains raw retail customer purchases, raw information about products and general info about customers.
@@ -224,6 +860,8 @@ def fetch_x5(data_home=None, dest_subdir=None, download_if_missing=True):
     - ``target`` (binary): target
     - ``customer_id`` (str): customer id - primary key for joining
 
+    The three tables are downloaded, checked and parsed concurrently.
+
     Read more in the :ref:`docs <X5>`.
 
     Args:
@@ -231,6 +869,24 @@ def fetch_x5(data_home=None, dest_subdir=None, download_if_missing=True):
         dest_subdir (str, unicode): The name of the folder in which the dataset is stored.
         download_if_missing (bool): Download the data if not present. Raises an IOError if False and data is missing
 
+        columnar_cache (bool, default=True): Whether to store a typed Parquet copy of the data next to
+            the downloaded file on the first call and read it on later calls. Requires pyarrow or fastparquet,
+            ignored otherwise.
+        compact (bool, default=False): If True, load floats as float32, 0/1 integer flags as uint8, other integers
+            as the smallest integer dtype and strings with few distinct values as category. The Bunch then has
+            a ``memory_report`` dict with ``original_bytes``, ``compact_bytes`` and their ``ratio``.
+        columns (dict, optional): Names of the columns to load by table name, e.g.
+            ``{'purchases': ['client_id', 'purchase_sum']}``. ``client_id``, target and treatment columns are always
+            loaded.
+        nrows (int, optional): The number of rows to read from the beginning of the train table. The clients and
+            purchases tables are filtered to the clients of these rows, which reads them in full.
+        sample_frac (float, optional): The fraction of clients to load. The clients are selected by a hash of
+            ``client_id`` seeded with ``random_state``, so train, clients and purchases tables stay consistent and
+            repeated calls return the same clients.
+        random_state (int, default=0): Seed of the hash used by ``sample_frac``.
+        lazy_purchases (bool, default=False): If True, the purchases table, the largest one, is downloaded and
+            parsed on the first access to ``data.purchases`` or ``feature_names.purchases_features``.
+            ``memory_report`` then covers train and clients tables only.
     Returns:
         Bunch: dataset.
 
@@ -279,77 +935,68 @@ def fetch_x5(data_home=None, dest_subdir=None, download_if_missing=True):
 
         :func:`.fetch_megafon`: Load and return the MegaFon Uplift Competition dataset (classification).
     """
-    x5_metadata = {
-        'desc_train': 'Part 1: X5 train',
-        'desc_clients': 'Part 2: X5 clients',
-        'desc_purchases': 'Part 3: X5 purchases',
-        'url_train': 'https://sklift.s3.eu-west-2.amazonaws.com/uplift_train.csv.gz',
-        'url_clients': 'https://sklift.s3.eu-west-2.amazonaws.com/clients.csv.gz',
-        'url_purchases': 'https://sklift.s3.eu-west-2.amazonaws.com/purchases.csv.gz',
-        'hash_train': '2720bbb659daa9e0989b2777b6a42d19',
-        'hash_clients': 'b9cdeb2806b732771de03e819b3354c5',
-        'hash_purchases': '48d2de13428e24e8b61d66fef02957a8'
-    }
-    file_train = x5_metadata['url_train'].split('/')[-1]
-    csv_train_path = _get_data(data_home=data_home, url=x5_metadata['url_train'], dest_subdir=dest_subdir,
-                               dest_filename=file_train,
-                               download_if_missing=download_if_missing,
-                               desc=x5_metadata['desc_train'])
-
-    if _get_file_hash(csv_train_path) != x5_metadata['hash_train']:
-        raise ValueError(f"The {file_train} file is broken, please clean the directory "
-                         f"with the clean_data_dir() function, and run the function again")
-
-    train = pd.read_csv(csv_train_path)
-    train_features = list(train.columns)
-
+    _check_selection(None, nrows, sample_frac, random_state)
+    if columns is None:
+        columns = {}
+    elif not isinstance(columns, dict) or not set(columns) <= {'train', 'clients', 'purchases'}:
+        raise ValueError(f"The columns must be a dict with 'train', 'clients' or 'purchases' keys. "
+                         f"Got value columns={columns}.")
+    for table_columns in columns.values():
+        _check_selection(table_columns)
+
+    select_rows = dict(sample_frac=sample_frac, random_state=random_state, sample_key='client_id')
+    label_cols = {'train': ['client_id', 'target', 'treatment_flg'], 'clients': ['client_id'],
+                  'purchases': ['client_id']}
+
+    def fetch_table(name, **table_rows):
+        return _fetch_table(_X5_METADATA[f'url_{name}'], _X5_METADATA[f'hash_{name}'],
+                            _X5_METADATA[f'desc_{name}'], data_home, dest_subdir, download_if_missing,
+                            columnar_cache, compact, _usecols(columns.get(name), label_cols[name]), **table_rows)
+
+    names = ['train', 'clients'] if lazy_purchases else ['train', 'clients', 'purchases']
+    tables = {}
+    if nrows is not None:
+        # the other tables are joined with the first rows of train by client
+        tables['train'] = fetch_table('train', nrows=nrows, **select_rows)
+        select_rows = dict(sample_key='client_id', keys=tables['train'][0]['client_id'].unique())
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {name: executor.submit(fetch_table, name, **select_rows) for name in names if name not in tables}
+        tables.update((name, future.result()) for name, future in futures.items())
+    tables = {name: tables[name] for name in names}
+
+    train, clients = tables['train'][0], tables['clients'][0]
     target_col = 'target'
     treatment_col = 'treatment_flg'
 
     treatment, target = train[treatment_col], train[target_col]
-
+    train_features = list(train.columns)
     train = train.drop([target_col, treatment_col], axis=1)
 
-    file_clients = x5_metadata['url_clients'].split('/')[-1]
-    csv_clients_path = _get_data(data_home=data_home, url=x5_metadata['url_clients'], dest_subdir=dest_subdir,
-                                 dest_filename=file_clients,
-                                 download_if_missing=download_if_missing,
-                                 desc=x5_metadata['desc_clients'])
-
-    if _get_file_hash(csv_clients_path) != x5_metadata['hash_clients']:
-        raise ValueError(f"The {file_clients} file is broken, please clean the directory "
-                         f"with the clean_data_dir() function, and run the function again")
-
-    clients = pd.read_csv(csv_clients_path)
-    clients_features = list(clients.columns)
-
-    file_purchases = x5_metadata['url_purchases'].split('/')[-1]
-    csv_purchases_path = _get_data(data_home=data_home, url=x5_metadata['url_purchases'], dest_subdir=dest_subdir,
-                                   dest_filename=file_purchases,
-                                   download_if_missing=download_if_missing,
-                                   desc=x5_metadata['desc_purchases'])
-
-    if _get_file_hash(csv_purchases_path) != x5_metadata['hash_purchases']:
-        raise ValueError(f"The {file_purchases} file is broken, please clean the directory "
-                         f"with the clean_data_dir() function, and run the function again")
-             
-    purchases = pd.read_csv(csv_purchases_path)
-    purchases_features = list(purchases.columns)
-
-    data = Bunch(clients=clients, train=train, purchases=purchases)
-    feature_names = Bunch(train_features=train_features, clients_features=clients_features,
-                          purchases_features=purchases_features)
+    data = _LazyBunch(clients=clients, train=train)
+    if lazy_purchases:
+        data.purchases = _Lazy(lambda: fetch_table('purchases', **select_rows)[0])
+    else:
+        data.purchases = tables['purchases'][0]
+    feature_names = _LazyBunch(train_features=train_features, clients_features=list(clients.columns),
+                               purchases_features=_Lazy(lambda: list(data.purchases.columns)))
 
     module_path = os.path.dirname(__file__)
     with open(os.path.join(module_path, 'descr', 'x5.rst')) as rst_file:
         fdescr = rst_file.read()
 
-    return Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
-                 feature_names=feature_names, target_name='target', treatment_name='treatment_flg')
+    dataset = Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
+                    feature_names=feature_names, target_name='target', treatment_name='treatment_flg')
+    if compact:
+        reports = [report for _, report in tables.values()]
+        dataset.memory_report = _memory_report(sum(report['original_bytes'] for report in reports),
+                                               sum(report['compact_bytes'] for report in reports))
+    return dataset
 
 
 def fetch_criteo(target_col='visit', treatment_col='treatment', data_home=None, dest_subdir=None,
-                 download_if_missing=True, percent10=False, return_X_y_t=False):
+                 download_if_missing=True, percent10=False, return_X_y_t=False, columnar_cache=True,
+                 as_memmap=False, chunksize=None, compact=False, columns=None, nrows=None, sample_frac=None,
+                 random_state=0):
     """Load and return the Criteo Uplift Prediction Dataset (classification).
 
     This dataset is constructed by assembling data resulting from several incrementality tests, a particular randomized
@@ -377,6 +1024,27 @@ def fetch_criteo(target_col='visit', treatment_col='treatment', data_home=None,
         percent10 (bool, default=False): Whether to load only 10 percent of the data.
         return_X_y_t (bool, default=False): If True, returns (data, target, treatment) instead of a Bunch object.
 
+        columnar_cache (bool, default=True): Whether to store a typed Parquet copy of the data next to
+            the downloaded file on the first call and read it on later calls. Requires pyarrow or fastparquet,
+            ignored otherwise.
+        as_memmap (bool, default=False): If True, convert the data once into ``.npy`` files next to the downloaded
+            file and return ``data``, ``target`` and ``treatment`` as read-only memory-mapped numpy arrays instead of
+            pandas objects. Many processes loading the dataset then share one copy of it in memory.
+        chunksize (int, optional): If set, return an iterator over (data, target, treatment) batches of
+            ``chunksize`` rows read incrementally from the compressed file instead of loading the whole dataset.
+            Numeric features are float64 in every batch.
+        compact (bool, default=False): If True, load floats as float32, 0/1 integer flags as uint8, other integers
+            as the smallest integer dtype and strings with few distinct values as category. The Bunch then has
+            a ``memory_report`` dict with ``original_bytes``, ``compact_bytes`` and their ``ratio``. Together with
+            ``chunksize`` or ``as_memmap`` only numeric features are cast to float32 and labels keep their dtypes,
+            since the value ranges and categories of the whole file are not known from one batch.
+        columns (list, optional): Names of the features to load. Only these columns, the target and the treatment
+            are parsed.
+        nrows (int, optional): The number of rows to read from the beginning of the file.
+        sample_frac (float, optional): The fraction of rows to load. The rows are selected by a hash of their
+            number in the file seeded with ``random_state``, so repeated calls return the same rows and the file
+            is never loaded in full.
+        random_state (int, default=0): Seed of the hash used by ``sample_frac``.
     Returns:
         Bunch or tuple: dataset.
 
@@ -394,6 +1062,9 @@ def fetch_criteo(target_col='visit', treatment_col='treatment', data_home=None,
         Tuple:
             tuple (data, target, treatment) if `return_X_y` is True
 
+        Iterator:
+            iterator over (data, target, treatment) batches if `chunksize` is set
+
     Example::
 
         from sklift.datasets import fetch_criteo
@@ -420,6 +1091,12 @@ def fetch_criteo(target_col='visit', treatment_col='treatment', data_home=None,
 
         :func:`.fetch_megafon`: Load and return the MegaFon Uplift Competition dataset (classification).
     """
+    _check_chunksize(chunksize, as_memmap)
+    _check_selection(columns, nrows, sample_frac, random_state)
+    if as_memmap and (columns is not None or nrows is not None or sample_frac is not None):
+        raise ValueError("The columns, nrows and sample_frac can not be used together with as_memmap=True, "
+                         "slice the memory-mapped arrays instead.")
+
     treatment_cols = ['exposure', 'treatment']
     if treatment_col == 'all':
         treatment_col = treatment_cols
@@ -463,26 +1140,40 @@ def fetch_criteo(target_col='visit', treatment_col='treatment', data_home=None,
         'conversion': 'Int8',
         'visit': 'Int8'
     }
-    data = pd.read_csv(csv_path, dtype=dtypes)
-    treatment, target = data[treatment_col], data[target_col]
-
-    data = data.drop(target_cols + treatment_cols, axis=1)
+    label_cols = target_cols + treatment_cols
+    if chunksize is not None:
+        return _iter_csv(csv_path, chunksize, target_col, treatment_col, label_cols, compact, sample_frac,
+                         random_state, usecols=_usecols(columns, label_cols), nrows=nrows, dtype=dtypes)
+
+    if as_memmap:
+        data, labels, feature_names = _load_memmap(csv_path, criteo_metadata['hash'], target_cols + treatment_cols,
+                                                   columnar_cache, compact, dtype=dtypes)
+        treatment, target = _select_labels(labels, treatment_col), _select_labels(labels, target_col)
+    else:
+        data = _read_csv(csv_path, criteo_metadata['hash'], columnar_cache, _usecols(columns, label_cols), nrows,
+                         sample_frac, random_state, dtype=dtypes)
+        if compact:
+            data, memory_report = _compact_dtypes(data)
+        treatment, target = data[treatment_col], data[target_col]
+        data = data.drop(target_cols + treatment_cols, axis=1)
+        feature_names = list(data.columns)
 
     if return_X_y_t:
         return data, target, treatment
 
-    feature_names = list(data.columns)
-
     module_path = os.path.dirname(__file__)
     with open(os.path.join(module_path, 'descr', 'criteo.rst')) as rst_file:
         fdescr = rst_file.read()
 
-    return Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr, feature_names=feature_names,
-                 target_name=target_col, treatment_name=treatment_col)
+    dataset = Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr, feature_names=feature_names,
+                    target_name=target_col, treatment_name=treatment_col)
+    if compact and not as_memmap:
+        dataset.memory_report = memory_report
+    return dataset
 
 
 def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, download_if_missing=True,
-                    return_X_y_t=False):
+                    return_X_y_t=False, columnar_cache=True, chunksize=None, compact=False):
     """Load and return Kevin Hillstrom Dataset MineThatData (classification or regression).
 
     This dataset contains 64,000 customers who last purchased within twelve months.
@@ -505,6 +1196,17 @@ def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, downlo
         download_if_missing (bool): Download the data if not present. Raises an IOError if False and data is missing.
         return_X_y_t (bool, default=False): If True, returns (data, target, treatment) instead of a Bunch object.
 
+        columnar_cache (bool, default=True): Whether to store a typed Parquet copy of the data next to
+            the downloaded file on the first call and read it on later calls. Requires pyarrow or fastparquet,
+            ignored otherwise.
+        chunksize (int, optional): If set, return an iterator over (data, target, treatment) batches of
+            ``chunksize`` rows read incrementally from the compressed file instead of loading the whole dataset.
+            Numeric features are float64 in every batch.
+        compact (bool, default=False): If True, load floats as float32, 0/1 integer flags as uint8, other integers
+            as the smallest integer dtype and strings with few distinct values as category. The Bunch then has
+            a ``memory_report`` dict with ``original_bytes``, ``compact_bytes`` and their ``ratio``. Together with
+            ``chunksize`` only numeric features are cast to float32 and labels keep their dtypes, since the value
+            ranges and categories of the whole file are not known from one batch.
     Returns:
         Bunch or tuple: dataset.
 
@@ -522,6 +1224,9 @@ def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, downlo
         Tuple:
             tuple (data, target, treatment) if `return_X_y` is True
 
+        Iterator:
+            iterator over (data, target, treatment) batches if `chunksize` is set
+
     References:
         https://blog.minethatdata.com/2008/03/minethatdata-e-mail-analytics-and-data.html
 
@@ -546,6 +1251,8 @@ def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, downlo
 
         :func:`.fetch_megafon`: Load and return the MegaFon Uplift Competition dataset (classification)
     """
+    _check_chunksize(chunksize)
+
     target_cols = ['visit', 'conversion', 'spend']
     if target_col == 'all':
         target_col = target_cols
@@ -571,7 +1278,12 @@ def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, downlo
 
     treatment_col = 'segment'
 
-    data = pd.read_csv(csv_path)
+    if chunksize is not None:
+        return _iter_csv(csv_path, chunksize, target_col, treatment_col, target_cols + [treatment_col], compact)
+
+    data = _read_csv(csv_path, hillstrom_metadata['hash'], columnar_cache)
+    if compact:
+        data, memory_report = _compact_dtypes(data)
     treatment, target = data[treatment_col], data[target_col]
 
     data = data.drop(target_cols + [treatment_col], axis=1)
@@ -585,12 +1297,16 @@ def fetch_hillstrom(target_col='visit', data_home=None, dest_subdir=None, downlo
     with open(os.path.join(module_path, 'descr', 'hillstrom.rst')) as rst_file:
         fdescr = rst_file.read()
 
-    return Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
-                 feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    dataset = Bunch(data=data, target=target, treatment=treatment, DESCR=fdescr,
+                    feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    if compact:
+        dataset.memory_report = memory_report
+    return dataset
 
 
 def fetch_megafon(data_home=None, dest_subdir=None, download_if_missing=True,
-                  return_X_y_t=False):
+                  return_X_y_t=False, columnar_cache=True, as_memmap=False, chunksize=None,
+                  compact=False, columns=None, nrows=None, sample_frac=None, random_state=0):
     """Load and return the MegaFon Uplift Competition dataset (classification).
 
     An uplift modeling dataset containing synthetic data generated by telecom companies, trying to bring them closer to the real case that they encountered.
@@ -609,6 +1325,27 @@ def fetch_megafon(data_home=None, dest_subdir=None, download_if_missing=True,
         download_if_missing (bool): Download the data if not present. Raises an IOError if False and data is missing.
         return_X_y_t (bool): If True, returns (data, target, treatment) instead of a Bunch object.
 
+        columnar_cache (bool, default=True): Whether to store a typed Parquet copy of the data next to
+            the downloaded file on the first call and read it on later calls. Requires pyarrow or fastparquet,
+            ignored otherwise.
+        as_memmap (bool, default=False): If True, convert the data once into ``.npy`` files next to the downloaded
+            file and return ``data``, ``target`` and ``treatment`` as read-only memory-mapped numpy arrays instead of
+            pandas objects. Many processes loading the dataset then share one copy of it in memory.
+        chunksize (int, optional): If set, return an iterator over (data, target, treatment) batches of
+            ``chunksize`` rows read incrementally from the compressed file instead of loading the whole dataset.
+            Numeric features are float64 in every batch.
+        compact (bool, default=False): If True, load floats as float32, 0/1 integer flags as uint8, other integers
+            as the smallest integer dtype and strings with few distinct values as category. The Bunch then has
+            a ``memory_report`` dict with ``original_bytes``, ``compact_bytes`` and their ``ratio``. Together with
+            ``chunksize`` or ``as_memmap`` only numeric features are cast to float32 and labels keep their dtypes,
+            since the value ranges and categories of the whole file are not known from one batch.
+        columns (list, optional): Names of the features to load. Only these columns, the target and the treatment
+            are parsed.
+        nrows (int, optional): The number of rows to read from the beginning of the file.
+        sample_frac (float, optional): The fraction of rows to load. The rows are selected by a hash of their
+            number in the file seeded with ``random_state``, so repeated calls return the same rows and the file
+            is never loaded in full.
+        random_state (int, default=0): Seed of the hash used by ``sample_frac``.
     Returns:
         Bunch or tuple: dataset.
 
@@ -626,6 +1363,9 @@ def fetch_megafon(data_home=None, dest_subdir=None, download_if_missing=True,
         Tuple:
             tuple (data, target, treatment) if `return_X_y` is True
 
+        Iterator:
+            iterator over (data, target, treatment) batches if `chunksize` is set
+
     Example::
 
         from sklift.datasets import fetch_megafon
@@ -647,6 +1387,12 @@ def fetch_megafon(data_home=None, dest_subdir=None, download_if_missing=True,
 
         :func:`.fetch_hillstrom`: Load and return Kevin Hillstrom Dataset MineThatData (classification or regression).
     """
+    _check_chunksize(chunksize, as_memmap)
+    _check_selection(columns, nrows, sample_frac, random_state)
+    if as_memmap and (columns is not None or nrows is not None or sample_frac is not None):
+        raise ValueError("The columns, nrows and sample_frac can not be used together with as_memmap=True, "
+                         "slice the memory-mapped arrays instead.")
+
     megafon_metadata = {
         'desc': 'Megafon dataset',
         'url': 'https://sklift.s3.eu-west-2.amazonaws.com/megafon_dataset.csv.gz',
@@ -663,23 +1409,36 @@ def fetch_megafon(data_home=None, dest_subdir=None, download_if_missing=True,
         raise ValueError(f"The {filename} file is broken, please clean the directory "
                          f"with the clean_data_dir() function, and run the function again")
         
-    train = pd.read_csv(csv_path)
-
     target_col = 'conversion'
     treatment_col = 'treatment_group'
 
-    treatment, target = train[treatment_col], train[target_col]
+    label_cols = [target_col, treatment_col]
+    if chunksize is not None:
+        return _iter_csv(csv_path, chunksize, target_col, treatment_col, label_cols, compact, sample_frac,
+                         random_state, usecols=_usecols(columns, label_cols), nrows=nrows)
 
-    train = train.drop([target_col, treatment_col], axis=1)
+    if as_memmap:
+        train, labels, feature_names = _load_memmap(csv_path, megafon_metadata['hash'], [target_col, treatment_col],
+                                                    columnar_cache, compact)
+        treatment, target = labels[treatment_col], labels[target_col]
+    else:
+        train = _read_csv(csv_path, megafon_metadata['hash'], columnar_cache, _usecols(columns, label_cols), nrows,
+                          sample_frac, random_state)
+        if compact:
+            train, memory_report = _compact_dtypes(train)
+        treatment, target = train[treatment_col], train[target_col]
+        train = train.drop([target_col, treatment_col], axis=1)
+        feature_names = list(train.columns)
 
     if return_X_y_t:
         return train, target, treatment
 
-    feature_names = list(train.columns)
-
     module_path = os.path.dirname(os.path.abspath(__file__))
     with open(os.path.join(module_path, 'descr', 'megafon.rst')) as rst_file:
         fdescr = rst_file.read()
 
-    return Bunch(data=train, target=target, treatment=treatment, DESCR=fdescr,
-                 feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    dataset = Bunch(data=train, target=target, treatment=treatment, DESCR=fdescr,
+                    feature_names=feature_names, target_name=target_col, treatment_name=treatment_col)
+    if compact and not as_memmap:
+        dataset.memory_report = memory_report
+    return dataset
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from .datasets import _X5_METADATA, _check_chunksize, _fetch_file, _fetch_table
+
+_TRANSACTION_SUMS = ['purchase_sum', 'regular_points_received', 'express_points_received', 'regular_points_spent',
+                     'express_points_spent']
+_PRODUCT_SUMS = ['product_quantity', 'trn_sum_from_iss', 'trn_sum_from_red']
+_PURCHASES_COLUMNS = ['client_id', 'transaction_id', 'transaction_datetime'] + _TRANSACTION_SUMS + _PRODUCT_SUMS
+
+
+def _group_reduce(values, idx, how):
+    """Reduce the values by client positions, return the positions and the reduced values."""
+    reduced = pd.Series(values).groupby(idx).agg(how)
+    return reduced.index.to_numpy(), reduced.to_numpy()
+
+
+class _ClientAggregates:
+    """Mergeable per-client aggregates of the X5 purchases, updated chunk by chunk.
+
+    The transaction columns, e.g. ``purchase_sum``, are repeated on every product line of a transaction, so they
+    are aggregated over the first line of every transaction. The sorted hashes of the seen transactions are kept
+    to skip transactions split between chunks.
+
+    Args:
+        client_ids (array-like): Unique ids of the clients to aggregate, purchases of other clients are skipped.
+    """
+
+    def __init__(self, client_ids):
+        self.clients = pd.Index(client_ids)
+        if not self.clients.is_unique:
+            raise ValueError("The client_ids must be unique.")
+        n_clients = len(self.clients)
+        self.n_transactions = np.zeros(n_clients, dtype=np.int32)
+        self.n_products = np.zeros(n_clients, dtype=np.int32)
+        self.sums = np.zeros((n_clients, len(_TRANSACTION_SUMS) + len(_PRODUCT_SUMS)))
+        self.max_purchase_sum = np.full(n_clients, np.nan, dtype=np.float32)
+        self.first_time = np.full(n_clients, np.iinfo(np.int64).max, dtype=np.int64)
+        self.last_time = np.full(n_clients, np.iinfo(np.int64).min, dtype=np.int64)
+        self.seen_transactions = np.empty(0, dtype=np.uint64)
+
+    def _count(self, idx, weights=None):
+        return np.bincount(idx, weights=weights, minlength=len(self.clients))
+
+    def update(self, chunk):
+        """Add the purchases of the chunk to the aggregates.
+
+        Args:
+            chunk (DataFrame): Rows of the purchases table.
+
+        Returns:
+            object: self
+        """
+        idx = self.clients.get_indexer(chunk['client_id'])
+        known = idx >= 0
+        chunk, idx = chunk[known], idx[known]
+
+        self.n_products += self._count(idx).astype(np.int32)
+        for pos, col in enumerate(_PRODUCT_SUMS, start=len(_TRANSACTION_SUMS)):
+            self.sums[:, pos] += self._count(idx, chunk[col].fillna(0).to_numpy(np.float64))
+
+        transaction_hashes = pd.util.hash_array(chunk['transaction_id'].to_numpy())
+        is_first = ~pd.Series(transaction_hashes).duplicated().to_numpy()
+        if len(self.seen_transactions):
+            found = np.searchsorted(self.seen_transactions, transaction_hashes)
+            found = np.minimum(found, len(self.seen_transactions) - 1)
+            is_first &= self.seen_transactions[found] != transaction_hashes
+        self.seen_transactions = np.union1d(self.seen_transactions, transaction_hashes[is_first])
+
+        transactions, idx = chunk[is_first], idx[is_first]
+        self.n_transactions += self._count(idx).astype(np.int32)
+        for pos, col in enumerate(_TRANSACTION_SUMS):
+            self.sums[:, pos] += self._count(idx, transactions[col].fillna(0).to_numpy(np.float64))
+
+        pos, max_sum = _group_reduce(transactions['purchase_sum'].to_numpy(np.float32), idx, 'max')
+        self.max_purchase_sum[pos] = np.fmax(self.max_purchase_sum[pos], max_sum)
+        times = pd.to_datetime(transactions['transaction_datetime']).to_numpy().astype('datetime64[s]')
+        pos, first_time = _group_reduce(times.astype(np.int64), idx, 'min')
+        self.first_time[pos] = np.minimum(self.first_time[pos], first_time)
+        pos, last_time = _group_reduce(times.astype(np.int64), idx, 'max')
+        self.last_time[pos] = np.maximum(self.last_time[pos], last_time)
+        return self
+
+    def merge(self, other):
+        """Add the aggregates of other purchases of the same clients, e.g. of another part of the table.
+
+        The parts must not share transactions.
+
+        Args:
+            other (_ClientAggregates): Aggregates of the same clients.
+
+        Returns:
+            object: self
+        """
+        if not self.clients.equals(other.clients):
+            raise ValueError("Only aggregates of the same clients can be merged.")
+        self.n_transactions += other.n_transactions
+        self.n_products += other.n_products
+        self.sums += other.sums
+        self.max_purchase_sum = np.fmax(self.max_purchase_sum, other.max_purchase_sum)
+        self.first_time = np.minimum(self.first_time, other.first_time)
+        self.last_time = np.maximum(self.last_time, other.last_time)
+        self.seen_transactions = np.union1d(self.seen_transactions, other.seen_transactions)
+        return self
+
+    def to_frame(self, reference_date=None):
+        """Return the client features.
+
+        Args:
+            reference_date (str or Timestamp, optional): The date the recency is computed at, the time of the last
+                aggregated transaction if None.
+
+        Returns:
+            DataFrame: features indexed by client id.
+        """
+        has_purchases = self.n_transactions > 0
+        n_transactions = np.where(has_purchases, self.n_transactions, np.nan)
+        if reference_date is None:
+            reference_time = self.last_time.max() if has_purchases.any() else 0
+        else:
+            reference_time = pd.Timestamp(reference_date).value // 10 ** 9
+        seconds_per_day = 24 * 60 * 60
+
+        features = pd.DataFrame(index=self.clients)
+        features['n_transactions'] = self.n_transactions
+        features['n_products'] = self.n_products
+        for pos, col in enumerate(_TRANSACTION_SUMS + _PRODUCT_SUMS):
+            features[col] = self.sums[:, pos].astype(np.float32)
+        features['purchase_sum_mean'] = (self.sums[:, 0] / n_transactions).astype(np.float32)
+        features['purchase_sum_max'] = self.max_purchase_sum
+        features['products_per_transaction'] = (self.n_products / n_transactions).astype(np.float32)
+        features['recency_days'] = np.where(
+            has_purchases, (reference_time - self.last_time) / seconds_per_day, np.nan).astype(np.float32)
+        features['tenure_days'] = np.where(
+            has_purchases, (self.last_time - self.first_time) / seconds_per_day, np.nan).astype(np.float32)
+        return features
+
+
+def fetch_x5_client_features(client_ids=None, data_home=None, dest_subdir=None, download_if_missing=True,
+                             chunksize=10 ** 6, reference_date=None):
+    """Aggregate the purchases of the X5 RetailHero dataset into features of clients.
+
+    The purchases table is read in chunks of ``chunksize`` rows and only compact per-client aggregates are kept
+    in memory, so the table is never loaded in full. Transaction columns are counted once per transaction,
+    product columns once per product line.
+
+    Read more in the :ref:`docs <X5>`.
+
+    Args:
+        client_ids (array-like, optional): Ids of the clients, e.g. ``train['client_id']``. If None, the clients
+            of the train table of :func:`.fetch_x5` are used.
+        data_home (str, unicode): The path to the folder where datasets are stored.
+        dest_subdir (str, unicode): The name of the folder in which the dataset is stored.
+        download_if_missing (bool): Download the data if not present. Raises an IOError if False and data is missing.
+        chunksize (int, default=10 ** 6): The number of purchases rows read at once.
+        reference_date (str or Timestamp, optional): The date the recency is computed at, the time of the last
+            transaction of the clients if None.
+
+    Returns:
+        DataFrame: features indexed by ``client_id`` in the order of ``client_ids``, with the columns:
+
+            * ``n_transactions``, ``n_products``: The number of transactions and of product lines.
+            * ``purchase_sum``, ``regular_points_received``, ``express_points_received``, ``regular_points_spent``,
+              ``express_points_spent``: Sums over transactions.
+            * ``product_quantity``, ``trn_sum_from_iss``, ``trn_sum_from_red``: Sums over product lines.
+            * ``purchase_sum_mean``, ``purchase_sum_max``: Mean and max sum of a transaction.
+            * ``products_per_transaction``: Mean number of product lines in a transaction.
+            * ``recency_days``: Days from the last transaction to ``reference_date``.
+            * ``tenure_days``: Days from the first to the last transaction.
+
+        Mean, max, recency and tenure are NaN for clients without purchases.
+
+    Example::
+
+        from sklift.datasets import fetch_x5, fetch_x5_client_features
+
+
+        dataset = fetch_x5(lazy_purchases=True)
+        train = dataset.data.train
+        features = fetch_x5_client_features(train['client_id'])
+        X = train.join(features, on='client_id')
+
+    See Also:
+
+        :func:`.fetch_x5`: Load and return the X5 RetailHero dataset (classification).
+    """
+    _check_chunksize(chunksize)
+    if client_ids is None:
+        # only the ids of the train table are read, the clients table is not needed
+        train, _ = _fetch_table(_X5_METADATA['url_train'], _X5_METADATA['hash_train'], _X5_METADATA['desc_train'],
+                                data_home, dest_subdir, download_if_missing, usecols=['client_id'])
+        client_ids = train['client_id']
+    aggregates = _ClientAggregates(client_ids)
+
+    csv_path = _fetch_file(_X5_METADATA['url_purchases'], _X5_METADATA['hash_purchases'],
+                           _X5_METADATA['desc_purchases'], data_home, dest_subdir, download_if_missing)
+    reader = pd.read_csv(csv_path, usecols=_PURCHASES_COLUMNS, chunksize=chunksize,
+                         dtype={'client_id': str, 'transaction_id': str})
+    try:
+        for chunk in reader:
+            aggregates.update(chunk)
+    finally:
+        reader.close()
+
+    features = aggregates.to_frame(reference_date)
+    features.index.name = 'client_id'
+    return features
@@ -0,0 +1,231 @@
+import os
+
+import numpy as np
+from sklearn.utils import check_random_state
+
+_BLOCK_SIZE = 2 ** 16
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+class _UpliftGenerator:
+    """Generate rows of a synthetic uplift dataset in fixed blocks.
+
+    Every block is drawn from its own random state seeded by the block number, so any range of rows is the same
+    whichever chunks it is generated in.
+    """
+
+    def __init__(self, n_features, n_informative, n_uplift, treatment_ratio, average_effect, effect_heterogeneity,
+                 noise, base_rate, classification, dtype, random_state):
+        rng = check_random_state(random_state)
+        self.n_features = n_features
+        self.treatment_ratio = treatment_ratio
+        self.noise = noise
+        self.classification = classification
+        self.dtype = dtype
+
+        self.base_coef = np.zeros(n_features)
+        self.base_coef[:n_informative] = rng.normal(size=n_informative) / np.sqrt(max(n_informative, 1))
+        self.effect_coef = np.zeros(n_features)
+        self.effect_coef[:n_uplift] = rng.normal(size=n_uplift) / np.sqrt(max(n_uplift, 1)) * effect_heterogeneity
+        if classification:
+            self.intercept = np.log(base_rate / (1 - base_rate))
+            # the effect is shifted on the logit scale, so the average effect in probability is close to the given one
+            self.effect_intercept = np.log((base_rate + average_effect) / (1 - base_rate - average_effect)) - \
+                self.intercept
+        else:
+            self.intercept, self.effect_intercept = 0., average_effect
+        self.block_seed = rng.randint(np.iinfo(np.int32).max)
+        self._last_block = (None, None)
+
+    def _block(self, block_idx, n_rows):
+        if self._last_block[0] == block_idx:
+            return self._last_block[1]
+        rng = np.random.RandomState([self.block_seed, block_idx])
+        X = rng.standard_normal((n_rows, self.n_features))
+        treatment = (rng.random_sample(n_rows) < self.treatment_ratio).astype(np.int8)
+        base = self.intercept + X @ self.base_coef
+        shift = self.effect_intercept + X @ self.effect_coef
+        if self.classification:
+            effect = _sigmoid(base + shift) - _sigmoid(base)
+            y = (rng.random_sample(n_rows) < _sigmoid(base + treatment * shift)).astype(np.int8)
+        else:
+            effect = shift
+            y = (base + treatment * shift + self.noise * rng.standard_normal(n_rows)).astype(self.dtype)
+        block = (X.astype(self.dtype), y, treatment, effect.astype(self.dtype))
+        self._last_block = (block_idx, block)
+        return block
+
+    def rows(self, start, stop, n_samples):
+        """Return (X, y, treatment, effect) of the rows from start to stop."""
+        parts = []
+        for block_idx in range(start // _BLOCK_SIZE, (stop - 1) // _BLOCK_SIZE + 1):
+            block_start = block_idx * _BLOCK_SIZE
+            block = self._block(block_idx, min(_BLOCK_SIZE, n_samples - block_start))
+            lo, hi = max(start - block_start, 0), min(stop - block_start, _BLOCK_SIZE)
+            parts.append([array[lo:hi] for array in block])
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+def _iter_chunks(generator, n_samples, chunksize):
+    for start in range(0, n_samples, chunksize):
+        yield generator.rows(start, min(start + chunksize, n_samples), n_samples)
+
+
+def _write_memmap(generator, n_samples, chunksize, memmap_dir):
+    """Write the generated arrays chunk by chunk into .npy files and map them in read-only mode."""
+    os.makedirs(memmap_dir, exist_ok=True)
+    names = ['X', 'y', 'treatment', 'effect']
+    arrays = None
+    for start in range(0, n_samples, chunksize):
+        stop = min(start + chunksize, n_samples)
+        chunk = generator.rows(start, stop, n_samples)
+        if arrays is None:
+            arrays = [
+                np.lib.format.open_memmap(os.path.join(memmap_dir, f'{name}.npy'), mode='w+', dtype=array.dtype,
+                                          shape=(n_samples,) + array.shape[1:])
+                for name, array in zip(names, chunk)
+            ]
+        for array, values in zip(arrays, chunk):
+            array[start:stop] = values
+    for array in arrays:
+        array.flush()
+    del arrays
+    return tuple(np.load(os.path.join(memmap_dir, f'{name}.npy'), mmap_mode='r') for name in names)
+
+
+def _make_uplift(n_samples, n_features, n_informative, n_uplift, treatment_ratio, average_effect,
+                 effect_heterogeneity, noise, base_rate, classification, dtype, chunksize, memmap_dir, random_state):
+    for name, value in (('n_samples', n_samples), ('n_features', n_features)):
+        if isinstance(value, bool) or not isinstance(value, (int, np.integer)) or value <= 0:
+            raise ValueError(f"The {name} must be a positive integer. Got value {name}={value}.")
+    for name, value in (('n_informative', n_informative), ('n_uplift', n_uplift)):
+        if not 0 <= value <= n_features:
+            raise ValueError(f"The {name} must be in range [0, n_features]. Got value {name}={value}.")
+    if not 0 < treatment_ratio < 1:
+        raise ValueError(f"The treatment_ratio must be in range (0, 1). Got value treatment_ratio={treatment_ratio}.")
+    if effect_heterogeneity < 0:
+        raise ValueError(f"The effect_heterogeneity must be non-negative. "
+                         f"Got value effect_heterogeneity={effect_heterogeneity}.")
+    if classification and not (0 < base_rate < 1 and 0 < base_rate + average_effect < 1):
+        raise ValueError(f"The base_rate and base_rate + average_effect must be in range (0, 1). "
+                         f"Got values base_rate={base_rate}, average_effect={average_effect}.")
+    if chunksize is not None and (isinstance(chunksize, bool) or not isinstance(chunksize, (int, np.integer))
+                                  or chunksize <= 0):
+        raise ValueError(f"The chunksize must be a positive integer. Got value chunksize={chunksize}.")
+
+    generator = _UpliftGenerator(n_features, n_informative, n_uplift, treatment_ratio, average_effect,
+                                 effect_heterogeneity, noise, base_rate, classification, np.dtype(dtype),
+                                 random_state)
+    if memmap_dir is not None:
+        return _write_memmap(generator, n_samples, chunksize or _BLOCK_SIZE * 16, memmap_dir)
+    if chunksize is not None:
+        return _iter_chunks(generator, n_samples, chunksize)
+    return generator.rows(0, n_samples, n_samples)
+
+
+def make_uplift_classification(n_samples=1000, n_features=10, n_informative=5, n_uplift=3, treatment_ratio=0.5,
+                               base_rate=0.2, average_effect=0.05, effect_heterogeneity=1.0, dtype=np.float64,
+                               chunksize=None, memmap_dir=None, random_state=None):
+    """Generate a synthetic uplift dataset with a binary target and known individual effects.
+
+    The features are standard normal. The probability of the target is a logistic function of the first
+    ``n_informative`` features, and the treatment shifts its logit by a linear function of the first ``n_uplift``
+    features. The rows are generated in blocks seeded by ``random_state``, so the data is the same whether it is
+    generated at once, in chunks or into a memory map.
+
+    Args:
+        n_samples (int, default=1000): The number of samples.
+        n_features (int, default=10): The number of features.
+        n_informative (int, default=5): The number of features the target depends on.
+        n_uplift (int, default=3): The number of features the treatment effect depends on.
+        treatment_ratio (float, default=0.5): The probability of a sample to be treated.
+        base_rate (float, default=0.2): The target rate in the control group at zero features.
+        average_effect (float, default=0.05): The effect at zero features, in probability.
+        effect_heterogeneity (float, default=1.0): The standard deviation of the effect on the logit scale
+            explained by the features. Use 0 for a constant shift of the logit.
+        dtype (numpy dtype, default=np.float64): The dtype of the features and the effects,
+            e.g. np.float32 for large datasets.
+        chunksize (int, optional): If set, return an iterator of tuples of chunks of ``chunksize`` rows
+            instead of the arrays, or write the memory map in chunks of ``chunksize`` rows.
+        memmap_dir (str, optional): If set, the arrays are written chunk by chunk into ``X.npy``, ``y.npy``,
+            ``treatment.npy`` and ``effect.npy`` files in this directory and returned as read-only memory maps.
+        random_state (int, RandomState instance or None, default=None): Determines random number generation.
+
+    Returns:
+        tuple: (X, y, treatment, effect), where X has shape (n_samples, n_features), y and treatment are binary
+        int8 arrays and effect is the true difference of the target probabilities with and without treatment.
+
+    Example::
+
+        from sklift.datasets import make_uplift_classification
+        from sklift.metrics import qini_auc_score
+
+
+        X, y, treatment, effect = make_uplift_classification(n_samples=100000, random_state=42)
+        print(qini_auc_score(y, effect, treatment))  # the Qini coefficient of the ideal model
+
+        # stream 10^8 rows into memory-mapped .npy files
+        X, y, treatment, effect = make_uplift_classification(
+            n_samples=10 ** 8, dtype=np.float32, memmap_dir='uplift_data', random_state=42
+        )
+
+    See Also:
+
+        :func:`.make_uplift_regression`: Generate a synthetic uplift dataset with a continuous target.
+    """
+    return _make_uplift(n_samples, n_features, n_informative, n_uplift, treatment_ratio, average_effect,
+                        effect_heterogeneity, 0., base_rate, True, dtype, chunksize, memmap_dir, random_state)
+
+
+def make_uplift_regression(n_samples=1000, n_features=10, n_informative=5, n_uplift=3, treatment_ratio=0.5,
+                           average_effect=1.0, effect_heterogeneity=1.0, noise=1.0, dtype=np.float64,
+                           chunksize=None, memmap_dir=None, random_state=None):
+    """Generate a synthetic uplift dataset with a continuous target and known individual effects.
+
+    The features are standard normal. The target is a linear function of the first ``n_informative`` features
+    with gaussian noise, and the treatment adds a linear function of the first ``n_uplift`` features.
+    The rows are generated in blocks seeded by ``random_state``, so the data is the same whether it is generated
+    at once, in chunks or into a memory map.
+
+    Args:
+        n_samples (int, default=1000): The number of samples.
+        n_features (int, default=10): The number of features.
+        n_informative (int, default=5): The number of features the target depends on.
+        n_uplift (int, default=3): The number of features the treatment effect depends on.
+        treatment_ratio (float, default=0.5): The probability of a sample to be treated.
+        average_effect (float, default=1.0): The average treatment effect.
+        effect_heterogeneity (float, default=1.0): The standard deviation of the effect explained by the features.
+            Use 0 for a constant effect.
+        noise (float, default=1.0): The standard deviation of the gaussian noise of the target.
+        dtype (numpy dtype, default=np.float64): The dtype of the features, the target and the effects,
+            e.g. np.float32 for large datasets.
+        chunksize (int, optional): If set, return an iterator of tuples of chunks of ``chunksize`` rows
+            instead of the arrays, or write the memory map in chunks of ``chunksize`` rows.
+        memmap_dir (str, optional): If set, the arrays are written chunk by chunk into ``X.npy``, ``y.npy``,
+            ``treatment.npy`` and ``effect.npy`` files in this directory and returned as read-only memory maps.
+        random_state (int, RandomState instance or None, default=None): Determines random number generation.
+
+    Returns:
+        tuple: (X, y, treatment, effect), where X has shape (n_samples, n_features), treatment is a binary int8
+        array and effect is the true treatment effect of every sample.
+
+    Example::
+
+        from sklift.datasets import make_uplift_regression
+
+
+        X, y, treatment, effect = make_uplift_regression(n_samples=100000, treatment_ratio=0.1, random_state=42)
+
+        for X_chunk, y_chunk, treatment_chunk, effect_chunk in make_uplift_regression(
+                n_samples=10 ** 9, dtype=np.float32, chunksize=10 ** 6, random_state=42):
+            ...
+
+    See Also:
+
+        :func:`.make_uplift_classification`: Generate a synthetic uplift dataset with a binary target.
+    """
+    return _make_uplift(n_samples, n_features, n_informative, n_uplift, treatment_ratio, average_effect,
+                        effect_heterogeneity, noise, None, False, dtype, chunksize, memmap_dir, random_state)
@@ -1,6 +1,6 @@
 from .metrics import (
     uplift_curve, perfect_uplift_curve, uplift_auc_score,
-    qini_curve, perfect_qini_curve, qini_auc_score,
+    qini_curve, perfect_qini_curve, qini_auc_score, qini_auc_score_by_stage,
     uplift_at_k, response_rate_by_percentile,
     weighted_average_uplift, uplift_by_percentile, treatment_balance_curve,
     average_squared_deviation, make_uplift_scorer, max_prof_uplift
@@ -8,7 +8,7 @@ from .metrics import (
 
 __all__ = [
     'uplift_curve', 'perfect_uplift_curve', 'uplift_auc_score',
-    'qini_curve', 'perfect_qini_curve', 'qini_auc_score',
+    'qini_curve', 'perfect_qini_curve', 'qini_auc_score', 'qini_auc_score_by_stage',
     'uplift_at_k', 'response_rate_by_percentile',
     'weighted_average_uplift', 'uplift_by_percentile', 'treatment_balance_curve',
     'average_squared_deviation', 'make_uplift_scorer', 'max_prof_uplift'
@@ -373,6 +373,60 @@ def qini_auc_score(y_true, uplift, treatment, negative_effect=True):
     return auc_score_actual / auc_score_perfect
 
 
+def qini_auc_score_by_stage(y_true, staged_uplift, treatment, negative_effect=True):
+    """Compute normalized Area Under the Qini curve for every stage of staged uplift predictions.
+
+    The perfect Qini curve does not depend on the predictions, so it is computed once for all stages.
+    Staged predictions are consumed one by one, so a generator, e.g. returned by
+    :meth:`.TwoModels.staged_predict`, is never fully held in memory.
+
+    Args:
+        y_true (1d array-like): Correct (true) binary target values.
+        staged_uplift (iterable of 1d array-like): Predicted uplift for every stage, e.g. after every
+            boosting iteration.
+        treatment (1d array-like): Treatment labels.
+        negative_effect (bool): If True, optimum Qini Curve contains the negative effects
+            (negative uplift because of campaign). Otherwise, optimum Qini Curve will not contain the negative effects.
+
+    Returns:
+        array (shape (n_stages,)): Qini coefficient of every stage.
+
+    Example::
+
+        from sklift.metrics import qini_auc_score_by_stage
+
+
+        scores = qini_auc_score_by_stage(y_val, tm.staged_predict(X_val), treat_val)
+        best_n_estimators = scores.argmax() + 1
+
+    See also:
+        :func:`.qini_auc_score`: Compute normalized Area Under the Qini curve (aka Qini coefficient)
+        from prediction scores.
+    """
+
+    check_consistent_length(y_true, treatment)
+    check_is_binary(treatment)
+    check_is_binary(y_true)
+    y_true, treatment = np.array(y_true), np.array(treatment)
+
+    if not isinstance(negative_effect, bool):
+        raise TypeError(f'Negative_effects flag should be bool, got: {type(negative_effect)}')
+
+    x_perfect, y_perfect = perfect_qini_curve(y_true, treatment, negative_effect)
+    x_baseline, y_baseline = np.array([0, x_perfect[-1]]), np.array([0, y_perfect[-1]])
+
+    auc_score_baseline = auc(x_baseline, y_baseline)
+    auc_score_perfect = auc(x_perfect, y_perfect) - auc_score_baseline
+
+    scores = []
+    for uplift in staged_uplift:
+        check_consistent_length(y_true, uplift)
+        x_actual, y_actual = qini_curve(y_true, uplift, treatment)
+        scores.append((auc(x_actual, y_actual) - auc_score_baseline) / auc_score_perfect)
+
+    return np.array(scores)
+
+
 def uplift_at_k(y_true, uplift, treatment, strategy, k=0.3):
     """Compute uplift at first k observations by uplift of the total sample.
 
@@ -0,0 +1,3 @@
+from .search import UpliftGridSearchCV, UpliftHalvingSearchCV
+
+__all__ = ['UpliftGridSearchCV', 'UpliftHalvingSearchCV']
@@ -0,0 +1,513 @@
+import numbers
+import warnings
+
+import numpy as np
+from joblib import Parallel, delayed, hash as joblib_hash
+from sklearn.base import BaseEstimator, clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.utils.multiclass import type_of_target
+from sklearn.utils.validation import check_consistent_length
+
+from ..metrics import qini_auc_score, uplift_auc_score, uplift_at_k, weighted_average_uplift
+from ..models import TwoModels
+from ..models.models import _take_rows
+from ..utils import check_is_binary
+
+SCORING = {
+    'uplift_auc_score': uplift_auc_score,
+    'qini_auc_score': qini_auc_score,
+    'uplift_at_k': uplift_at_k,
+    'weighted_average_uplift': weighted_average_uplift,
+}
+
+
+def _check_scoring(scoring, scoring_params):
+    """Return a function of (y_true, uplift, treatment) computing the score."""
+    if callable(scoring):
+        metric = scoring
+    elif scoring in SCORING:
+        metric = SCORING[scoring]
+    else:
+        raise ValueError(f"'{scoring}' is not a valid scoring value. "
+                         f"List of valid metrics: {list(SCORING.keys())}")
+
+    scoring_params = {} if scoring_params is None else scoring_params
+
+    def scorer(y_true, uplift, treatment):
+        return metric(y_true, uplift, treatment, **scoring_params)
+
+    return scorer
+
+
+def _strata(y, treatment):
+    """Return the treatment x target groups for a binary target, the treatment groups otherwise."""
+    return 2 * treatment + y if type_of_target(y) == 'binary' else treatment
+
+
+def _uplift_folds(y, treatment, cv, random_state):
+    """Split the data once into folds stratified by treatment and binary target."""
+    strata = _strata(y, treatment)
+    splitter = StratifiedKFold(n_splits=cv, shuffle=random_state is not None, random_state=random_state)
+    return list(splitter.split(np.zeros(len(strata)), strata))
+
+
+def _caches_arms(model):
+    """Whether the groups of the model are fitted independently, so that fitted arms can be reused."""
+    return isinstance(model, TwoModels) and model.method == 'vanilla' and model.downsample_ratio is None
+
+
+def _predict_target(estimator, X, type_of_y):
+    if type_of_y == 'binary':
+        return estimator.predict_proba(X)[:, 1]
+    return estimator.predict(X)
+
+
+_GROUP_FIT_PARAMS = {'estimator_trmnt_fit_params': 1, 'estimator_ctrl_fit_params': 0}
+
+
+def _is_sample_aligned(value, n_samples):
+    return not isinstance(value, (str, dict)) and hasattr(value, '__len__') and np.ndim(value) > 0 and \
+        len(value) == n_samples
+
+
+def _take_aligned(params, rows, n_samples):
+    """Select the rows of the values of length n_samples, pass other values unchanged."""
+    return {key: _take_rows(value, rows) if _is_sample_aligned(value, n_samples) else value
+            for key, value in params.items()}
+
+
+def _fold_fit_params(fit_params, treatment, train):
+    """Select the training rows of the sample-aligned fit parameters, like sklearn's ``_check_fit_params``.
+
+    Arrays of the length of the data, e.g. ``sample_weight`` in ``estimator_fit_params`` of :class:`.SoloModel`,
+    are indexed by ``train``. The parameters of the treatment and control estimators of :class:`.TwoModels` are
+    aligned with the rows of their group, so they are indexed by the positions of the training rows in the group.
+    """
+    n_samples = len(treatment)
+    fold_params = {}
+    for key, value in fit_params.items():
+        if key in _GROUP_FIT_PARAMS and isinstance(value, dict):
+            group_rows = np.flatnonzero(treatment == _GROUP_FIT_PARAMS[key])
+            train_group_rows = train[treatment[train] == _GROUP_FIT_PARAMS[key]]
+            fold_params[key] = _take_aligned(value, np.searchsorted(group_rows, train_group_rows), len(group_rows))
+        elif isinstance(value, dict):
+            fold_params[key] = _take_aligned(value, train, n_samples)
+        else:
+            fold_params[key] = _take_rows(value, train) if _is_sample_aligned(value, n_samples) else value
+    return fold_params
+
+
+def _rank_candidates(mean_scores):
+    """Return the positions of the candidates from the best to the worst, candidates with nan scores last."""
+    if np.isnan(mean_scores).any():
+        warnings.warn("Some candidates got nan scores, e.g. when a test fold has no positive target in one of "
+                      "the treatment groups. They are ranked last.", UserWarning)
+    return np.argsort(-np.where(np.isnan(mean_scores), -np.inf, mean_scores), kind='mergesort')
+
+
+def _fit_and_score(estimator, candidates, X, y, treatment, train, test, fit_params, scorer):
+    """Fit and score candidates on one fold.
+
+    For :class:`.TwoModels` with independent arms, the predictions of every distinct configuration of the treatment
+    and the control estimators are computed once and reused by all candidates sharing it.
+
+    Returns:
+        list of float: scores of the candidates on the test fold.
+    """
+    X_train, y_train, treatment_train = _take_rows(X, train), y[train], treatment[train]
+    X_test, y_test, treatment_test = _take_rows(X, test), y[test], treatment[test]
+    type_of_y = type_of_target(y_train)
+    fit_params = _fold_fit_params(fit_params, treatment, train)
+
+    arms = {
+        'trmnt': (np.flatnonzero(treatment_train == 1), fit_params.get('estimator_trmnt_fit_params') or {}),
+        'ctrl': (np.flatnonzero(treatment_train == 0), fit_params.get('estimator_ctrl_fit_params') or {}),
+    }
+    arm_preds, scores = {}, []
+
+    for params in candidates:
+        model = clone(estimator).set_params(**params)
+        if _caches_arms(model):
+            preds = {}
+            for arm, (idx, arm_fit_params) in arms.items():
+                arm_estimator = getattr(model, 'estimator_' + arm)
+                key = (arm, joblib_hash(arm_estimator))
+                if key not in arm_preds:
+                    arm_estimator.fit(_take_rows(X_train, idx), y_train[idx], **arm_fit_params)
+                    arm_preds[key] = _predict_target(arm_estimator, X_test, type_of_y)
+                preds[arm] = arm_preds[key]
+            uplift = preds['trmnt'] - preds['ctrl']
+        else:
+            uplift = model.fit(X_train, y_train, treatment_train, **fit_params).predict(X_test)
+        scores.append(scorer(y_test, uplift, treatment_test))
+
+    return scores
+
+
+def _evaluate_candidates(estimator, candidates, X, y, treatment, folds, fit_params, scorer, n_jobs):
+    """Score every candidate on every fold.
+
+    Returns:
+        array (shape (n_candidates, n_folds)): scores.
+    """
+    if _caches_arms(estimator):
+        batches = [(list(range(len(candidates))), k) for k in range(len(folds))]
+    else:
+        batches = [([pos], k) for k in range(len(folds)) for pos in range(len(candidates))]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_and_score)(estimator, [candidates[pos] for pos in positions], X, y, treatment,
+                                folds[k][0], folds[k][1], fit_params, scorer)
+        for positions, k in batches
+    )
+
+    scores = np.empty((len(candidates), len(folds)))
+    for (positions, k), batch_scores in zip(batches, results):
+        scores[positions, k] = batch_scores
+    return scores
+
+
+class UpliftGridSearchCV(BaseEstimator):
+    """Exhaustive search over specified parameter values for an uplift approach.
+
+    The data is split once into folds stratified by treatment and binary target, and every candidate is scored
+    on the uplift predicted for the test fold with an uplift metric. The whole training data and the fold indices
+    are passed to the workers, so large numpy arrays are memory-mapped and shared by all of them instead of
+    being copied for each candidate.
+
+    For :class:`.TwoModels` with the ``'vanilla'`` method, the treatment and control estimators of a fold are fitted
+    once for each distinct configuration and reused by all candidates that differ only in the parameters of the
+    other estimator. In this case, a worker evaluates all candidates of one fold.
+
+    Args:
+        estimator (estimator object): An uplift approach implementing ``fit(X, y, treatment)`` and ``predict``.
+        param_grid (dict or list of dicts): Dictionary with parameters names as keys and lists of parameter values,
+            see :class:`~sklearn.model_selection.ParameterGrid`.
+        scoring (string or callable, default='qini_auc_score'): Uplift metric: 'qini_auc_score',
+            'uplift_auc_score', 'uplift_at_k', 'weighted_average_uplift' or a callable
+            ``scoring(y_true, uplift, treatment)``. Greater is better.
+        scoring_params (dict, optional): Additional parameters to be passed to the metric,
+            e.g. ``{'strategy': 'overall', 'k': 0.3}`` for ``uplift_at_k``.
+        cv (int, default=5): The number of folds.
+        refit (bool, default=True): Refit the estimator with the best found parameters on the whole dataset.
+        n_jobs (int, default=None): The number of jobs to run in parallel.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int or None, default=None): If not None, the data is shuffled before splitting into folds.
+
+    Attributes:
+        cv_results_ (dict): Parameters and test scores of the candidates: ``params``, ``split<k>_test_score``,
+            ``mean_test_score``, ``std_test_score`` and ``rank_test_score``. Candidates with nan mean scores are
+            ranked last.
+        best_index_ (int): The index of the best candidate in ``cv_results_``.
+        best_params_ (dict): Parameter setting that gave the best results.
+        best_score_ (float): Mean cross-validated score of the best candidate.
+        best_estimator_ (estimator object): Estimator refitted with the best parameters if ``refit`` is True.
+
+    Example::
+
+        from sklearn.linear_model import LogisticRegression
+        from sklift.models import TwoModels
+        from sklift.model_selection import UpliftGridSearchCV
+
+
+        search = UpliftGridSearchCV(
+            TwoModels(LogisticRegression(), LogisticRegression()),
+            param_grid={'estimator_trmnt__C': [0.1, 1, 10], 'estimator_ctrl__C': [0.1, 1, 10]},
+            scoring='uplift_at_k', scoring_params={'strategy': 'overall', 'k': 0.3},
+            n_jobs=-1
+        )
+        search = search.fit(X_train, y_train, treat_train)
+        uplift = search.predict(X_val)  # predict with the best estimator
+
+    See Also:
+
+        * :func:`.make_uplift_scorer`: Make uplift scorer for ``sklearn.model_selection``.
+    """
+
+    def __init__(self, estimator, param_grid, scoring='qini_auc_score', scoring_params=None, cv=5, refit=True,
+                 n_jobs=None, random_state=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.scoring = scoring
+        self.scoring_params = scoring_params
+        self.cv = cv
+        self.refit = refit
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y, treatment, **fit_params):
+        """Run fit with all sets of parameters.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            **fit_params (dict of string -> object): Parameters passed to the ``fit`` method of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        check_is_binary(treatment)
+        y, treatment = np.asarray(y), np.asarray(treatment)
+
+        scorer = _check_scoring(self.scoring, self.scoring_params)
+        candidates = list(ParameterGrid(self.param_grid))
+        folds = _uplift_folds(y, treatment, self.cv, self.random_state)
+
+        scores = _evaluate_candidates(self.estimator, candidates, X, y, treatment, folds, fit_params, scorer,
+                                      self.n_jobs)
+        self._store_results(candidates, scores)
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y, treatment, **fit_params)
+        return self
+
+    def _store_results(self, candidates, scores):
+        mean_scores = scores.mean(axis=1)
+        ranking = _rank_candidates(mean_scores)
+        ranks = np.empty(len(candidates), dtype=np.int32)
+        ranks[ranking] = np.arange(1, len(candidates) + 1)
+
+        self.cv_results_ = {'params': candidates}
+        for k in range(scores.shape[1]):
+            self.cv_results_['split%d_test_score' % k] = scores[:, k]
+        self.cv_results_.update(mean_test_score=mean_scores, std_test_score=scores.std(axis=1),
+                                rank_test_score=ranks)
+
+        self.best_index_ = int(ranking[0])
+        self.best_params_ = candidates[self.best_index_]
+        self.best_score_ = mean_scores[self.best_index_]
+
+    def predict(self, X):
+        """Perform uplift on samples in X with the best found estimator.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.best_estimator_.predict(X)
+
+
+def _stratified_order(y, treatment, random_state):
+    """Shuffle the samples so that every prefix of the order keeps the proportions of treatment x target strata.
+
+    The row budgets of successive halving are prefixes of this order, so the samples of a rung are a subset of
+    the samples of the next one.
+    """
+    rng = np.random.RandomState(random_state)
+    strata = _strata(y, treatment)
+    quantiles = np.empty(len(strata))
+    for stratum in np.unique(strata):
+        idx = rng.permutation(np.flatnonzero(strata == stratum))
+        quantiles[idx] = (np.arange(len(idx)) + rng.uniform(size=len(idx))) / len(idx)
+    return np.argsort(quantiles, kind='mergesort')
+
+
+def _min_resources(order, strata, n_per_stratum):
+    """Return the length of the shortest prefix of the order with n_per_stratum samples of every stratum.
+
+    A stratum with fewer samples needs all of them.
+    """
+    ordered_strata = strata[order]
+    n_resources = 0
+    for stratum in np.unique(strata):
+        positions = np.flatnonzero(ordered_strata == stratum)
+        n_resources = max(n_resources, positions[min(n_per_stratum, len(positions)) - 1] + 1)
+    return int(n_resources)
+
+
+class UpliftHalvingSearchCV(BaseEstimator):
+    """Search over specified parameter values for an uplift approach with successive halving.
+
+    All candidates are evaluated on a small subsample of rows at the first iteration (rung). Only the best
+    ``1 / factor`` candidates are kept for the next rung, which uses ``factor`` times more rows, until the last
+    rung that uses ``max_resources`` rows. The subsamples keep the proportions of the treatment and target
+    groups, and every rung is cross-validated the same way as in :class:`.UpliftGridSearchCV`.
+
+    Args:
+        estimator (estimator object): An uplift approach implementing ``fit(X, y, treatment)`` and ``predict``.
+        param_grid (dict or list of dicts): Dictionary with parameters names as keys and lists of parameter values,
+            see :class:`~sklearn.model_selection.ParameterGrid`.
+        factor (int or float, default=3): The proportion of candidates kept at each iteration and the growth rate
+            of the number of rows. Must be greater than 1.
+        min_resources (int, optional): The number of rows used at the first iteration. If None, it is chosen so that
+            the last iteration uses ``max_resources`` rows. The number of rows of an iteration is never less
+            than ``20 * cv`` and than the number of rows that holds ``2 * cv`` samples of every treatment
+            (and binary target) group, so every test fold has both treatment groups and positive targets in them.
+        max_resources (int, optional): The maximal number of rows used by a candidate. Defaults to the number of
+            samples.
+        scoring (string or callable, default='qini_auc_score'): Uplift metric: 'qini_auc_score',
+            'uplift_auc_score', 'uplift_at_k', 'weighted_average_uplift' or a callable
+            ``scoring(y_true, uplift, treatment)``. Greater is better.
+        scoring_params (dict, optional): Additional parameters to be passed to the metric.
+        cv (int, default=3): The number of folds.
+        refit (bool, default=True): Refit the estimator with the best found parameters on the whole dataset.
+        n_jobs (int, default=None): The number of jobs to run in parallel.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int or None, default=None): Seed of the subsampling and of the shuffling before splitting
+            into folds.
+
+    Attributes:
+        cv_results_ (dict): Parameters and test scores of every candidate at every iteration: ``params``, ``iter``,
+            ``n_resources``, ``split<k>_test_score``, ``mean_test_score``, ``std_test_score`` and
+            ``rank_test_score`` (rank within the iteration, candidates with nan mean scores are ranked last).
+        n_iterations_ (int): The number of iterations that were run.
+        n_resources_ (list of int): The number of rows used at each iteration.
+        n_candidates_ (list of int): The number of candidates evaluated at each iteration.
+        best_index_ (int): The index of the best candidate of the last iteration in ``cv_results_``.
+        best_params_ (dict): Parameter setting that gave the best results at the last iteration.
+        best_score_ (float): Mean cross-validated score of the best candidate at the last iteration.
+        best_estimator_ (estimator object): Estimator refitted with the best parameters if ``refit`` is True.
+
+    Example::
+
+        from catboost import CatBoostClassifier
+        from sklift.models import TwoModels
+        from sklift.model_selection import UpliftHalvingSearchCV
+
+
+        search = UpliftHalvingSearchCV(
+            TwoModels(CatBoostClassifier(verbose=0), CatBoostClassifier(verbose=0)),
+            param_grid={'estimator_trmnt__depth': [4, 6, 8], 'estimator_ctrl__depth': [4, 6, 8],
+                        'estimator_trmnt__learning_rate': [0.03, 0.1, 0.3]},
+            factor=3, scoring='qini_auc_score', random_state=42
+        )
+        search = search.fit(X_train, y_train, treat_train)
+        print(search.n_candidates_, search.n_resources_)
+
+    See Also:
+
+        * :class:`.UpliftGridSearchCV`: Exhaustive search over specified parameter values for an uplift approach.
+    """
+
+    def __init__(self, estimator, param_grid, factor=3, min_resources=None, max_resources=None,
+                 scoring='qini_auc_score', scoring_params=None, cv=3, refit=True, n_jobs=None, random_state=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.factor = factor
+        self.min_resources = min_resources
+        self.max_resources = max_resources
+        self.scoring = scoring
+        self.scoring_params = scoring_params
+        self.cv = cv
+        self.refit = refit
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _resources_schedule(self, n_samples, n_candidates, min_rows=0):
+        """Return the number of rows used at every iteration, at least min_rows."""
+        if not isinstance(self.factor, numbers.Real) or not self.factor > 1:
+            raise ValueError("factor must be a number greater than 1, got %s" % self.factor)
+
+        max_resources = n_samples if self.max_resources is None else self.max_resources
+        if not 0 < max_resources <= n_samples:
+            raise ValueError("max_resources must be in range (0, %s], got %s" % (n_samples, self.max_resources))
+        if self.min_resources is not None and self.min_resources > max_resources:
+            raise ValueError("min_resources must not be greater than max_resources, got %s > %s"
+                             % (self.min_resources, max_resources))
+
+        n_iterations = int(np.floor(np.log(n_candidates) / np.log(self.factor))) + 1
+        if self.min_resources is None:
+            schedule = [int(max_resources // self.factor ** (n_iterations - 1 - i)) for i in range(n_iterations)]
+        else:
+            n_iterations = min(n_iterations,
+                               int(np.floor(np.log(max_resources / self.min_resources) / np.log(self.factor))) + 1)
+            schedule = [int(self.min_resources * self.factor ** i) for i in range(n_iterations)]
+
+        min_rows = max(min_rows, 20 * self.cv)
+        return [min(max(n_resources, min_rows), max_resources) for n_resources in schedule]
+
+    def fit(self, X, y, treatment, **fit_params):
+        """Run successive halving over all sets of parameters.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            **fit_params (dict of string -> object): Parameters passed to the ``fit`` method of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        check_is_binary(treatment)
+        y, treatment = np.asarray(y), np.asarray(treatment)
+
+        scorer = _check_scoring(self.scoring, self.scoring_params)
+        candidates = list(ParameterGrid(self.param_grid))
+        order = _stratified_order(y, treatment, self.random_state)
+        min_rows = _min_resources(order, _strata(y, treatment), 2 * self.cv)
+        schedule = self._resources_schedule(len(y), len(candidates), min_rows)
+
+        results = {'params': [], 'iter': [], 'n_resources': [], 'scores': [], 'rank_test_score': []}
+        self.n_resources_, self.n_candidates_ = [], []
+        first_index = 0
+
+        for n_resources in schedule:
+            rows = np.sort(order[:n_resources])
+            folds = [(rows[train], rows[test])
+                     for train, test in _uplift_folds(y[rows], treatment[rows], self.cv, self.random_state)]
+            scores = _evaluate_candidates(self.estimator, candidates, X, y, treatment, folds, fit_params, scorer,
+                                          self.n_jobs)
+
+            ranking = _rank_candidates(scores.mean(axis=1))
+            ranks = np.empty(len(candidates), dtype=np.int32)
+            ranks[ranking] = np.arange(1, len(candidates) + 1)
+
+            results['params'].extend(candidates)
+            results['iter'].extend([len(self.n_resources_)] * len(candidates))
+            results['n_resources'].extend([n_resources] * len(candidates))
+            results['scores'].append(scores)
+            results['rank_test_score'].append(ranks)
+            self.n_resources_.append(n_resources)
+            self.n_candidates_.append(len(candidates))
+
+            if len(candidates) == 1 or len(self.n_resources_) == len(schedule):
+                break
+            first_index += len(candidates)
+            n_kept = max(1, int(np.ceil(len(candidates) / self.factor)))
+            candidates = [candidates[pos] for pos in ranking[:n_kept]]
+
+        self.n_iterations_ = len(self.n_resources_)
+        scores = np.vstack(results.pop('scores'))
+        self.cv_results_ = {
+            'params': results['params'],
+            'iter': np.asarray(results['iter']),
+            'n_resources': np.asarray(results['n_resources']),
+        }
+        for k in range(scores.shape[1]):
+            self.cv_results_['split%d_test_score' % k] = scores[:, k]
+        self.cv_results_.update(mean_test_score=scores.mean(axis=1), std_test_score=scores.std(axis=1),
+                                rank_test_score=np.concatenate(results['rank_test_score']))
+
+        self.best_index_ = first_index + int(ranking[0])
+        self.best_params_ = self.cv_results_['params'][self.best_index_]
+        self.best_score_ = self.cv_results_['mean_test_score'][self.best_index_]
+
+        if self.refit:
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_)
+            self.best_estimator_.fit(X, y, treatment, **fit_params)
+        return self
+
+    def predict(self, X):
+        """Perform uplift on samples in X with the best found estimator.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.best_estimator_.predict(X)
@@ -1,3 +1,16 @@
-from .models import SoloModel, ClassTransformation, ClassTransformationReg, TwoModels
+from .models import (
+    SoloModel, ClassTransformation, ClassTransformationReg, TwoModels,
+    MultiTreatmentTwoModels, MultiTreatmentSoloModel
+)
+from .tree import UpliftTreeClassifier, UpliftRandomForestClassifier
+from .meta import XLearner, RLearner, DRLearner, NuisanceCache
+from .pipeline import UpliftPipeline, make_uplift_pipeline
+from .distill import UpliftDistiller
 
-__all__ = [SoloModel, ClassTransformation, ClassTransformationReg, TwoModels]
+__all__ = [
+    SoloModel, ClassTransformation, ClassTransformationReg, TwoModels,
+    MultiTreatmentTwoModels, MultiTreatmentSoloModel,
+    UpliftTreeClassifier, UpliftRandomForestClassifier,
+    XLearner, RLearner, DRLearner, NuisanceCache,
+    UpliftPipeline, make_uplift_pipeline, UpliftDistiller
+]
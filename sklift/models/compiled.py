@@ -0,0 +1,265 @@
+import numpy as np
+from sklearn.base import is_classifier
+from sklearn import linear_model
+from sklearn.ensemble import ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.svm import LinearSVR
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+TREE_ESTIMATORS = (DecisionTreeClassifier, DecisionTreeRegressor)
+FOREST_ESTIMATORS = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+
+# looked up by name, as some of them are missing in older versions of scikit-learn
+IDENTITY_REGRESSORS = tuple(getattr(linear_model, name) for name in (
+    'LinearRegression', 'Ridge', 'RidgeCV', 'Lasso', 'LassoCV', 'ElasticNet', 'ElasticNetCV', 'Lars', 'LarsCV',
+    'LassoLars', 'LassoLarsCV', 'LassoLarsIC', 'OrthogonalMatchingPursuit', 'OrthogonalMatchingPursuitCV',
+    'BayesianRidge', 'ARDRegression', 'HuberRegressor', 'TheilSenRegressor', 'SGDRegressor',
+    'PassiveAggressiveRegressor', 'QuantileRegressor',
+) if hasattr(linear_model, name)) + (LinearSVR,)
+LOG_REGRESSORS = tuple(getattr(linear_model, name) for name in ('PoissonRegressor', 'GammaRegressor')
+                       if hasattr(linear_model, name))
+
+
+def _linear_params(estimator):
+    """Extract coefficients, intercept and link function of a fitted linear estimator.
+
+    Args:
+        estimator (estimator object): Fitted linear regressor, generalized linear regressor or binary classifier.
+
+    Returns:
+        tuple: (coef (1d array), intercept (float), link ('identity', 'log' or 'logistic'))
+    """
+    if not (hasattr(estimator, 'coef_') and hasattr(estimator, 'intercept_')):
+        raise ValueError("Expected a fitted linear estimator with coef_ and intercept_ attributes, got %s"
+                         % type(estimator).__name__)
+
+    coef = np.asarray(estimator.coef_, dtype=np.float64)
+    intercept = np.ravel(np.asarray(estimator.intercept_, dtype=np.float64))
+
+    if coef.ndim == 2 and coef.shape[0] != 1:
+        raise ValueError("Only single output linear estimators can be compiled, got coef_ of shape %s"
+                         % (coef.shape,))
+
+    if is_classifier(estimator):
+        is_logistic = (
+            isinstance(estimator, LogisticRegression) or
+            (isinstance(estimator, SGDClassifier) and estimator.loss in ('log', 'log_loss'))
+        )
+        if not is_logistic:
+            raise ValueError("Only LogisticRegression and SGDClassifier with logistic loss classifiers can be "
+                             "compiled, got %s" % type(estimator).__name__)
+        if len(estimator.classes_) != 2:
+            raise ValueError("Only binary classifiers can be compiled, got %s classes" % len(estimator.classes_))
+        # a binary multinomial model gives the softmax of (-score, score), that is the sigmoid of 2 * score;
+        # multi_class is deprecated in recent scikit-learn versions, where binary models are always logistic
+        if isinstance(estimator, LogisticRegression) and getattr(estimator, 'multi_class', None) == 'multinomial':
+            coef, intercept = 2 * coef, 2 * intercept
+        link = 'logistic'
+    elif isinstance(estimator, IDENTITY_REGRESSORS):
+        link = 'identity'
+    elif isinstance(estimator, LOG_REGRESSORS):
+        link = 'log'
+    elif type(estimator).__name__ == 'TweedieRegressor':
+        link = estimator.link
+        if link == 'auto':
+            link = 'identity' if estimator.power <= 0 else 'log'
+    else:
+        raise ValueError("Only linear regressors with identity link and generalized linear regressors of "
+                         "scikit-learn can be compiled, got %s" % type(estimator).__name__)
+
+    return coef.ravel(), float(intercept[0]) if intercept.size else 0., link
+
+
+class LinearUpliftPredictor:
+    """Lightweight predictor of treatment and control scores of fitted linear uplift models.
+
+    Both scores are computed with a single matrix product ``X @ coef_ + intercept_``, where the first column of
+    ``coef_`` gives the treatment score and the second one gives the control score.
+    Created by ``compile`` method of :class:`.SoloModel` and :class:`.TwoModels`.
+
+    Args:
+        coef (array-like, shape (n_features, 2)): Stacked weights of treatment and control scores.
+        intercept (array-like, shape (2, )): Intercepts of treatment and control scores.
+        link (string, 'identity', 'log' or 'logistic', default='identity'): Inverse of the link function
+            applied to the scores: none, exponent or sigmoid.
+    """
+
+    def __init__(self, coef, intercept, link='identity'):
+        self.coef_ = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept_ = np.asarray(intercept, dtype=np.float64)
+        self.link = link
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Feature matrix with the same columns, in the same order,
+                as used for fitting.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+        scores = np.asarray(X, dtype=np.float64) @ self.coef_
+        scores += self.intercept_
+        if self.link == 'logistic':
+            with np.errstate(over='ignore'):
+                scores = 1 / (1 + np.exp(-scores))
+        elif self.link == 'log':
+            scores = np.exp(scores)
+        trmnt_preds, ctrl_preds = scores[:, 0], scores[:, 1]
+        return trmnt_preds - ctrl_preds, trmnt_preds, ctrl_preds
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Feature matrix with the same columns, in the same order,
+                as used for fitting.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.predict_components(X)[0]
+
+
+def _is_tree_model(estimator):
+    return isinstance(estimator, TREE_ESTIMATORS + FOREST_ESTIMATORS)
+
+
+def _tree_leaf_values(estimator, tree):
+    """Return the prediction stored in every node of a fitted tree: positive class probability or mean target."""
+    value = tree.value[:, 0, :]
+    if is_classifier(estimator):
+        if len(estimator.classes_) != 2:
+            raise ValueError("Only binary classification trees can be compiled, got %s classes"
+                             % len(estimator.classes_))
+        return value[:, 1] / value.sum(axis=1)
+    return value[:, 0]
+
+
+def _flatten_tree_models(estimators):
+    """Flatten the trees of several fitted tree models into contiguous node arrays.
+
+    Args:
+        estimators (list of estimator objects): Fitted decision trees or forests.
+
+    Returns:
+        dict: node arrays of all trees (children of a leaf point to the leaf itself), root of every tree,
+        weights of shape (n_trees, n_estimators) averaging the leaves of each model and the maximal depth.
+        The side where missing values go at every node is None if the trees do not support missing values
+        (scikit-learn < 1.3).
+    """
+    features, thresholds, lefts, rights, values, roots, owners = [], [], [], [], [], [], []
+    missing_go_to_left = []
+    max_depth, offset, n_trees = 0, 0, []
+
+    for pos, estimator in enumerate(estimators):
+        trees = [estimator] if isinstance(estimator, TREE_ESTIMATORS) else estimator.estimators_
+        n_trees.append(len(trees))
+        for tree_estimator in trees:
+            tree = tree_estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(_tree_leaf_values(estimator, tree))
+            if hasattr(tree, 'missing_go_to_left'):
+                missing_go_to_left.append(np.asarray(tree.missing_go_to_left, dtype=bool))
+            roots.append(offset)
+            owners.append(pos)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+    weights = np.zeros((len(roots), len(estimators)))
+    weights[np.arange(len(roots)), owners] = 1. / np.asarray(n_trees)[owners]
+
+    return {
+        'feature': np.concatenate(features).astype(np.intp),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts).astype(np.intp),
+        'right': np.concatenate(rights).astype(np.intp),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.intp),
+        'weights': weights,
+        'max_depth': max_depth,
+        'missing_go_to_left': np.concatenate(missing_go_to_left) if len(missing_go_to_left) == len(roots) else None,
+    }
+
+
+class TreeUpliftPredictor:
+    """Lightweight predictor of treatment and control scores of fitted tree-based uplift models.
+
+    Nodes of all trees of both models are stored in a few contiguous arrays, and every sample goes down
+    all trees at once with a vectorized traversal, level by level. Missing values go to the side chosen by
+    the trees (``missing_go_to_left``, scikit-learn >= 1.3); with older versions of scikit-learn, X must not
+    contain NaN.
+    Created by ``compile`` method of :class:`.TwoModels`.
+
+    Args:
+        estimator_trmnt (estimator object): Fitted decision tree or forest of the treatment group.
+        estimator_ctrl (estimator object): Fitted decision tree or forest of the control group.
+        batch_size (int, default=65536): Maximal number of (sample, tree) pairs traversed at once.
+            Limits the memory used by large inputs.
+    """
+
+    def __init__(self, estimator_trmnt, estimator_ctrl, batch_size=65536):
+        nodes = _flatten_tree_models([estimator_trmnt, estimator_ctrl])
+        self.feature_ = nodes['feature']
+        self.threshold_ = nodes['threshold']
+        self.left_ = nodes['left']
+        self.right_ = nodes['right']
+        self.value_ = nodes['value']
+        self.roots_ = nodes['roots']
+        self.weights_ = nodes['weights']
+        self.max_depth_ = nodes['max_depth']
+        self.missing_go_to_left_ = nodes['missing_go_to_left']
+        self.batch_size = batch_size
+
+    def _scores(self, X, has_missing):
+        node = np.broadcast_to(self.roots_, (X.shape[0], self.roots_.shape[0]))
+        rows = np.arange(X.shape[0]).reshape(-1, 1)
+        for _ in range(self.max_depth_):
+            values = X[rows, self.feature_[node]]
+            go_left = values <= self.threshold_[node]
+            if has_missing:
+                go_left |= np.isnan(values) & self.missing_go_to_left_[node]
+            node = np.where(go_left, self.left_[node], self.right_[node])
+        return self.value_[node] @ self.weights_
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Feature matrix with the same columns, in the same order,
+                as used for fitting.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+        # scikit-learn trees compare features in float32
+        X = np.asarray(X, dtype=np.float32)
+        has_missing = bool(np.isnan(X).any())
+        if has_missing and self.missing_go_to_left_ is None:
+            raise ValueError("Input X contains NaN, which the trees of scikit-learn < 1.3 do not support.")
+        step = max(1, self.batch_size // len(self.roots_))
+        scores = np.empty((X.shape[0], 2))
+        for start in range(0, X.shape[0], step):
+            scores[start:start + step] = self._scores(X[start:start + step], has_missing)
+        trmnt_preds, ctrl_preds = scores[:, 0], scores[:, 1]
+        return trmnt_preds - ctrl_preds, trmnt_preds, ctrl_preds
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Feature matrix with the same columns, in the same order,
+                as used for fitting.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.predict_components(X)[0]
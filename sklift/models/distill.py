@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+from sklearn.base import BaseEstimator
+from sklearn.utils.validation import check_consistent_length
+
+from .models import _take_rows
+from ..metrics import qini_auc_score
+
+
+def _median_latency(predict, X, n_repeats):
+    """Median wall time of ``predict(X)`` in seconds."""
+    timings = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        predict(X)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+class UpliftDistiller(BaseEstimator):
+    """Distill a fitted uplift approach into a compact student model.
+
+    The teacher, e.g. :class:`.TwoModels` with two large boosting ensembles, predicts uplift on a reference
+    dataset, and the student, e.g. a shallow :class:`~sklearn.tree.DecisionTreeRegressor` or a linear regressor,
+    is fitted directly on these predictions. The reference dataset does not need target or treatment, so
+    unlabeled data may be used. :meth:`report` compares the quality and the latency of both models.
+
+    Args:
+        teacher (estimator object): Fitted uplift approach implementing ``predict``.
+        student (estimator object implementing 'fit'): Regressor to fit on the uplift predicted by the teacher.
+
+    Example::
+
+        from sklearn.tree import DecisionTreeRegressor
+        from sklift.models import UpliftDistiller
+
+
+        distiller = UpliftDistiller(tm, DecisionTreeRegressor(max_depth=6))  # tm is a fitted TwoModels
+        distiller = distiller.fit(X_reference)
+        print(distiller.report(X_val, y_val, treat_val))
+        uplift = distiller.predict(X_online)  # predict uplift with the student
+
+    See Also:
+
+        * :meth:`.TwoModels.compile`: Compile a fitted model into a lightweight predictor without loss of quality.
+    """
+
+    def __init__(self, teacher, student):
+        self.teacher = teacher
+        self.student = student
+
+    def _teacher_predict(self, X):
+        """Uplift of the teacher, computed without storing the arm predictions on it when possible."""
+        if hasattr(self.teacher, 'predict_components'):
+            return self.teacher.predict_components(X)[0]
+        return self.teacher.predict(X)
+
+    def fit(self, X, student_fit_params=None):
+        """Fit the student on the uplift predicted by the teacher on the reference data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Reference vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            student_fit_params (dict, optional): Parameters to pass to the fit method of the student.
+
+        Returns:
+            object: self
+        """
+
+        if student_fit_params is None:
+            student_fit_params = {}
+        self.student.fit(X, self._teacher_predict(X), **student_fit_params)
+        return self
+
+    def predict(self, X):
+        """Perform uplift on samples in X with the student.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.student.predict(X)
+
+    def report(self, X, y, treatment, negative_effect=True, latency_batch_size=1, n_repeats=20):
+        """Compare the Qini coefficients and the prediction latency of the teacher and the student.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Validation vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Binary target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            negative_effect (bool, default=True): Passed to :func:`.qini_auc_score`.
+            latency_batch_size (int, default=1): The number of rows of X scored by one timed call.
+                Use 1 to measure the latency of online scoring.
+            n_repeats (int, default=20): The number of timed calls, the median time is reported.
+
+        Returns:
+            dict: ``teacher_qini``, ``student_qini``, ``qini_gap`` (teacher minus student), ``uplift_correlation``
+            (Pearson correlation of the predictions), ``teacher_latency`` and ``student_latency`` (median seconds
+            per call) and ``speedup`` (teacher latency divided by student latency).
+        """
+
+        check_consistent_length(X, y, treatment)
+        teacher_uplift, student_uplift = self._teacher_predict(X), self.student.predict(X)
+        teacher_qini = qini_auc_score(y, teacher_uplift, treatment, negative_effect=negative_effect)
+        student_qini = qini_auc_score(y, student_uplift, treatment, negative_effect=negative_effect)
+
+        X_batch = _take_rows(X, np.arange(min(latency_batch_size, X.shape[0])))
+        teacher_latency = _median_latency(self._teacher_predict, X_batch, n_repeats)
+        student_latency = _median_latency(self.student.predict, X_batch, n_repeats)
+
+        return {
+            'teacher_qini': teacher_qini,
+            'student_qini': student_qini,
+            'qini_gap': teacher_qini - student_qini,
+            'uplift_correlation': float(np.corrcoef(teacher_uplift, student_uplift)[0, 1]),
+            'teacher_latency': teacher_latency,
+            'student_latency': student_latency,
+            'speedup': teacher_latency / student_latency if student_latency > 0 else np.inf,
+        }
@@ -0,0 +1,323 @@
+import numpy as np
+from joblib import Parallel, delayed, hash as joblib_hash
+from sklearn.base import BaseEstimator, clone
+from sklearn.model_selection import StratifiedKFold
+from sklearn.utils.multiclass import type_of_target
+from sklearn.utils.validation import check_consistent_length
+
+from .models import _fingerprint, _fit_predict_fold, _predict_nuisance, _take_rows
+from ..utils import check_is_binary
+
+
+class NuisanceCache:
+    """Storage of cross-fitted nuisance models shared between meta-learners.
+
+    Out-of-fold predictions of the outcome and propensity models are stored by a key built from the training data,
+    the nuisance estimator and the cross-fitting settings. The training data is recognised by the shapes and a hash
+    of 1000 evenly spaced rows of X, y and treatment, so the lookup costs the same for any data size;
+    :meth:`clear` the cache after modifying the data in place. Meta-learners fitted on the same data with the same
+    cache reuse them, so switching between :class:`.XLearner`, :class:`.RLearner` and :class:`.DRLearner`
+    costs only the fit of the final model.
+
+    The cache is shared, not copied, when the learner is cloned.
+
+    Example::
+
+        from sklift.models import NuisanceCache, XLearner, DRLearner
+        from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+
+
+        cache = NuisanceCache()
+        x_learner = XLearner(GradientBoostingClassifier(), GradientBoostingRegressor(), cache=cache)
+        x_learner = x_learner.fit(X_train, y_train, treat_train)  # fits the nuisance models
+        dr_learner = DRLearner(GradientBoostingClassifier(), GradientBoostingRegressor(), cache=cache)
+        dr_learner = dr_learner.fit(X_train, y_train, treat_train)  # reuses them
+    """
+
+    def __init__(self):
+        self._store = {}
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def get(self, key):
+        return self._store.get(key)
+
+    def set(self, key, value):
+        self._store[key] = value
+
+    def clear(self):
+        """Remove all the stored nuisance models."""
+        self._store.clear()
+
+
+class _BaseMetaLearner(BaseEstimator):
+    """Base class of cross-fitted meta-learners.
+
+    Warning: This class should not be used directly. Use derived classes instead.
+    """
+
+    _nuisance_names = ()
+
+    def __init__(self, outcome_estimator, final_estimator, propensity_estimator=None, cv=5, min_propensity=0.01,
+                 n_jobs=None, random_state=None, cache=None):
+        self.outcome_estimator = outcome_estimator
+        self.final_estimator = final_estimator
+        self.propensity_estimator = propensity_estimator
+        self.cv = cv
+        self.min_propensity = min_propensity
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.cache = cache
+
+    def _nuisance_specs(self, y, treatment):
+        """Return the estimator, the target and the mask of training rows of every nuisance model."""
+        return {
+            'outcome': (self.outcome_estimator, y, None),
+            'outcome_trmnt': (self.outcome_estimator, y, treatment == 1),
+            'outcome_ctrl': (self.outcome_estimator, y, treatment == 0),
+            'propensity': (self.propensity_estimator, treatment, None),
+        }
+
+    def _cross_fit_nuisances(self, X, y, treatment):
+        """Cross-fit the nuisance models of the learner in parallel, reusing the cached ones.
+
+        Returns:
+            dict: name of the nuisance -> (out-of-fold predictions, list of fitted fold estimators)
+        """
+        if 'propensity' in self._nuisance_names and self.propensity_estimator is None:
+            raise ValueError("%s requires `propensity_estimator`." % type(self).__name__)
+
+        strata = 2 * treatment + y if type_of_target(y) == 'binary' else treatment
+        folds = list(StratifiedKFold(n_splits=self.cv, shuffle=True, random_state=self.random_state)
+                     .split(np.zeros(len(strata)), strata))
+        specs = self._nuisance_specs(y, treatment)
+
+        data_key = _fingerprint(X, y, treatment) if self.cache is not None else None
+        keys, nuisances = {}, {}
+        for name in self._nuisance_names:
+            keys[name] = (data_key, name, joblib_hash(specs[name][0]), self.cv, self.random_state)
+            if self.cache is not None and keys[name] in self.cache:
+                nuisances[name] = self.cache.get(keys[name])
+
+        missing = [name for name in self._nuisance_names if name not in nuisances]
+        tasks = [(name, test, train if specs[name][2] is None else train[specs[name][2][train]])
+                 for name in missing for train, test in folds]
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_predict_fold)(clone(specs[name][0]), X, specs[name][1], train, test)
+            for name, test, train in tasks
+        )
+
+        for name in missing:
+            nuisances[name] = (np.empty(len(y)), [])
+        for (name, test, _), (estimator, preds) in zip(tasks, results):
+            nuisances[name][0][test] = preds
+            nuisances[name][1].append(estimator)
+
+        for name in missing:
+            if self.cache is not None:
+                self.cache.set(keys[name], nuisances[name])
+        return nuisances
+
+    def _clip_propensity(self, p):
+        return np.clip(p, self.min_propensity, 1 - self.min_propensity)
+
+    def fit(self, X, y, treatment):
+        """Fit the model according to the given training data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        check_is_binary(treatment)
+        y, treatment = np.asarray(y), np.asarray(treatment)
+
+        self.nuisances_ = self._cross_fit_nuisances(X, y, treatment)
+        self._fit_final(X, y, treatment, {name: preds for name, (preds, _) in self.nuisances_.items()})
+        return self
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.final_estimator_.predict(X)
+
+
+class XLearner(_BaseMetaLearner):
+    """X-Learner with cross-fitted outcome models.
+
+    Fit outcome models on treatment and control groups, impute individual effects of treated samples as
+    ``y - mu_0(x)`` and of control samples as ``mu_1(x) - y`` with out-of-fold predictions, and fit a final model
+    on the imputed effects of each group. The uplift is a propensity-weighted average of the two final models:
+    ``e(x) * tau_0(x) + (1 - e(x)) * tau_1(x)``, which favours the model of the larger group for imbalanced data.
+
+    Read more in the :ref:`User Guide <models>`.
+
+    Args:
+        outcome_estimator (estimator object implementing 'fit'): Model of the target, cross-fitted on each group.
+            If it is a classifier, its probability of the positive class is used.
+        final_estimator (estimator object implementing 'fit'): Regressor of the imputed effects, cloned for
+            each group.
+        propensity_estimator (estimator object with `predict_proba`): Model of the treatment probability.
+        cv (int, default=5): The number of folds for cross-fitting, stratified by treatment and binary target.
+        min_propensity (float, default=0.01): Propensity is clipped to ``[min_propensity, 1 - min_propensity]``.
+        n_jobs (int, default=None): The number of jobs to run in parallel for fitting the nuisance models.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int or None, default=None): Controls the shuffling of the folds.
+        cache (NuisanceCache, default=None): Storage of nuisance models shared with other learners.
+
+    Attributes:
+        nuisances_ (dict): Out-of-fold predictions and fold estimators of ``'outcome_trmnt'``, ``'outcome_ctrl'``
+            and ``'propensity'`` nuisance models.
+        final_estimator_trmnt_ (estimator object): Final model fitted on the treatment group.
+        final_estimator_ctrl_ (estimator object): Final model fitted on the control group.
+
+    References:
+        Künzel, Sören R. & Sekhon, Jasjeet S. & Bickel, Peter J. & Yu, Bin. (2019). Metalearners for estimating
+        heterogeneous treatment effects using machine learning. PNAS. 116 (10). 4156-4165.
+
+    See Also:
+
+        * :class:`.RLearner`: Cross-fitted R-Learner.
+        * :class:`.DRLearner`: Cross-fitted doubly robust learner.
+        * :class:`.NuisanceCache`: Storage of nuisance models shared between learners.
+    """
+
+    _nuisance_names = ('outcome_trmnt', 'outcome_ctrl', 'propensity')
+
+    def _fit_final(self, X, y, treatment, nuisances):
+        trmnt_idx, ctrl_idx = np.flatnonzero(treatment == 1), np.flatnonzero(treatment == 0)
+        effect_trmnt = y[trmnt_idx] - nuisances['outcome_ctrl'][trmnt_idx]
+        effect_ctrl = nuisances['outcome_trmnt'][ctrl_idx] - y[ctrl_idx]
+
+        self.final_estimator_trmnt_ = clone(self.final_estimator).fit(_take_rows(X, trmnt_idx), effect_trmnt)
+        self.final_estimator_ctrl_ = clone(self.final_estimator).fit(_take_rows(X, ctrl_idx), effect_ctrl)
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        propensity_estimators = self.nuisances_['propensity'][1]
+        p = self._clip_propensity(np.mean([_predict_nuisance(est, X) for est in propensity_estimators], axis=0))
+        return p * self.final_estimator_ctrl_.predict(X) + (1 - p) * self.final_estimator_trmnt_.predict(X)
+
+
+class RLearner(_BaseMetaLearner):
+    """R-Learner (Robinson's residual-on-residual regression) with cross-fitted nuisance models.
+
+    Residualize the target with the out-of-fold prediction of its marginal model ``m(x)`` and the treatment
+    with the out-of-fold propensity ``e(x)``. The final model is fitted on ``(y - m(x)) / (w - e(x))``
+    with sample weights ``(w - e(x)) ** 2``, so the final estimator must accept ``sample_weight``.
+
+    Read more in the :ref:`User Guide <models>`.
+
+    Args:
+        outcome_estimator (estimator object implementing 'fit'): Model of the target regardless of treatment.
+            If it is a classifier, its probability of the positive class is used.
+        final_estimator (estimator object implementing 'fit' with `sample_weight`): Regressor of the uplift.
+        propensity_estimator (estimator object with `predict_proba`): Model of the treatment probability.
+        cv (int, default=5): The number of folds for cross-fitting, stratified by treatment and binary target.
+        min_propensity (float, default=0.01): Propensity is clipped to ``[min_propensity, 1 - min_propensity]``.
+        n_jobs (int, default=None): The number of jobs to run in parallel for fitting the nuisance models.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int or None, default=None): Controls the shuffling of the folds.
+        cache (NuisanceCache, default=None): Storage of nuisance models shared with other learners.
+
+    Attributes:
+        nuisances_ (dict): Out-of-fold predictions and fold estimators of ``'outcome'`` and ``'propensity'``
+            nuisance models.
+        final_estimator_ (estimator object): The fitted final model.
+
+    References:
+        Nie, Xinkun & Wager, Stefan. (2021). Quasi-oracle estimation of heterogeneous treatment effects.
+        Biometrika. 108 (2). 299-319.
+
+    See Also:
+
+        * :class:`.XLearner`: Cross-fitted X-Learner.
+        * :class:`.DRLearner`: Cross-fitted doubly robust learner.
+        * :class:`.NuisanceCache`: Storage of nuisance models shared between learners.
+    """
+
+    _nuisance_names = ('outcome', 'propensity')
+
+    def _fit_final(self, X, y, treatment, nuisances):
+        treatment_residual = treatment - self._clip_propensity(nuisances['propensity'])
+        target = (y - nuisances['outcome']) / treatment_residual
+        self.final_estimator_ = clone(self.final_estimator).fit(X, target, sample_weight=treatment_residual ** 2)
+
+
+class DRLearner(_BaseMetaLearner):
+    """Doubly robust learner (DR-Learner) with cross-fitted nuisance models.
+
+    Build the doubly robust pseudo-outcome from out-of-fold predictions of the outcome models of each group
+    and the propensity ``e(x)``:
+    ``mu_1(x) - mu_0(x) + w * (y - mu_1(x)) / e(x) - (1 - w) * (y - mu_0(x)) / (1 - e(x))``,
+    and fit the final model on it.
+
+    Read more in the :ref:`User Guide <models>`.
+
+    Args:
+        outcome_estimator (estimator object implementing 'fit'): Model of the target, cross-fitted on each group.
+            If it is a classifier, its probability of the positive class is used.
+        final_estimator (estimator object implementing 'fit'): Regressor of the uplift.
+        propensity_estimator (estimator object with `predict_proba`): Model of the treatment probability.
+        cv (int, default=5): The number of folds for cross-fitting, stratified by treatment and binary target.
+        min_propensity (float, default=0.01): Propensity is clipped to ``[min_propensity, 1 - min_propensity]``.
+        n_jobs (int, default=None): The number of jobs to run in parallel for fitting the nuisance models.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int or None, default=None): Controls the shuffling of the folds.
+        cache (NuisanceCache, default=None): Storage of nuisance models shared with other learners.
+
+    Attributes:
+        nuisances_ (dict): Out-of-fold predictions and fold estimators of ``'outcome_trmnt'``, ``'outcome_ctrl'``
+            and ``'propensity'`` nuisance models.
+        final_estimator_ (estimator object): The fitted final model.
+
+    References:
+        Kennedy, Edward H. (2020). Towards optimal doubly robust estimation of heterogeneous causal effects.
+        arXiv:2004.14497.
+
+    See Also:
+
+        * :class:`.XLearner`: Cross-fitted X-Learner.
+        * :class:`.RLearner`: Cross-fitted R-Learner.
+        * :class:`.NuisanceCache`: Storage of nuisance models shared between learners.
+    """
+
+    _nuisance_names = ('outcome_trmnt', 'outcome_ctrl', 'propensity')
+
+    def _fit_final(self, X, y, treatment, nuisances):
+        p = self._clip_propensity(nuisances['propensity'])
+        mu_trmnt, mu_ctrl = nuisances['outcome_trmnt'], nuisances['outcome_ctrl']
+        pseudo_outcome = (mu_trmnt - mu_ctrl + treatment * (y - mu_trmnt) / p -
+                          (1 - treatment) * (y - mu_ctrl) / (1 - p))
+        self.final_estimator_ = clone(self.final_estimator).fit(X, pseudo_outcome)
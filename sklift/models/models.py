@@ -2,13 +2,169 @@ import warnings
 
 import numpy as np
 import pandas as pd
-from sklearn.base import BaseEstimator
+from joblib import Parallel, delayed, hash as joblib_hash
+from sklearn.base import BaseEstimator, clone, is_classifier
+from sklearn.model_selection import check_cv
+from sklearn.utils import check_random_state
 from sklearn.utils.multiclass import type_of_target
 from sklearn.utils.validation import check_consistent_length
 
+from .compiled import LinearUpliftPredictor, TreeUpliftPredictor, _is_tree_model, _linear_params
 from ..utils import check_is_binary
 
 
+def _take_rows(a, indices):
+    """Select rows of ``a`` by position.
+
+    Sorted indices forming a contiguous block (e.g. data ordered by treatment) are turned into a slice,
+    so numpy arrays are returned as views instead of copies.
+
+    Args:
+        a (array-like): numpy.ndarray, pandas.DataFrame or pandas.Series.
+        indices (1d array of int): Sorted positions of rows to select.
+    """
+    if len(indices) > 0 and indices[-1] - indices[0] + 1 == len(indices):
+        indices = slice(indices[0], indices[-1] + 1)
+    if isinstance(a, (pd.Series, pd.DataFrame)):
+        return a.iloc[indices]
+    return np.asarray(a)[indices]
+
+
+def _fingerprint(*arrays, n_rows=1000):
+    """Return a cheap fingerprint of the training data: the type, the shape and the hash of evenly spaced rows
+    of every array.
+
+    Unlike hashing all of the data, it costs the same for any number of samples, so the caches of fitted models
+    keyed by it are cheap to look up. The price is that a change of the data outside the hashed rows, e.g. an
+    in-place modification of X, is not detected.
+    """
+    fingerprint = []
+    for array in arrays:
+        shape = np.shape(array)
+        rows = np.unique(np.linspace(0, shape[0] - 1, min(n_rows, shape[0])).astype(np.intp))
+        fingerprint.append((type(array).__name__, shape, joblib_hash(_take_rows(array, rows))))
+    return tuple(fingerprint)
+
+
+def _group_indices(groups):
+    """Compute row positions of every group in one pass.
+
+    Args:
+        groups (1d array-like): Group label of each row.
+
+    Returns:
+        tuple: (unique group labels, list of sorted row positions for each label)
+    """
+    values, codes = np.unique(np.asarray(groups), return_inverse=True)
+    order = np.argsort(codes, kind='mergesort')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(values)))[:-1]
+    return values, np.split(order, bounds)
+
+
+def _check_partial_fit(estimator):
+    if not hasattr(estimator, 'partial_fit'):
+        raise TypeError("Expected estimator implementing 'partial_fit', got %s" % type(estimator).__name__)
+
+
+def _check_treatment_chunk(treatment):
+    """Checker if a chunk of treatment vector contains only 0 (0.) and 1 (1.); unlike the whole vector,
+    a chunk may contain a single group."""
+    if not np.all(np.isin(np.unique(treatment), [0, 1])):
+        raise ValueError(f"Input array is not binary. "
+                         f"Array should contain only int or float binary values 0 (or 0.) and 1 (or 1.). "
+                         f"Got values {np.unique(treatment)}.")
+
+
+def _fit_estimator(estimator, X, y, fit_params):
+    return estimator.fit(X, y, **fit_params)
+
+
+def _predict_nuisance(estimator, X):
+    """Predict the positive class probability with a classifier, the target with a regressor."""
+    if is_classifier(estimator):
+        return estimator.predict_proba(X)[:, 1]
+    return estimator.predict(X)
+
+
+def _fit_predict_fold(estimator, X, y, train, test):
+    """Fit the estimator on the train fold and predict on the test fold, see :func:`_predict_nuisance`."""
+    estimator.fit(_take_rows(X, train), _take_rows(y, train))
+    return estimator, _predict_nuisance(estimator, _take_rows(X, test))
+
+
+def _downsample(y, treatment, ratio, by, random_state):
+    """Subsample the majority group to at most ``ratio`` rows per row of the minority group.
+
+    With ``by='treatment'`` the majority arm is subsampled. With ``by='target'`` the non-responders of each arm
+    are subsampled relative to the responders of the same arm, so the treatment proportions are kept.
+    Kept rows of a subsampled group get the inverse of its sampling rate as a weight.
+
+    Returns:
+        tuple: (sorted positions of the kept rows, weights of the kept rows)
+    """
+    if by not in ('treatment', 'target'):
+        raise ValueError("downsample_by should be 'treatment' or 'target', got %s." % by)
+    if isinstance(ratio, bool) or not isinstance(ratio, (int, float)) or ratio <= 0:
+        raise ValueError("downsample_ratio should be a positive number, got %s." % ratio)
+
+    treatment = np.asarray(treatment)
+    if by == 'treatment':
+        idx_trmnt, idx_ctrl = np.flatnonzero(treatment == 1), np.flatnonzero(treatment == 0)
+        groups = [(idx_trmnt, idx_ctrl) if len(idx_trmnt) >= len(idx_ctrl) else (idx_ctrl, idx_trmnt)]
+    else:
+        if type_of_target(y) != 'binary':
+            raise ValueError("Downsampling by target is only suitable for binary classification problem")
+        y = np.asarray(y)
+        groups = [(np.flatnonzero((treatment == t) & (y == 0)), np.flatnonzero((treatment == t) & (y == 1)))
+                  for t in (0, 1)]
+
+    rng = check_random_state(random_state)
+    keep, weights = np.ones(len(treatment), dtype=bool), np.ones(len(treatment))
+    for idx_major, idx_minor in groups:
+        n_keep = max(1, int(np.ceil(ratio * len(idx_minor))))
+        if n_keep >= len(idx_major):
+            continue
+        keep[rng.choice(idx_major, len(idx_major) - n_keep, replace=False)] = False
+        weights[idx_major] = len(idx_major) / n_keep
+
+    idx = np.flatnonzero(keep)
+    return idx, weights[idx]
+
+
+def _with_sample_weight(fit_params, sample_weight):
+    """Add sample weights to the fit parameters, multiplying the ones given by the user."""
+    fit_params = {} if fit_params is None else dict(fit_params)
+    if fit_params.get('sample_weight') is not None:
+        sample_weight = np.asarray(fit_params['sample_weight']) * sample_weight
+    fit_params['sample_weight'] = sample_weight
+    return fit_params
+
+
+def _staged_predict_target(estimator, X, type_of_y):
+    """Iterate over the staged positive class probabilities or staged predictions of a boosting estimator."""
+    method = 'staged_predict_proba' if type_of_y == 'binary' else 'staged_predict'
+    if not hasattr(estimator, method):
+        raise TypeError("Estimator %s does not implement %s" % (type(estimator).__name__, method))
+    for preds in getattr(estimator, method)(X):
+        yield preds[:, 1] if type_of_y == 'binary' else preds
+
+
+def _lockstep(*iterators):
+    """Iterate over several iterators at once, repeating the last item of the exhausted ones until all are done."""
+    iterators = [iter(iterator) for iterator in iterators]
+    items = [next(iterator) for iterator in iterators]
+    yield items
+    while True:
+        active = False
+        for pos, iterator in enumerate(iterators):
+            item = next(iterator, None)
+            if item is not None:
+                items[pos], active = item, True
+        if not active:
+            return
+        yield items
+
+
 class SoloModel(BaseEstimator):
     """aka Treatment Dummy approach, or Single model approach, or S-Learner.
 
@@ -29,6 +185,9 @@ class SoloModel(BaseEstimator):
                 Single model;
             * ``'treatment_interaction'``:
                 Single model including treatment interactions.
+        store_predictions (bool, default=True): Whether to save the last predictions of :meth:`predict`
+            to ``trmnt_preds_`` and ``ctrl_preds_``. Set to False to keep :meth:`predict` free of side effects,
+            e.g. when a fitted model is shared between threads.
 
     Attributes:
         trmnt_preds_ (array-like, shape (n_samples, )): Estimator predictions on samples when treatment.
@@ -63,9 +222,10 @@ class SoloModel(BaseEstimator):
         * :func:`.plot_uplift_preds`: Plot histograms of treatment, control and uplift predictions.
     """
 
-    def __init__(self, estimator, method='dummy'):
+    def __init__(self, estimator, method='dummy', store_predictions=True):
         self.estimator = estimator
         self.method = method
+        self.store_predictions = store_predictions
         self.trmnt_preds_ = None
         self.ctrl_preds_ = None
         self._type_of_target = None
@@ -101,6 +261,54 @@ class SoloModel(BaseEstimator):
         if len(treatment_values) != 2:
             raise ValueError("Expected only two unique values in treatment vector, got %s" % len(treatment_values))
 
+        X_mod = self._add_treatment(X, treatment)
+        self._type_of_target = type_of_target(y)
+
+        if estimator_fit_params is None:
+            estimator_fit_params = {}
+        self.estimator.fit(X_mod, y, **estimator_fit_params)
+        return self
+
+    def partial_fit(self, X, y, treatment, classes=None, estimator_partial_fit_params=None):
+        """Incrementally fit the model on a chunk of training data.
+
+        Use it to train on data which does not fit into memory. The estimator must implement ``partial_fit``,
+        e.g. :class:`~sklearn.linear_model.SGDClassifier` or :class:`~sklearn.naive_bayes.MultinomialNB`.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            classes (array-like, shape (n_classes,), optional): All classes of the target. Required
+                by classifiers on the first call.
+            estimator_partial_fit_params (dict, optional): Parameters to pass to the partial_fit method
+                of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        _check_treatment_chunk(treatment)
+        _check_partial_fit(self.estimator)
+
+        if classes is not None:
+            self._type_of_target = type_of_target(classes)
+        elif self._type_of_target is None:
+            self._type_of_target = type_of_target(y)
+
+        if estimator_partial_fit_params is None:
+            estimator_partial_fit_params = {}
+        if classes is not None:
+            estimator_partial_fit_params = dict(estimator_partial_fit_params, classes=classes)
+
+        self.estimator.partial_fit(self._add_treatment(X, treatment), y, **estimator_partial_fit_params)
+        return self
+
+    def _add_treatment(self, X, treatment):
+        """Append the treatment (and its interactions with features) to the training vector."""
+
         if self.method == 'dummy':
             if isinstance(X, np.ndarray):
                 X_mod = np.column_stack((X, treatment))
@@ -122,12 +330,33 @@ class SoloModel(BaseEstimator):
             else:
                 raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
 
-        self._type_of_target = type_of_target(y)
+        return X_mod
 
-        if estimator_fit_params is None:
-            estimator_fit_params = {}
-        self.estimator.fit(X_mod, y, **estimator_fit_params)
-        return self
+    def _add_counterfactual_treatment(self, X):
+        """Stack the copies of X with treatment equal to 1 and to 0, so that both are scored with one call.
+
+        Used by :meth:`staged_predict` to make a single pass over the stages of the estimator.
+
+        Returns:
+            array-like (shape (2 * n_samples, n_features_mod)): treatment copy followed by control copy.
+        """
+
+        if isinstance(X, pd.DataFrame):
+            n_samples = X.shape[0]
+            return pd.concat([self._add_treatment(X, np.ones(n_samples)),
+                              self._add_treatment(X, np.zeros(n_samples))], ignore_index=True)
+        if not isinstance(X, np.ndarray):
+            raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
+
+        n_samples, n_features = X.shape
+        n_features_mod = n_features + 1 if self.method == 'dummy' else 2 * n_features + 1
+        X_mod = np.zeros((2 * n_samples, n_features_mod), dtype=np.result_type(X, np.float64))
+        X_mod[:n_samples, :n_features] = X
+        X_mod[n_samples:, :n_features] = X
+        if self.method == 'treatment_interaction':
+            X_mod[:n_samples, n_features:-1] = X
+        X_mod[:n_samples, -1] = 1
+        return X_mod
 
     def predict(self, X):
         """Perform uplift on samples in X.
@@ -140,45 +369,84 @@ class SoloModel(BaseEstimator):
             array (shape (n_samples,)): uplift
         """
 
-        if self.method == 'dummy':
-            if isinstance(X, np.ndarray):
-                X_mod_trmnt = np.column_stack((X, np.ones(X.shape[0])))
-                X_mod_ctrl = np.column_stack((X, np.zeros(X.shape[0])))
-            elif isinstance(X, pd.DataFrame):
-                X_mod_trmnt = X.assign(treatment=np.ones(X.shape[0]))
-                X_mod_ctrl = X.assign(treatment=np.zeros(X.shape[0]))
-            else:
-                raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
+        uplift, trmnt_preds, ctrl_preds = self.predict_components(X)
+        if self.store_predictions:
+            self.trmnt_preds_, self.ctrl_preds_ = trmnt_preds, ctrl_preds
+        return uplift
 
-        if self.method == 'treatment_interaction':
-            if isinstance(X, np.ndarray):
-                X_mod_trmnt = np.column_stack((X, np.multiply(X, np.ones((X.shape[0], 1))), np.ones(X.shape[0])))
-                X_mod_ctrl = np.column_stack((X, np.multiply(X, np.zeros((X.shape[0], 1))), np.zeros(X.shape[0])))
-            elif isinstance(X, pd.DataFrame):
-                X_mod_trmnt = pd.concat([
-                    X,
-                    X.apply(lambda x: x * np.ones(X.shape[0]))
-                        .rename(columns=lambda x: str(x) + '_treatment_interaction')
-                ], axis=1) \
-                    .assign(treatment=np.ones(X.shape[0]))
-                X_mod_ctrl = pd.concat([
-                    X,
-                    X.apply(lambda x: x * np.zeros(X.shape[0]))
-                        .rename(columns=lambda x: str(x) + '_treatment_interaction')
-                ], axis=1) \
-                    .assign(treatment=np.zeros(X.shape[0]))
-            else:
-                raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Unlike :meth:`predict`, it never modifies the model, so it is safe to call concurrently.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
 
+        if not isinstance(X, (np.ndarray, pd.DataFrame)):
+            raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
+
+        # the copies with treatment and with control are built and scored one after another,
+        # so only one of them is held in memory at a time
+        n_samples = X.shape[0]
         if self._type_of_target == 'binary':
-            self.trmnt_preds_ = self.estimator.predict_proba(X_mod_trmnt)[:, 1]
-            self.ctrl_preds_ = self.estimator.predict_proba(X_mod_ctrl)[:, 1]
+            trmnt_preds = self.estimator.predict_proba(self._add_treatment(X, np.ones(n_samples)))[:, 1]
+            ctrl_preds = self.estimator.predict_proba(self._add_treatment(X, np.zeros(n_samples)))[:, 1]
         else:
-            self.trmnt_preds_ = self.estimator.predict(X_mod_trmnt)
-            self.ctrl_preds_ = self.estimator.predict(X_mod_ctrl)
+            trmnt_preds = self.estimator.predict(self._add_treatment(X, np.ones(n_samples)))
+            ctrl_preds = self.estimator.predict(self._add_treatment(X, np.zeros(n_samples)))
 
-        uplift = self.trmnt_preds_ - self.ctrl_preds_
-        return uplift
+        uplift = trmnt_preds - ctrl_preds
+        return uplift, trmnt_preds, ctrl_preds
+
+    def staged_predict(self, X):
+        """Perform uplift on samples in X after every boosting iteration of the estimator.
+
+        Both counterfactual copies of X are stacked and scored by one pass of ``staged_predict_proba``
+        (``staged_predict`` for regression) of the estimator, e.g. :class:`~sklearn.ensemble.GradientBoostingClassifier`.
+        Use it with :func:`.qini_auc_score_by_stage` to choose the number of iterations without refitting.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Yields:
+            array (shape (n_samples,)): uplift after every iteration.
+        """
+
+        X_mod = self._add_counterfactual_treatment(X)
+        n_samples = X_mod.shape[0] // 2
+        for preds in _staged_predict_target(self.estimator, X_mod, self._type_of_target):
+            yield preds[:n_samples] - preds[n_samples:]
+
+    def compile(self):
+        """Compile the fitted model with a linear estimator into a lightweight predictor.
+
+        The treatment and control scores of a linear estimator differ only in the treatment terms, so both of them
+        are computed by the returned predictor with a single matrix product, without building augmented copies of X.
+        Supported estimators are linear regressors, :class:`~sklearn.linear_model.LogisticRegression` and
+        :class:`~sklearn.linear_model.SGDClassifier` with logistic loss. Generalized linear regressors, e.g.
+        :class:`~sklearn.linear_model.PoissonRegressor`, are compiled with their link function.
+
+        Returns:
+            LinearUpliftPredictor: predictor with ``predict`` and ``predict_components`` methods.
+        """
+
+        coef, intercept, link = _linear_params(self.estimator)
+
+        if self.method == 'dummy':
+            coef_x, coef_t = coef[:-1], coef[-1]
+            coef_trmnt, coef_ctrl = coef_x, coef_x
+        else:
+            n_features = (coef.shape[0] - 1) // 2
+            coef_x, coef_inter, coef_t = coef[:n_features], coef[n_features:-1], coef[-1]
+            coef_trmnt, coef_ctrl = coef_x + coef_inter, coef_x
+
+        return LinearUpliftPredictor(np.column_stack((coef_trmnt, coef_ctrl)), [intercept + coef_t, intercept], link)
 
 
 class ClassTransformation(BaseEstimator):
@@ -197,6 +465,17 @@ class ClassTransformation(BaseEstimator):
 
     Args:
         estimator (estimator object implementing 'fit'): The object to use to fit the data.
+        downsample_ratio (float, optional): If set, :meth:`fit` subsamples the majority group to at most
+            ``downsample_ratio`` rows per row of the minority group and passes the inverse of the sampling rate
+            as ``sample_weight`` to the estimator, so that the estimates stay unbiased. The estimator must accept
+            ``sample_weight``.
+        downsample_by (string, 'treatment' or 'target', default='treatment'): The groups to balance:
+
+            * ``'treatment'``:
+                The majority arm is subsampled;
+            * ``'target'``:
+                The non-responders of each arm are subsampled relative to the responders of the arm.
+        random_state (int, RandomState instance or None, default=None): Seed of the subsampling.
 
     Example::
 
@@ -226,8 +505,11 @@ class ClassTransformation(BaseEstimator):
         * :class:`.TwoModels`: Double classifier approach.
     """
 
-    def __init__(self, estimator):
+    def __init__(self, estimator, downsample_ratio=None, downsample_by='treatment', random_state=None):
         self.estimator = estimator
+        self.downsample_ratio = downsample_ratio
+        self.downsample_by = downsample_by
+        self.random_state = random_state
         self._type_of_target = None
 
     def fit(self, X, y, treatment, estimator_fit_params=None):
@@ -255,9 +537,57 @@ class ClassTransformation(BaseEstimator):
 
         if estimator_fit_params is None:
             estimator_fit_params = {}
+
+        if self.downsample_ratio is not None:
+            idx, weights = _downsample(y, treatment, self.downsample_ratio, self.downsample_by, self.random_state)
+            if estimator_fit_params.get('sample_weight') is not None:
+                estimator_fit_params = dict(estimator_fit_params,
+                                            sample_weight=np.asarray(estimator_fit_params['sample_weight'])[idx])
+            X, y_mod = _take_rows(X, idx), y_mod[idx]
+            estimator_fit_params = _with_sample_weight(estimator_fit_params, weights)
+
         self.estimator.fit(X, y_mod, **estimator_fit_params)
         return self
 
+    def partial_fit(self, X, y, treatment, classes=None, estimator_partial_fit_params=None):
+        """Incrementally fit the model on a chunk of training data.
+
+        Use it to train on data which does not fit into memory. The estimator must implement ``partial_fit``,
+        e.g. :class:`~sklearn.linear_model.SGDClassifier` or :class:`~sklearn.naive_bayes.MultinomialNB`.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples and
+                n_features is the number of features.
+            y (array-like, shape (n_samples,)): Binary target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            classes (array-like, shape (n_classes,), optional): All classes of the target. The transformed target
+                is always binary, so the classes [0, 1] are passed to the estimator, and other classes raise
+                a ValueError.
+            estimator_partial_fit_params (dict, optional): Parameters to pass to the partial_fit method
+                of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        _check_treatment_chunk(treatment)
+        _check_partial_fit(self.estimator)
+
+        if not np.all(np.isin(np.unique(y), [0, 1])):
+            raise ValueError("This approach is only suitable for binary classification problem")
+        self._type_of_target = 'binary'
+
+        y_mod = (np.array(y) == np.array(treatment)).astype(int)
+
+        estimator_partial_fit_params = dict(estimator_partial_fit_params or {})
+        for user_classes in (classes, estimator_partial_fit_params.pop('classes', None)):
+            if user_classes is not None and not np.array_equal(np.unique(user_classes), [0, 1]):
+                raise ValueError("This approach is only suitable for binary classification problem, "
+                                 "got classes %s" % (user_classes,))
+        self.estimator.partial_fit(X, y_mod, classes=np.array([0, 1]), **estimator_partial_fit_params)
+        return self
+
     def predict(self, X):
         """Perform uplift on samples in X.
 
@@ -297,6 +627,22 @@ class ClassTransformationReg(BaseEstimator):
         estimator (estimator object implementing 'fit'): The object to use to fit the data.
         propensity_val (float): A constant propensity value, which assumes every subject has equal probability of assignment to the treatment group.
         propensity_estimator (estimator object with `predict_proba`): The object used to predict the propensity score if `propensity_val` is not given.
+        propensity_cv (int, cross-validation generator or None, default=None): Cross-fitting strategy for
+            the propensity. If None, ``propensity_estimator`` is fitted on the whole training data and predicts
+            in-sample. Otherwise the out-of-fold predictions of clones of ``propensity_estimator`` fitted on each
+            fold are used. An int is the number of folds of :class:`~sklearn.model_selection.StratifiedKFold`.
+        n_jobs (int, default=None): The number of jobs to run in parallel for fitting the propensity folds.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+
+    Attributes:
+        propensity_ (array-like, shape (n_samples, )): Propensity used to transform the target of the last fit.
+            Out-of-fold predictions if ``propensity_cv`` is set. The cross-fitted propensity is cached and reused
+            by further calls of :meth:`fit` on the same data with the same propensity settings, e.g. after changing
+            ``estimator`` with ``set_params``. The data is recognised by the shapes of X and the treatment and
+            a hash of 1000 evenly spaced rows of them, so refit a new model after modifying the data in place.
+        propensity_estimators_ (list of estimator objects): The fitted propensity estimators of each fold
+            if ``propensity_cv`` is set.
 
 
     Example::
@@ -327,7 +673,7 @@ class ClassTransformationReg(BaseEstimator):
         * :class:`.ClassTransformation`: Binary classifier transformation approach.
     """
 
-    def __init__(self, estimator, propensity_val=None, propensity_estimator=None):
+    def __init__(self, estimator, propensity_val=None, propensity_estimator=None, propensity_cv=None, n_jobs=None):
 
         if (propensity_val is None) and (propensity_estimator is None):
             raise ValueError('`propensity_val` and `propensity_estimator` cannot both be equal to `None`. Both arguments are currently null.')
@@ -337,8 +683,12 @@ class ClassTransformationReg(BaseEstimator):
         self.estimator = estimator
         self.propensity_val = propensity_val
         self.propensity_estimator = propensity_estimator
+        self.propensity_cv = propensity_cv
+        self.n_jobs = n_jobs
 
         self._type_of_target = None
+        self._propensity_key = None
+        self._cross_fitted_propensity = None
 
     def fit(self, X, y, treatment, estimator_fit_params=None):
         """Fit the model according to the given training data.
@@ -361,10 +711,14 @@ class ClassTransformationReg(BaseEstimator):
         if self.propensity_val is not None:
             p = self.propensity_val
 
-        elif self.propensity_estimator is not None:
+        elif self.propensity_cv is None:
             self.propensity_estimator.fit(X, treatment)
             p = self.propensity_estimator.predict_proba(X)[:, 1]
 
+        else:
+            p = self._cross_fit_propensity(X, treatment)
+
+        self.propensity_ = p
         y_mod = y * ((treatment - p) / (p * (1 - p)))
 
         if estimator_fit_params is None:
@@ -374,10 +728,73 @@ class ClassTransformationReg(BaseEstimator):
 
         return self
 
+    def partial_fit(self, X, y, treatment, estimator_partial_fit_params=None):
+        """Incrementally fit the model on a chunk of training data.
+
+        Use it to train on data which does not fit into memory. The estimator must implement ``partial_fit``,
+        e.g. :class:`~sklearn.linear_model.SGDRegressor`. If ``propensity_estimator`` is used, it must implement
+        ``partial_fit`` too: it is updated on the chunk first, and its predictions on the chunk are used
+        to transform the target.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples and
+                n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            estimator_partial_fit_params (dict, optional): Parameters to pass to the partial_fit method
+                of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        _check_treatment_chunk(treatment)
+        _check_partial_fit(self.estimator)
+
+        if self.propensity_val is not None:
+            p = self.propensity_val
+        else:
+            if self.propensity_cv is not None:
+                raise ValueError("Cross-fitted propensity is not supported by partial_fit, set `propensity_cv` to None.")
+            _check_partial_fit(self.propensity_estimator)
+            self.propensity_estimator.partial_fit(X, treatment, classes=np.array([0, 1]))
+            p = self.propensity_estimator.predict_proba(X)[:, 1]
+
+        y_mod = y * ((treatment - p) / (p * (1 - p)))
+
+        if estimator_partial_fit_params is None:
+            estimator_partial_fit_params = {}
+        self.estimator.partial_fit(X, y_mod, **estimator_partial_fit_params)
+
+        return self
+
+    def _cross_fit_propensity(self, X, treatment):
+        """Return out-of-fold propensity, reusing the cached one if the data and propensity settings are the same."""
+        cv = check_cv(self.propensity_cv, treatment, classifier=True)
+        key = joblib_hash((_fingerprint(X, treatment), self.propensity_estimator, repr(cv)))
+        if key == self._propensity_key:
+            return self._cross_fitted_propensity
+
+        folds = list(cv.split(X, treatment))
+        results = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_predict_fold)(clone(self.propensity_estimator), X, treatment, train, test)
+            for train, test in folds
+        )
+
+        p = np.empty(len(treatment))
+        for (_, test), (_, fold_preds) in zip(folds, results):
+            p[test] = fold_preds
+
+        self.propensity_estimators_ = [estimator for estimator, _ in results]
+        self._cross_fitted_propensity, self._propensity_key = p, key
+        return p
 
     def predict_propensity(self, X):
         """Predict propensity values.
 
+        If ``propensity_cv`` is set, the predictions of the estimators fitted on each fold are averaged.
+
         Args:
             X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
                 and n_features is the number of features.
@@ -386,10 +803,12 @@ class ClassTransformationReg(BaseEstimator):
             array (shape (n_samples,)): propensity
         """
 
-        if self.propensity_estimator is not None:
+        if self.propensity_estimator is None:
+            return self.propensity_val
+        elif self.propensity_cv is None:
             return self.propensity_estimator.predict_proba(X)[:, 1]
         else:
-            return self.propensity_val
+            return np.mean([estimator.predict_proba(X)[:, 1] for estimator in self.propensity_estimators_], axis=0)
 
     def predict(self, X):
         """Perform uplift on samples in X.
@@ -424,6 +843,20 @@ class TwoModels(BaseEstimator):
                 Dependent data representation (First train control estimator).
             * ``'ddr_treatment'``:
                 Dependent data representation (First train treatment estimator).
+        store_predictions (bool, default=True): Whether to save the last predictions of :meth:`predict`
+            to ``trmnt_preds_`` and ``ctrl_preds_``. Set to False to keep :meth:`predict` free of side effects,
+            e.g. when a fitted model is shared between threads.
+        downsample_ratio (float, optional): If set, :meth:`fit` subsamples the majority group to at most
+            ``downsample_ratio`` rows per row of the minority group and passes the inverse of the sampling rate
+            as ``sample_weight`` to the estimators, so that the estimates stay unbiased. The estimator must accept
+            ``sample_weight``.
+        downsample_by (string, 'treatment' or 'target', default='treatment'): The groups to balance:
+
+            * ``'treatment'``:
+                The majority arm is subsampled;
+            * ``'target'``:
+                The non-responders of each arm are subsampled relative to the responders of the arm.
+        random_state (int, RandomState instance or None, default=None): Seed of the subsampling.
 
     Attributes:
         trmnt_preds_ (array-like, shape (n_samples, )): Estimator predictions on samples when treatment.
@@ -478,10 +911,15 @@ class TwoModels(BaseEstimator):
         * :func:`.plot_uplift_preds`: Plot histograms of treatment, control and uplift predictions.
     """
 
-    def __init__(self, estimator_trmnt, estimator_ctrl, method='vanilla'):
+    def __init__(self, estimator_trmnt, estimator_ctrl, method='vanilla', store_predictions=True,
+                 downsample_ratio=None, downsample_by='treatment', random_state=None):
         self.estimator_trmnt = estimator_trmnt
         self.estimator_ctrl = estimator_ctrl
         self.method = method
+        self.store_predictions = store_predictions
+        self.downsample_ratio = downsample_ratio
+        self.downsample_by = downsample_by
+        self.random_state = random_state
         self.trmnt_preds_ = None
         self.ctrl_preds_ = None
         self._type_of_target = None
@@ -518,20 +956,126 @@ class TwoModels(BaseEstimator):
 
         check_consistent_length(X, y, treatment)
         check_is_binary(treatment)
-        self._type_of_target = type_of_target(y)
 
-        y_copy = y.copy()
-        treatment_copy = treatment.copy()
+        if isinstance(X, (pd.Series, pd.DataFrame)):
+            if isinstance(y, pd.Series) and not X.index.equals(y.index):
+                warnings.warn("Target indexes do not match data indexes, indexes are ignored and rows are "
+                              "matched by position")
+            if isinstance(treatment, pd.Series) and not X.index.equals(treatment.index):
+                warnings.warn("Treatment indexes do not match data indexes, indexes are ignored and rows are "
+                              "matched by position")
+
+        # Rows are selected by position without copying y and treatment.
+        treatment_values = np.asarray(treatment)
+        ctrl_idx = np.flatnonzero(treatment_values == 0)
+        trmnt_idx = np.flatnonzero(treatment_values == 1)
+
+        if self.downsample_ratio is not None:
+            idx, weights = _downsample(y, treatment_values, self.downsample_ratio, self.downsample_by,
+                                       self.random_state)
+            is_trmnt = treatment_values[idx] == 1
+            estimator_trmnt_fit_params = self._downsample_fit_params(
+                estimator_trmnt_fit_params, trmnt_idx, idx[is_trmnt], weights[is_trmnt])
+            estimator_ctrl_fit_params = self._downsample_fit_params(
+                estimator_ctrl_fit_params, ctrl_idx, idx[~is_trmnt], weights[~is_trmnt])
+            trmnt_idx, ctrl_idx = idx[is_trmnt], idx[~is_trmnt]
+
+        X_ctrl, y_ctrl = _take_rows(X, ctrl_idx), _take_rows(y, ctrl_idx)
+        X_trmnt, y_trmnt = _take_rows(X, trmnt_idx), _take_rows(y, trmnt_idx)
+
+        return self.fit_split(
+            X_trmnt, y_trmnt, X_ctrl, y_ctrl,
+            estimator_trmnt_fit_params=estimator_trmnt_fit_params,
+            estimator_ctrl_fit_params=estimator_ctrl_fit_params
+        )
+
+    @staticmethod
+    def _downsample_fit_params(fit_params, group_idx, kept_idx, weights):
+        """Select the user sample weights of the kept rows of a group and multiply them by downsampling weights."""
+        fit_params = {} if fit_params is None else dict(fit_params)
+        if fit_params.get('sample_weight') is not None:
+            positions = np.searchsorted(group_idx, kept_idx)
+            fit_params['sample_weight'] = np.asarray(fit_params['sample_weight'])[positions]
+        return _with_sample_weight(fit_params, weights)
+
+    def partial_fit(self, X, y, treatment, classes=None, estimator_trmnt_partial_fit_params=None,
+                    estimator_ctrl_partial_fit_params=None):
+        """Incrementally fit the model on a chunk of training data.
 
-        if (isinstance(X, pd.Series) or isinstance(X, pd.DataFrame)) and isinstance(y_copy, pd.Series) and not X.index.equals(y_copy.index):
-            y_copy.index = X.index
-            warnings.warn("Target indexes do not match data indexes, re-indexing has been performed")
-        if (isinstance(X, pd.Series) or isinstance(X, pd.DataFrame)) and isinstance(treatment_copy, pd.Series) and not X.index.equals(treatment_copy.index):
-            treatment_copy.index = X.index
-            warnings.warn("Treatment indexes do not match data indexes, re-indexing has been performed")
+        Each estimator is updated on the rows of its group, a chunk without rows of a group leaves its estimator
+        untouched. Use it to train on data which does not fit into memory. Only the ``'vanilla'`` method
+        is supported, and the estimators must implement ``partial_fit``, e.g.
+        :class:`~sklearn.linear_model.SGDClassifier` or :class:`~sklearn.naive_bayes.MultinomialNB`.
 
-        X_ctrl, y_ctrl = X[treatment_copy == 0], y_copy[treatment_copy == 0]
-        X_trmnt, y_trmnt = X[treatment_copy == 1], y_copy[treatment_copy == 1]
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number
+                of samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            classes (array-like, shape (n_classes,), optional): All classes of the target. Required
+                by classifiers on the first call.
+            estimator_trmnt_partial_fit_params (dict, optional): Parameters to pass to the partial_fit method
+                of the treatment estimator.
+            estimator_ctrl_partial_fit_params (dict, optional): Parameters to pass to the partial_fit method
+                of the control estimator.
+
+        Returns:
+            object: self
+        """
+
+        if self.method != 'vanilla':
+            raise ValueError("Only the 'vanilla' method supports partial_fit, got %s." % self.method)
+
+        check_consistent_length(X, y, treatment)
+        _check_treatment_chunk(treatment)
+        _check_partial_fit(self.estimator_trmnt)
+        _check_partial_fit(self.estimator_ctrl)
+
+        if classes is not None:
+            self._type_of_target = type_of_target(classes)
+        elif self._type_of_target is None:
+            self._type_of_target = type_of_target(y)
+
+        treatment_values = np.asarray(treatment)
+        groups = [
+            (self.estimator_trmnt, np.flatnonzero(treatment_values == 1), estimator_trmnt_partial_fit_params),
+            (self.estimator_ctrl, np.flatnonzero(treatment_values == 0), estimator_ctrl_partial_fit_params),
+        ]
+
+        for estimator, idx, partial_fit_params in groups:
+            if len(idx) == 0:
+                continue
+            partial_fit_params = {} if partial_fit_params is None else dict(partial_fit_params)
+            if classes is not None:
+                partial_fit_params['classes'] = classes
+            estimator.partial_fit(_take_rows(X, idx), _take_rows(y, idx), **partial_fit_params)
+
+        return self
+
+    def fit_split(self, X_trmnt, y_trmnt, X_ctrl, y_ctrl, estimator_trmnt_fit_params=None,
+                  estimator_ctrl_fit_params=None):
+        """Fit the model on data that is already split into treatment and control groups.
+
+        Use it to avoid materializing the whole dataset and its per-group copies at the same time,
+        e.g. when the groups are stored separately or X is sorted by treatment and sliced into views.
+
+        Args:
+            X_trmnt (array-like, shape (n_samples_trmnt, n_features)): Training vector of the treatment group.
+            y_trmnt (array-like, shape (n_samples_trmnt,)): Target vector relative to X_trmnt.
+            X_ctrl (array-like, shape (n_samples_ctrl, n_features)): Training vector of the control group.
+            y_ctrl (array-like, shape (n_samples_ctrl,)): Target vector relative to X_ctrl.
+            estimator_trmnt_fit_params (dict, optional): Parameters to pass to the fit method
+                of the treatment estimator.
+            estimator_ctrl_fit_params (dict, optional): Parameters to pass to the fit method
+                of the control estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X_trmnt, y_trmnt)
+        check_consistent_length(X_ctrl, y_ctrl)
+        self._type_of_target = type_of_target(np.concatenate((np.asarray(y_trmnt), np.asarray(y_ctrl))))
 
         if estimator_trmnt_fit_params is None:
             estimator_trmnt_fit_params = {}
@@ -599,50 +1143,412 @@ class TwoModels(BaseEstimator):
             array (shape (n_samples,)): uplift
         """
 
+        uplift, trmnt_preds, ctrl_preds = self.predict_components(X)
+        if self.store_predictions:
+            self.trmnt_preds_, self.ctrl_preds_ = trmnt_preds, ctrl_preds
+        return uplift
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Unlike :meth:`predict`, it never modifies the model, so it is safe to call concurrently.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+
         if self.method == 'ddr_control':
             if self._type_of_target == 'binary':
-                self.ctrl_preds_ = self.estimator_ctrl.predict_proba(X)[:, 1]
+                ctrl_preds = self.estimator_ctrl.predict_proba(X)[:, 1]
             else:
-                self.ctrl_preds_ = self.estimator_ctrl.predict(X)
+                ctrl_preds = self.estimator_ctrl.predict(X)
 
             if isinstance(X, np.ndarray):
-                X_mod = np.column_stack((X, self.ctrl_preds_))
+                X_mod = np.column_stack((X, ctrl_preds))
             elif isinstance(X, pd.DataFrame):
-                X_mod = X.assign(ddr_control=self.ctrl_preds_)
+                X_mod = X.assign(ddr_control=ctrl_preds)
             else:
                 raise TypeError("Expected numpy.ndarray or pandas.DataFrame, got %s" % type(X))
 
             if self._type_of_target == 'binary':
-                self.trmnt_preds_ = self.estimator_trmnt.predict_proba(X_mod)[:, 1]
+                trmnt_preds = self.estimator_trmnt.predict_proba(X_mod)[:, 1]
             else:
-                self.trmnt_preds_ = self.estimator_trmnt.predict(X_mod)
+                trmnt_preds = self.estimator_trmnt.predict(X_mod)
 
         elif self.method == 'ddr_treatment':
             if self._type_of_target == 'binary':
-                self.trmnt_preds_ = self.estimator_trmnt.predict_proba(X)[:, 1]
+                trmnt_preds = self.estimator_trmnt.predict_proba(X)[:, 1]
             else:
-                self.trmnt_preds_ = self.estimator_trmnt.predict(X)
+                trmnt_preds = self.estimator_trmnt.predict(X)
 
             if isinstance(X, np.ndarray):
-                X_mod = np.column_stack((X, self.trmnt_preds_))
+                X_mod = np.column_stack((X, trmnt_preds))
             elif isinstance(X, pd.DataFrame):
-                X_mod = X.assign(ddr_treatment=self.trmnt_preds_)
+                X_mod = X.assign(ddr_treatment=trmnt_preds)
             else:
                 raise TypeError("Expected numpy.ndarray or pandas.DataFrame, got %s" % type(X))
 
             if self._type_of_target == 'binary':
-                self.ctrl_preds_ = self.estimator_ctrl.predict_proba(X_mod)[:, 1]
+                ctrl_preds = self.estimator_ctrl.predict_proba(X_mod)[:, 1]
             else:
-                self.ctrl_preds_ = self.estimator_ctrl.predict(X_mod)
+                ctrl_preds = self.estimator_ctrl.predict(X_mod)
 
         else:
             if self._type_of_target == 'binary':
-                self.ctrl_preds_ = self.estimator_ctrl.predict_proba(X)[:, 1]
-                self.trmnt_preds_ = self.estimator_trmnt.predict_proba(X)[:, 1]
+                ctrl_preds = self.estimator_ctrl.predict_proba(X)[:, 1]
+                trmnt_preds = self.estimator_trmnt.predict_proba(X)[:, 1]
             else:
-                self.ctrl_preds_ = self.estimator_ctrl.predict(X)
-                self.trmnt_preds_ = self.estimator_trmnt.predict(X)
+                ctrl_preds = self.estimator_ctrl.predict(X)
+                trmnt_preds = self.estimator_trmnt.predict(X)
 
-        uplift = self.trmnt_preds_ - self.ctrl_preds_
+        uplift = trmnt_preds - ctrl_preds
 
-        return uplift
+        return uplift, trmnt_preds, ctrl_preds
+
+    def staged_predict(self, X):
+        """Perform uplift on samples in X after every boosting iteration of the estimators.
+
+        Staged predictions of the treatment and control estimators, e.g.
+        :class:`~sklearn.ensemble.GradientBoostingClassifier`, are iterated in lockstep in one pass over X.
+        If one estimator has fewer iterations, its last predictions are used for the remaining stages.
+        Use it with :func:`.qini_auc_score_by_stage` to choose the number of iterations without refitting.
+        Only the ``'vanilla'`` method is supported.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Yields:
+            array (shape (n_samples,)): uplift after every iteration.
+        """
+
+        if self.method != 'vanilla':
+            raise ValueError("staged_predict supports only 'vanilla' method, got %s." % self.method)
+
+        for trmnt_preds, ctrl_preds in _lockstep(
+                _staged_predict_target(self.estimator_trmnt, X, self._type_of_target),
+                _staged_predict_target(self.estimator_ctrl, X, self._type_of_target)):
+            yield trmnt_preds - ctrl_preds
+
+    def compile(self):
+        """Compile the fitted model into a lightweight predictor.
+
+        Only the ``'vanilla'`` method is supported, with one of the following pairs of estimators:
+
+        * linear and generalized linear regressors, :class:`~sklearn.linear_model.LogisticRegression` or
+          :class:`~sklearn.linear_model.SGDClassifier` with logistic loss: the returned predictor computes
+          treatment and control scores with a single matrix product of X and the stacked coefficients
+          of both estimators;
+        * decision trees, random forests or extra trees: the nodes of both models are flattened into contiguous
+          arrays, and the returned predictor traverses all trees of both models at once.
+
+        Returns:
+            LinearUpliftPredictor or TreeUpliftPredictor: predictor with ``predict`` and
+            ``predict_components`` methods.
+        """
+
+        if self.method != 'vanilla':
+            raise ValueError("Only the 'vanilla' method can be compiled, got %s." % self.method)
+
+        if _is_tree_model(self.estimator_trmnt) and _is_tree_model(self.estimator_ctrl):
+            return TreeUpliftPredictor(self.estimator_trmnt, self.estimator_ctrl)
+
+        coef_trmnt, intercept_trmnt, link_trmnt = _linear_params(self.estimator_trmnt)
+        coef_ctrl, intercept_ctrl, link_ctrl = _linear_params(self.estimator_ctrl)
+
+        if link_trmnt != link_ctrl:
+            raise ValueError("Treatment and control estimators should have the same link function, got %s and %s."
+                             % (link_trmnt, link_ctrl))
+
+        return LinearUpliftPredictor(np.column_stack((coef_trmnt, coef_ctrl)), [intercept_trmnt, intercept_ctrl],
+                                     link_trmnt)
+
+
+class MultiTreatmentTwoModels(BaseEstimator):
+    """Two models approach for several treatment groups (T-Learner with multiple treatments).
+
+    Fit one model on the control group and one model per treatment group. The control model is shared by
+    all treatment groups, and all models are fitted in parallel.
+
+    Return uplift of every treatment group relative to control for each example.
+
+    Read more in the :ref:`User Guide <TwoModels>`.
+
+    Args:
+        estimator_trmnt (estimator object implementing 'fit'): The object to clone and fit for each treatment group.
+        estimator_ctrl (estimator object implementing 'fit'): The object to clone and fit on the control data.
+        control_value (int, float or str, default=0): The value of the treatment vector denoting the control group.
+        n_jobs (int, default=None): The number of jobs to run in parallel for fitting the models.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+
+    Attributes:
+        treatment_groups_ (ndarray, shape (n_groups, )): Values of the treatment groups in the order of
+            the uplift columns.
+        estimator_ctrl_ (estimator object): The fitted control estimator.
+        estimators_trmnt_ (list of estimator objects): The fitted estimators of the treatment groups.
+
+    Example::
+
+        # import approach
+        from sklift.models import MultiTreatmentTwoModels
+        from sklift.datasets import fetch_hillstrom
+        # import any estimator adheres to scikit-learn conventions
+        from catboost import CatBoostClassifier
+
+
+        data, target, treatment = fetch_hillstrom(return_X_y_t=True)
+
+        tm = MultiTreatmentTwoModels(
+            estimator_trmnt=CatBoostClassifier(silent=True, random_state=42),
+            estimator_ctrl=CatBoostClassifier(silent=True, random_state=42),
+            control_value='No E-Mail',
+            n_jobs=-1
+        )
+        tm = tm.fit(data, target, treatment)
+        uplift = tm.predict(data)  # array of shape (n_samples, n_groups), columns follow tm.treatment_groups_
+
+    See Also:
+
+        * :class:`.TwoModels`: Double classifier approach.
+        * :class:`.MultiTreatmentSoloModel`: Single model approach for several treatment groups.
+    """
+
+    def __init__(self, estimator_trmnt, estimator_ctrl, control_value=0, n_jobs=None):
+        self.estimator_trmnt = estimator_trmnt
+        self.estimator_ctrl = estimator_ctrl
+        self.control_value = control_value
+        self.n_jobs = n_jobs
+        self._type_of_target = None
+
+    def fit(self, X, y, treatment, estimator_trmnt_fit_params=None, estimator_ctrl_fit_params=None):
+        """Fit the model according to the given training data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number
+                of samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Treatment vector relative to X. Contains ``control_value``
+                for the control group and the group label for treated samples.
+            estimator_trmnt_fit_params (dict, optional): Parameters to pass to the fit method
+                of the treatment estimators.
+            estimator_ctrl_fit_params (dict, optional): Parameters to pass to the fit method
+                of the control estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        groups, indices = _group_indices(treatment)
+
+        if self.control_value not in groups:
+            raise ValueError("Control value %s is not present in treatment vector, got values %s"
+                             % (self.control_value, groups))
+        if len(groups) < 2:
+            raise ValueError("Expected at least one treatment group besides control, got values %s" % groups)
+
+        self._type_of_target = type_of_target(y)
+
+        if estimator_trmnt_fit_params is None:
+            estimator_trmnt_fit_params = {}
+        if estimator_ctrl_fit_params is None:
+            estimator_ctrl_fit_params = {}
+
+        ctrl_pos = list(groups).index(self.control_value)
+        self.treatment_groups_ = np.delete(groups, ctrl_pos)
+
+        jobs = [(clone(self.estimator_ctrl), indices[ctrl_pos], estimator_ctrl_fit_params)]
+        jobs += [(clone(self.estimator_trmnt), idx, estimator_trmnt_fit_params)
+                 for pos, idx in enumerate(indices) if pos != ctrl_pos]
+
+        fitted = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_estimator)(estimator, _take_rows(X, idx), _take_rows(y, idx), fit_params)
+            for estimator, idx, fit_params in jobs
+        )
+        self.estimator_ctrl_, self.estimators_trmnt_ = fitted[0], fitted[1:]
+
+        return self
+
+    def _predict_target(self, estimator, X):
+        if self._type_of_target == 'binary':
+            return estimator.predict_proba(X)[:, 1]
+        return estimator.predict(X)
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples, n_groups)): uplift of each treatment group from ``treatment_groups_``
+        """
+
+        return self.predict_components(X)[0]
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples, n_groups),
+            (n_samples, n_groups) and (n_samples,)
+        """
+
+        ctrl_preds = self._predict_target(self.estimator_ctrl_, X)
+        trmnt_preds = np.column_stack([self._predict_target(estimator, X) for estimator in self.estimators_trmnt_])
+
+        uplift = trmnt_preds - ctrl_preds.reshape(-1, 1)
+        return uplift, trmnt_preds, ctrl_preds
+
+
+class MultiTreatmentSoloModel(BaseEstimator):
+    """Single model approach for several treatment groups (S-Learner with multiple treatments).
+
+    Fit solo model on whole dataset with one-hot encoded treatment groups as additional features.
+
+    Each object from the test sample is scored once as control and once per treatment group.
+    Subtracting the control predictions, we get the uplift of every treatment group.
+
+    Read more in the :ref:`User Guide <SoloModel>`.
+
+    Args:
+        estimator (estimator object implementing 'fit'): The object to use to fit the data.
+        control_value (int, float or str, default=0): The value of the treatment vector denoting the control group.
+
+    Attributes:
+        treatment_groups_ (ndarray, shape (n_groups, )): Values of the treatment groups in the order of
+            the uplift columns.
+
+    Example::
+
+        # import approach
+        from sklift.models import MultiTreatmentSoloModel
+        from sklift.datasets import fetch_hillstrom
+        # import any estimator adheres to scikit-learn conventions
+        from catboost import CatBoostClassifier
+
+
+        data, target, treatment = fetch_hillstrom(return_X_y_t=True)
+
+        sm = MultiTreatmentSoloModel(CatBoostClassifier(silent=True, random_state=42), control_value='No E-Mail')
+        sm = sm.fit(data, target, treatment)
+        uplift = sm.predict(data)  # array of shape (n_samples, n_groups), columns follow sm.treatment_groups_
+
+    See Also:
+
+        * :class:`.SoloModel`: Single model approach.
+        * :class:`.MultiTreatmentTwoModels`: Two models approach for several treatment groups.
+    """
+
+    def __init__(self, estimator, control_value=0):
+        self.estimator = estimator
+        self.control_value = control_value
+        self._type_of_target = None
+
+    def _add_treatment_features(self, X, codes):
+        """Append one-hot encoded treatment groups to X, ``codes`` is a group position or -1 for control."""
+        n_groups = len(self.treatment_groups_)
+        if isinstance(X, np.ndarray):
+            onehot = np.zeros((X.shape[0], n_groups))
+            rows = np.flatnonzero(codes >= 0)
+            onehot[rows, codes[rows]] = 1
+            return np.column_stack((X, onehot))
+        elif isinstance(X, pd.DataFrame):
+            return X.assign(**{'treatment_%s' % group: (codes == pos).astype(float)
+                               for pos, group in enumerate(self.treatment_groups_)})
+        raise TypeError("Expected numpy.ndarray or pandas.DataFrame in training vector X, got %s" % type(X))
+
+    def fit(self, X, y, treatment, estimator_fit_params=None):
+        """Fit the model according to the given training data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Treatment vector relative to X. Contains ``control_value``
+                for the control group and the group label for treated samples.
+            estimator_fit_params (dict, optional): Parameters to pass to the fit method of the estimator.
+
+        Returns:
+            object: self
+        """
+
+        check_consistent_length(X, y, treatment)
+        groups, codes = np.unique(np.asarray(treatment), return_inverse=True)
+
+        if self.control_value not in groups:
+            raise ValueError("Control value %s is not present in treatment vector, got values %s"
+                             % (self.control_value, groups))
+        if len(groups) < 2:
+            raise ValueError("Expected at least one treatment group besides control, got values %s" % groups)
+
+        ctrl_pos = list(groups).index(self.control_value)
+        self.treatment_groups_ = np.delete(groups, ctrl_pos)
+        codes = np.where(codes == ctrl_pos, -1, codes - (codes > ctrl_pos))
+
+        self._type_of_target = type_of_target(y)
+
+        if estimator_fit_params is None:
+            estimator_fit_params = {}
+        self.estimator.fit(self._add_treatment_features(X, codes), y, **estimator_fit_params)
+        return self
+
+    def _predict_target(self, X):
+        if self._type_of_target == 'binary':
+            return self.estimator.predict_proba(X)[:, 1]
+        return self.estimator.predict(X)
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples, n_groups)): uplift of each treatment group from ``treatment_groups_``
+        """
+
+        return self.predict_components(X)[0]
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control predictions.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples, n_groups),
+            (n_samples, n_groups) and (n_samples,)
+        """
+
+        X_mod = self._add_treatment_features(X, np.full(X.shape[0], -1))
+        ctrl_preds = self._predict_target(X_mod)
+
+        # Reuse the augmented matrix for every group, switching a single one-hot column at a time.
+        n_features = X_mod.shape[1] - len(self.treatment_groups_)
+        trmnt_preds = np.empty((X_mod.shape[0], len(self.treatment_groups_)))
+        for pos in range(len(self.treatment_groups_)):
+            if isinstance(X_mod, np.ndarray):
+                X_mod[:, n_features + pos] = 1
+                trmnt_preds[:, pos] = self._predict_target(X_mod)
+                X_mod[:, n_features + pos] = 0
+            else:
+                column = X_mod.columns[n_features + pos]
+                X_mod[column] = 1.
+                trmnt_preds[:, pos] = self._predict_target(X_mod)
+                X_mod[column] = 0.
+
+        uplift = trmnt_preds - ctrl_preds.reshape(-1, 1)
+        return uplift, trmnt_preds, ctrl_preds
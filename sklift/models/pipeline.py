@@ -0,0 +1,214 @@
+from collections import Counter, defaultdict
+
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from sklearn.utils.validation import check_memory
+
+try:
+    from sklearn.utils._user_interface import _print_elapsed_time
+except ImportError:  # scikit-learn < 1.3
+    from sklearn.utils import _print_elapsed_time
+
+
+def _fit_transform_one(transformer, X, y, **fit_params):
+    """Fit the transformer and transform X. Cached by ``memory`` of :class:`.UpliftPipeline`."""
+    if hasattr(transformer, 'fit_transform'):
+        Xt = transformer.fit_transform(X, y, **fit_params)
+    else:
+        Xt = transformer.fit(X, y, **fit_params).transform(X)
+    return Xt, transformer
+
+
+def _is_passthrough(transformer):
+    return transformer is None or (isinstance(transformer, str) and transformer == 'passthrough')
+
+
+def _unsupported(method):
+    """Hide a method of :class:`~sklearn.pipeline.Pipeline` that would call the final step without treatment."""
+
+    def raise_error(self):
+        raise AttributeError(f"UpliftPipeline has no {method} method: the final uplift approach needs "
+                             f"the treatment. Use fit(X, y, treatment) and predict or predict_components instead.")
+
+    return property(raise_error)
+
+
+class UpliftPipeline(Pipeline):
+    """Pipeline of transforms with a final uplift approach.
+
+    The transformers are fitted on the features only, then the transformed matrix is passed with the treatment
+    to the final uplift approach, e.g. :class:`.SoloModel` or :class:`.TwoModels`. Unlike wrapping an uplift
+    approach around :class:`~sklearn.pipeline.Pipeline`, X is transformed once per :meth:`fit` and :meth:`predict`,
+    and the treatment columns of :class:`.SoloModel` are appended after the transformation, so both
+    counterfactual copies reuse the same transformed matrix.
+
+    The methods of :class:`~sklearn.pipeline.Pipeline` that pass no treatment to the final step, e.g.
+    ``fit_predict``, ``predict_proba`` or ``score``, are not available.
+
+    Args:
+        steps (list of tuples): List of (name, transform) tuples chained in the order in which they are chained,
+            with the uplift approach last. A transformer may be None or ``'passthrough'``.
+        memory (str or object with the joblib.Memory interface, default=None): Used to cache the fitted transformers.
+            Transformers fitted on the same data, e.g. on the same cross-validation fold for different parameters
+            of the uplift approach, are then loaded from the cache instead of being refitted.
+        verbose (bool, default=False): If True, the time elapsed while fitting each step is printed.
+
+    Attributes:
+        named_steps (:class:`~sklearn.utils.Bunch`): Dictionary-like object to access any step by its name.
+
+    Example::
+
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler
+        from sklift.models import SoloModel, UpliftPipeline
+
+
+        pipeline = UpliftPipeline([
+            ('scaler', StandardScaler()),
+            ('sm', SoloModel(LogisticRegression(), method='treatment_interaction'))
+        ])
+        pipeline = pipeline.fit(X_train, y_train, treat_train)
+        uplift = pipeline.predict(X_val)
+
+    See Also:
+
+        * :func:`.make_uplift_pipeline`: Construct an :class:`.UpliftPipeline` from the given estimators.
+    """
+
+    fit_transform = _unsupported('fit_transform')
+    fit_predict = _unsupported('fit_predict')
+    predict_proba = _unsupported('predict_proba')
+    predict_log_proba = _unsupported('predict_log_proba')
+    decision_function = _unsupported('decision_function')
+    score = _unsupported('score')
+    score_samples = _unsupported('score_samples')
+    transform = _unsupported('transform')
+    inverse_transform = _unsupported('inverse_transform')
+
+    def __init__(self, steps, memory=None, verbose=False):
+        super().__init__(steps, memory=memory, verbose=verbose)
+
+    def _route_fit_params(self, fit_params):
+        """Split ``step__param`` keys into parameters of every step."""
+        step_params = defaultdict(dict)
+        step_names = dict(self.steps)
+        for key, value in fit_params.items():
+            step, sep, param = key.partition('__')
+            if not sep or step not in step_names:
+                raise ValueError("UpliftPipeline.fit does not accept the %s parameter. You can pass parameters "
+                                 "to specific steps of your pipeline using the stepname__parameter format, "
+                                 "e.g. `UpliftPipeline.fit(X, y, treatment, sm__estimator_fit_params=params)`."
+                                 % key)
+            step_params[step][param] = value
+        return step_params
+
+    def _transform(self, X):
+        Xt = X
+        for _, transformer in self.steps[:-1]:
+            if not _is_passthrough(transformer):
+                Xt = transformer.transform(Xt)
+        return Xt
+
+    def fit(self, X, y, treatment, **fit_params):
+        """Fit the transformers on X, then fit the uplift approach on the transformed X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Treatment vector relative to X.
+            **fit_params (dict of string -> object): Parameters passed to the ``fit`` method of each step, where
+                each parameter name is prefixed such that parameter ``p`` for step ``s`` has key ``s__p``.
+
+        Returns:
+            object: self
+        """
+
+        self._validate_steps()
+        step_params = self._route_fit_params(fit_params)
+        memory = check_memory(self.memory)
+        fit_transform_one_cached = memory.cache(_fit_transform_one)
+
+        Xt = X
+        for idx, (name, transformer) in enumerate(self.steps[:-1]):
+            if _is_passthrough(transformer):
+                continue
+            # the cached transformer must not be the one held by the pipeline, otherwise it is refitted in place
+            cloned_transformer = transformer if getattr(memory, 'location', None) is None else clone(transformer)
+            with _print_elapsed_time('UpliftPipeline', self._log_message(idx)):
+                Xt, fitted_transformer = fit_transform_one_cached(cloned_transformer, Xt, y, **step_params[name])
+            self.steps[idx] = (name, fitted_transformer)
+
+        name, final_estimator = self.steps[-1]
+        with _print_elapsed_time('UpliftPipeline', self._log_message(len(self.steps) - 1)):
+            if not _is_passthrough(final_estimator):
+                final_estimator.fit(Xt, y, treatment, **step_params[name])
+        return self
+
+    def predict(self, X):
+        """Transform X with the fitted transformers and perform uplift with the final uplift approach.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.steps[-1][1].predict(self._transform(X))
+
+    def predict_components(self, X):
+        """Transform X once and return uplift together with treatment and control predictions.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+        return self.steps[-1][1].predict_components(self._transform(X))
+
+
+def _name_estimators(estimators):
+    """Generate lowercase class names for the steps, numbered if the same class is used several times."""
+    names = [type(estimator).__name__.lower() for estimator in estimators]
+    counts = Counter(names)
+    seen = defaultdict(int)
+    unique_names = []
+    for name in names:
+        if counts[name] > 1:
+            seen[name] += 1
+            name = '%s-%d' % (name, seen[name])
+        unique_names.append(name)
+    return list(zip(unique_names, estimators))
+
+
+def make_uplift_pipeline(*steps, memory=None, verbose=False):
+    """Construct an :class:`.UpliftPipeline` from the given estimators.
+
+    The steps are named automatically with the lowercase names of their classes.
+
+    Args:
+        *steps (list of estimators): Transformers followed by an uplift approach.
+        memory (str or object with the joblib.Memory interface, default=None): Used to cache the fitted transformers.
+        verbose (bool, default=False): If True, the time elapsed while fitting each step is printed.
+
+    Returns:
+        UpliftPipeline: pipeline of the given estimators.
+
+    Example::
+
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.preprocessing import StandardScaler
+        from sklift.models import TwoModels, make_uplift_pipeline
+
+
+        pipeline = make_uplift_pipeline(
+            StandardScaler(),
+            TwoModels(LogisticRegression(), LogisticRegression()),
+            memory='cache_dir'
+        )
+        pipeline.fit(X_train, y_train, treat_train, twomodels__estimator_trmnt_fit_params={'sample_weight': w})
+    """
+    return UpliftPipeline(_name_estimators(steps), memory=memory, verbose=verbose)
@@ -0,0 +1,510 @@
+import numbers
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator
+from sklearn.utils import check_random_state
+from sklearn.utils.validation import _check_sample_weight, check_array, check_consistent_length
+
+from ..utils import check_is_binary
+
+CRITERIA = ('KL', 'ED', 'Chi', 'DDP')
+_EPS = 1e-6
+
+
+def _bin_edges(X, max_bins, random_state, subsample=200000):
+    """Compute per-feature thresholds splitting the values of X into at most ``max_bins`` bins.
+
+    Args:
+        X (2d array): Training vector.
+        max_bins (int): The maximal number of bins.
+        random_state (RandomState): Used to subsample rows for the quantiles.
+        subsample (int): The number of rows used to compute the quantiles.
+
+    Returns:
+        list of 1d arrays: sorted thresholds of each feature.
+    """
+    if X.shape[0] > subsample:
+        X = X[random_state.choice(X.shape[0], subsample, replace=False)]
+
+    edges = []
+    for column in X.T:
+        values = np.unique(column)
+        if len(values) <= max_bins:
+            thresholds = (values[:-1] + values[1:]) / 2
+        else:
+            quantiles = np.percentile(column, np.linspace(0, 100, max_bins + 1)[1:-1])
+            thresholds = np.unique(quantiles)
+        edges.append(thresholds)
+    return edges
+
+
+def _bin_data(X, edges):
+    """Map the values of X to bin indices, ``x <= edges[j][k]`` if and only if ``bin <= k``."""
+    X_binned = np.empty(X.shape, dtype=np.uint8 if max(len(e) for e in edges) < 256 else np.uint16)
+    for j, thresholds in enumerate(edges):
+        X_binned[:, j] = np.searchsorted(thresholds, X[:, j], side='left')
+    return X_binned
+
+
+def _group_stats(hist):
+    """Return sizes and response rates of control and treatment groups for histograms of shape (..., 4).
+
+    The last axis contains weighted counts of (control, y=0), (control, y=1), (treatment, y=0), (treatment, y=1).
+    """
+    n_ctrl = hist[..., 0] + hist[..., 1]
+    n_trmnt = hist[..., 2] + hist[..., 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_ctrl = hist[..., 1] / n_ctrl
+        p_trmnt = hist[..., 3] / n_trmnt
+    return n_ctrl, n_trmnt, p_ctrl, p_trmnt
+
+
+def _divergence(p_trmnt, p_ctrl, criterion):
+    """Divergence between treatment and control binary outcome distributions."""
+    p_trmnt = np.clip(p_trmnt, _EPS, 1 - _EPS)
+    p_ctrl = np.clip(p_ctrl, _EPS, 1 - _EPS)
+    if criterion == 'KL':
+        return p_trmnt * np.log(p_trmnt / p_ctrl) + (1 - p_trmnt) * np.log((1 - p_trmnt) / (1 - p_ctrl))
+    elif criterion == 'ED':
+        return 2 * (p_trmnt - p_ctrl) ** 2
+    else:
+        return (p_trmnt - p_ctrl) ** 2 / p_ctrl + (p_trmnt - p_ctrl) ** 2 / (1 - p_ctrl)
+
+
+class UpliftTreeClassifier(BaseEstimator):
+    """Uplift decision tree classifier with histogram-based split search.
+
+    Features are discretized into at most ``max_bins`` quantile bins once. For every node, the weighted numbers of
+    responders and non-responders of treatment and control groups are accumulated per bin of each feature
+    in one histogram, and all split candidates are evaluated from its cumulative sums. Only the smaller child
+    histogram is computed from the data, the larger one is obtained by subtraction from its parent.
+
+    The split criterion maximizes the divergence between treatment and control outcome distributions
+    in the children:
+
+    * ``'KL'``: Kullback-Leibler divergence;
+    * ``'ED'``: squared Euclidean distance;
+    * ``'Chi'``: chi-squared divergence;
+    * ``'DDP'``: difference of the uplifts of the children (Delta-Delta-P).
+
+    Leaf predictions are the difference of treatment and control response rates, shrunk towards
+    the parent node values.
+
+    Read more in the :ref:`User Guide <models>`.
+
+    Args:
+        criterion (string, 'KL', 'ED', 'Chi' or 'DDP', default='KL'): The function to measure the quality of a split.
+        max_depth (int, default=5): The maximum depth of the tree.
+        min_samples_leaf (int, default=100): The minimum number of samples required to be at a leaf node.
+        min_samples_treatment (int, default=10): The minimum number of samples of each of treatment and control groups
+            required to be at a leaf node.
+        n_reg (int, default=100): The regularization of the leaf response rates: the number of virtual samples
+            with the response rates of the parent node added to each group.
+        max_bins (int, default=255): The maximum number of bins of each feature, at most 65536.
+        max_features (int, float, 'sqrt', 'log2' or None, default=None): The number of features to consider when
+            looking for the best split. If float, it is a fraction of features. None means all features.
+        random_state (int, RandomState instance or None, default=None): Controls the feature subsampling
+            and the rows used for binning.
+
+    Attributes:
+        n_features_in_ (int): The number of features seen during fit.
+        max_depth_ (int): The actual depth of the tree.
+
+    Example::
+
+        # import approach
+        from sklift.models import UpliftTreeClassifier
+        from sklift.metrics import qini_auc_score
+
+
+        tree = UpliftTreeClassifier(criterion='KL', max_depth=6, min_samples_leaf=500)
+        tree = tree.fit(X_train, y_train, treat_train)  # fit the model
+        uplift = tree.predict(X_val)  # predict uplift
+        qini = qini_auc_score(y_val, uplift, treat_val)
+
+    References:
+        Rzepakowski, Piotr & Jaroszewicz, Szymon. (2012). Decision trees for uplift modeling with single and
+        multiple treatments. Knowledge and Information Systems. 32. 303-327.
+
+        Hansotia, Behram & Rukstales, Brad. (2002). Incremental value modeling.
+        Journal of Interactive Marketing. 16. 35-46.
+
+    See Also:
+
+        * :class:`.UpliftRandomForestClassifier`: Random forest of uplift trees.
+        * :class:`.TwoModels`: Double classifier approach.
+    """
+
+    def __init__(self, criterion='KL', max_depth=5, min_samples_leaf=100, min_samples_treatment=10, n_reg=100,
+                 max_bins=255, max_features=None, random_state=None):
+        self.criterion = criterion
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        self.min_samples_treatment = min_samples_treatment
+        self.n_reg = n_reg
+        self.max_bins = max_bins
+        self.max_features = max_features
+        self.random_state = random_state
+
+    def _check_params(self, n_features):
+        if self.criterion not in CRITERIA:
+            raise ValueError("Uplift tree supports only criteria in %s, got %s." % (list(CRITERIA), self.criterion))
+        if not 2 <= self.max_bins <= 65536:
+            raise ValueError("max_bins should be in [2, 65536], got %s." % self.max_bins)
+
+        if self.max_features is None:
+            return n_features
+        elif self.max_features == 'sqrt':
+            return max(1, int(np.sqrt(n_features)))
+        elif self.max_features == 'log2':
+            return max(1, int(np.log2(n_features)))
+        elif isinstance(self.max_features, numbers.Integral):
+            return min(max(1, self.max_features), n_features)
+        elif isinstance(self.max_features, float):
+            return max(1, int(self.max_features * n_features))
+        raise ValueError("Invalid value for max_features, got %s." % self.max_features)
+
+    def fit(self, X, y, treatment, sample_weight=None):
+        """Build an uplift tree from the training data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Binary target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+            sample_weight (array-like, shape (n_samples,), optional): Non-negative sample weights.
+
+        Returns:
+            object: self
+        """
+
+        X = check_array(X, dtype=np.float64)
+        check_consistent_length(X, y, treatment)
+        check_is_binary(treatment)
+        check_is_binary(y)
+        sample_weight = _check_sample_weight(sample_weight, X, dtype=np.float64)
+        if np.any(sample_weight < 0):
+            raise ValueError("Negative values in sample_weight are not supported.")
+
+        self._check_params(X.shape[1])
+        random_state = check_random_state(self.random_state)
+        edges = _bin_edges(X, self.max_bins, random_state)
+        return self._fit_binned(_bin_data(X, edges), edges, np.asarray(y), np.asarray(treatment),
+                                sample_weight, random_state)
+
+    def _fit_binned(self, X_binned, edges, y, treatment, sample_weight, random_state):
+        """Build the tree from pre-binned data."""
+        n_samples, n_features = X_binned.shape
+        n_candidates = self._check_params(n_features)
+        n_bins = max(len(e) for e in edges) + 1
+
+        groups = (2 * treatment + y).astype(np.intp)
+        weights = np.ones(n_samples) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+
+        rows = np.flatnonzero(weights > 0)
+
+        def histogram(idx):
+            # the codes of (bin, group) pairs are built one feature at a time,
+            # so only the narrow binned rows of the node are copied
+            X_node, groups_node, weights_node = X_binned[idx], groups[idx], weights[idx]
+            hist = np.empty((n_features, n_bins, 4))
+            for j in range(n_features):
+                codes = X_node[:, j].astype(np.intp) * 4 + groups_node
+                hist[j] = np.bincount(codes, weights=weights_node, minlength=n_bins * 4).reshape(n_bins, 4)
+            return hist
+
+        self.n_features_in_ = n_features
+        self._nodes = {'feature': [], 'threshold': [], 'left': [], 'right': [], 'p_trmnt': [], 'p_ctrl': []}
+        self.max_depth_ = 0
+
+        root_hist = histogram(rows)
+        _, _, p_ctrl, p_trmnt = _group_stats(root_hist[0].sum(axis=0))
+        stack = [(self._add_node(), rows, root_hist, 0, p_trmnt, p_ctrl)]
+
+        while stack:
+            node, idx, hist, depth, parent_p_trmnt, parent_p_ctrl = stack.pop()
+            self.max_depth_ = max(self.max_depth_, depth)
+
+            counts = hist[0].sum(axis=0)
+            n_ctrl, n_trmnt = counts[0] + counts[1], counts[2] + counts[3]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                p_trmnt = (counts[3] + self.n_reg * parent_p_trmnt) / (n_trmnt + self.n_reg)
+                p_ctrl = (counts[1] + self.n_reg * parent_p_ctrl) / (n_ctrl + self.n_reg)
+            self._nodes['p_trmnt'][node], self._nodes['p_ctrl'][node] = p_trmnt, p_ctrl
+
+            if depth >= self.max_depth or n_ctrl + n_trmnt < 2 * self.min_samples_leaf:
+                continue
+
+            features = np.arange(n_features)
+            if n_candidates < n_features:
+                features = np.sort(random_state.choice(n_features, n_candidates, replace=False))
+
+            split = self._best_split(hist[features])
+            if split is None:
+                continue
+
+            feature, bin_idx = features[split[0]], split[1]
+            goes_left = X_binned[idx, feature] <= bin_idx
+            left_idx, right_idx = idx[goes_left], idx[~goes_left]
+
+            # Build the histogram of the smaller child, the other one is the difference with the parent
+            if len(left_idx) <= len(right_idx):
+                left_hist = histogram(left_idx)
+                right_hist = hist - left_hist
+            else:
+                right_hist = histogram(right_idx)
+                left_hist = hist - right_hist
+
+            left, right = self._add_node(), self._add_node()
+            self._nodes['feature'][node] = feature
+            self._nodes['threshold'][node] = edges[feature][bin_idx]
+            self._nodes['left'][node], self._nodes['right'][node] = left, right
+
+            stack.append((right, right_idx, right_hist, depth + 1, p_trmnt, p_ctrl))
+            stack.append((left, left_idx, left_hist, depth + 1, p_trmnt, p_ctrl))
+
+        nodes = self._nodes
+        is_leaf = np.asarray(nodes['left']) == -1
+        node_ids = np.arange(len(is_leaf))
+        self.feature_ = np.asarray(nodes['feature'], dtype=np.intp)
+        self.threshold_ = np.where(is_leaf, np.inf, nodes['threshold'])
+        self.left_ = np.where(is_leaf, node_ids, nodes['left'])
+        self.right_ = np.where(is_leaf, node_ids, nodes['right'])
+        self.p_trmnt_ = np.asarray(nodes['p_trmnt'])
+        self.p_ctrl_ = np.asarray(nodes['p_ctrl'])
+        del self._nodes
+
+        return self
+
+    def _add_node(self):
+        for key, default in (('feature', 0), ('threshold', np.inf), ('left', -1), ('right', -1),
+                             ('p_trmnt', np.nan), ('p_ctrl', np.nan)):
+            self._nodes[key].append(default)
+        return len(self._nodes['feature']) - 1
+
+    def _best_split(self, hist):
+        """Find the best split of a node from its histograms of candidate features.
+
+        Args:
+            hist (array, shape (n_candidates, n_bins, 4)): Histograms of the node.
+
+        Returns:
+            tuple or None: (candidate position, bin index) or None if no valid split improves the criterion.
+        """
+        total = hist[0].sum(axis=0)
+        left = np.cumsum(hist, axis=1)[:, :-1]
+        right = total - left
+
+        n_ctrl_l, n_trmnt_l, p_ctrl_l, p_trmnt_l = _group_stats(left)
+        n_ctrl_r, n_trmnt_r, p_ctrl_r, p_trmnt_r = _group_stats(right)
+        n_l, n_r = n_ctrl_l + n_trmnt_l, n_ctrl_r + n_trmnt_r
+
+        valid = ((np.minimum(n_l, n_r) >= max(self.min_samples_leaf, _EPS)) &
+                 (np.minimum(np.minimum(n_ctrl_l, n_ctrl_r), np.minimum(n_trmnt_l, n_trmnt_r))
+                  >= self.min_samples_treatment))
+        if not valid.any():
+            return None
+
+        if self.criterion == 'DDP':
+            gain = np.abs((p_trmnt_l - p_ctrl_l) - (p_trmnt_r - p_ctrl_r))
+        else:
+            _, _, p_ctrl, p_trmnt = _group_stats(total)
+            n = n_l + n_r
+            gain = (n_l / n * _divergence(p_trmnt_l, p_ctrl_l, self.criterion) +
+                    n_r / n * _divergence(p_trmnt_r, p_ctrl_r, self.criterion) -
+                    _divergence(p_trmnt, p_ctrl, self.criterion))
+
+        gain = np.where(valid, gain, -np.inf)
+        best = np.unravel_index(np.argmax(gain), gain.shape)
+        if not gain[best] > 0:
+            return None
+        return best
+
+    def _apply(self, X):
+        """Return the index of the leaf each sample falls into."""
+        node = np.zeros(X.shape[0], dtype=np.intp)
+        rows = np.arange(X.shape[0])
+        for _ in range(self.max_depth_):
+            go_left = X[rows, self.feature_[node]] <= self.threshold_[node]
+            node = np.where(go_left, self.left_[node], self.right_[node])
+        return node
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control response rates.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+        X = check_array(X, dtype=np.float64)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError("X has %s features, but the tree is expecting %s features as input."
+                             % (X.shape[1], self.n_features_in_))
+        leaves = self._apply(X)
+        trmnt_preds, ctrl_preds = self.p_trmnt_[leaves], self.p_ctrl_[leaves]
+        return trmnt_preds - ctrl_preds, trmnt_preds, ctrl_preds
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.predict_components(X)[0]
+
+
+def _fit_tree(tree, X_binned, edges, y, treatment, bootstrap, seed):
+    random_state = np.random.RandomState(seed)
+    n_samples = X_binned.shape[0]
+    sample_weight = None
+    if bootstrap:
+        sample_weight = np.bincount(random_state.randint(0, n_samples, n_samples), minlength=n_samples)
+    return tree._fit_binned(X_binned, edges, y, treatment, sample_weight, random_state)
+
+
+class UpliftRandomForestClassifier(BaseEstimator):
+    """Random forest of uplift decision trees with histogram-based split search.
+
+    Features are discretized once and shared by all trees, which are built in parallel on bootstrap samples
+    with a random subset of features considered at each split. The uplift is averaged over the trees.
+    See :class:`.UpliftTreeClassifier` for the details of the trees.
+
+    Read more in the :ref:`User Guide <models>`.
+
+    Args:
+        n_estimators (int, default=10): The number of trees in the forest.
+        criterion (string, 'KL', 'ED', 'Chi' or 'DDP', default='KL'): The function to measure the quality of a split.
+        max_depth (int, default=5): The maximum depth of the trees.
+        min_samples_leaf (int, default=100): The minimum number of samples required to be at a leaf node.
+        min_samples_treatment (int, default=10): The minimum number of samples of each of treatment and control groups
+            required to be at a leaf node.
+        n_reg (int, default=100): The regularization of the leaf response rates: the number of virtual samples
+            with the response rates of the parent node added to each group.
+        max_bins (int, default=255): The maximum number of bins of each feature, at most 65536.
+        max_features (int, float, 'sqrt', 'log2' or None, default='sqrt'): The number of features to consider when
+            looking for the best split. If float, it is a fraction of features. None means all features.
+        bootstrap (bool, default=True): Whether bootstrap samples are used when building trees.
+        n_jobs (int, default=None): The number of jobs to run in parallel for building the trees.
+            ``None`` means 1 unless in a :obj:`joblib.parallel_backend` context.
+            ``-1`` means using all processors.
+        random_state (int, RandomState instance or None, default=None): Controls the bootstrapping, the feature
+            subsampling and the rows used for binning.
+
+    Attributes:
+        estimators_ (list of UpliftTreeClassifier): The fitted trees.
+        n_features_in_ (int): The number of features seen during fit.
+
+    Example::
+
+        # import approach
+        from sklift.models import UpliftRandomForestClassifier
+        from sklift.metrics import qini_auc_score
+
+
+        forest = UpliftRandomForestClassifier(n_estimators=100, criterion='ED', min_samples_leaf=500, n_jobs=-1)
+        forest = forest.fit(X_train, y_train, treat_train)  # fit the model
+        uplift = forest.predict(X_val)  # predict uplift
+        qini = qini_auc_score(y_val, uplift, treat_val)
+
+    References:
+        Guelman, Leo & Guillén, Montserrat & Pérez-Marín, Ana M. (2015). Uplift random forests.
+        Cybernetics and Systems. 46. 230-248.
+
+    See Also:
+
+        * :class:`.UpliftTreeClassifier`: Uplift decision tree.
+    """
+
+    def __init__(self, n_estimators=10, criterion='KL', max_depth=5, min_samples_leaf=100, min_samples_treatment=10,
+                 n_reg=100, max_bins=255, max_features='sqrt', bootstrap=True, n_jobs=None, random_state=None):
+        self.n_estimators = n_estimators
+        self.criterion = criterion
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        self.min_samples_treatment = min_samples_treatment
+        self.n_reg = n_reg
+        self.max_bins = max_bins
+        self.max_features = max_features
+        self.bootstrap = bootstrap
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def fit(self, X, y, treatment):
+        """Build a forest of uplift trees from the training data.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of
+                samples and n_features is the number of features.
+            y (array-like, shape (n_samples,)): Binary target vector relative to X.
+            treatment (array-like, shape (n_samples,)): Binary treatment vector relative to X.
+
+        Returns:
+            object: self
+        """
+
+        X = check_array(X, dtype=np.float64)
+        check_consistent_length(X, y, treatment)
+        check_is_binary(treatment)
+        check_is_binary(y)
+
+        trees = [UpliftTreeClassifier(criterion=self.criterion, max_depth=self.max_depth,
+                                      min_samples_leaf=self.min_samples_leaf,
+                                      min_samples_treatment=self.min_samples_treatment, n_reg=self.n_reg,
+                                      max_bins=self.max_bins, max_features=self.max_features)
+                 for _ in range(self.n_estimators)]
+        if not trees:
+            raise ValueError("n_estimators must be greater than zero, got %s." % self.n_estimators)
+        trees[0]._check_params(X.shape[1])
+
+        random_state = check_random_state(self.random_state)
+        edges = _bin_edges(X, self.max_bins, random_state)
+        X_binned = _bin_data(X, edges)
+        y, treatment = np.asarray(y), np.asarray(treatment)
+        seeds = random_state.randint(np.iinfo(np.int32).max, size=self.n_estimators)
+
+        self.estimators_ = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_tree)(tree, X_binned, edges, y, treatment, self.bootstrap, seed)
+            for tree, seed in zip(trees, seeds)
+        )
+        self.n_features_in_ = X.shape[1]
+        return self
+
+    def predict_components(self, X):
+        """Perform uplift on samples in X and return it together with treatment and control response rates.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            tuple: (uplift, trmnt_preds, ctrl_preds), arrays of shape (n_samples,)
+        """
+        X = check_array(X, dtype=np.float64)
+        trmnt_preds, ctrl_preds = np.zeros(X.shape[0]), np.zeros(X.shape[0])
+        for tree in self.estimators_:
+            _, tree_trmnt_preds, tree_ctrl_preds = tree.predict_components(X)
+            trmnt_preds += tree_trmnt_preds
+            ctrl_preds += tree_ctrl_preds
+        trmnt_preds /= len(self.estimators_)
+        ctrl_preds /= len(self.estimators_)
+        return trmnt_preds - ctrl_preds, trmnt_preds, ctrl_preds
+
+    def predict(self, X):
+        """Perform uplift on samples in X.
+
+        Args:
+            X (array-like, shape (n_samples, n_features)): Training vector, where n_samples is the number of samples
+                and n_features is the number of features.
+
+        Returns:
+            array (shape (n_samples,)): uplift
+        """
+        return self.predict_components(X)[0]
@@ -1,14 +1,31 @@
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pandas as pd
 import pytest
+import requests
 import sklearn
 
 from functools import partial
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
 from ..datasets import (
     clear_data_dir,
     fetch_lenta, fetch_x5,
     fetch_criteo, fetch_hillstrom,
-    fetch_megafon
+    fetch_megafon, fetch_x5_client_features,
+    make_uplift_classification, make_uplift_regression
 )
+from ..datasets import datasets
+from ..metrics import qini_auc_score
+from ..datasets.datasets import _compact_dtypes, _download, _get_file_hash, _iter_csv, _load_memmap, _read_csv
+from ..datasets.features import _ClientAggregates
 
 
 fetch_criteo10 = partial(fetch_criteo, percent10=True)
@@ -151,3 +168,622 @@ def check_return_X_y_t(bunch, dataset_func):
 def test_return_X_y_t(fetch_func):
     data = fetch_func()
     check_return_X_y_t(data, fetch_func)
+
+
+@pytest.fixture
+def csv_dataset(tmp_path):
+    path = str(tmp_path / 'dataset.csv.gz')
+    pd.DataFrame({
+        'f0': np.arange(10) / 3,
+        'group': ['test', 'control'] * 5,
+        'target': (np.arange(10) % 3 == 0).astype(int),
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_read_csv_columnar_cache(csv_dataset):
+    pytest.importorskip('pyarrow')
+    expected = pd.read_csv(csv_dataset, dtype={'f0': 'float32'})
+
+    data = _read_csv(csv_dataset, 'hash1', dtype={'f0': 'float32'})
+    cache_paths = glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')
+    assert len(cache_paths) == 1
+    pd.testing.assert_frame_equal(data, expected)
+
+    # the copy is read instead of the csv
+    os.remove(csv_dataset)
+    pd.testing.assert_frame_equal(_read_csv(csv_dataset, 'hash1', dtype={'f0': 'float32'}), expected)
+
+
+def test_read_csv_columnar_cache_invalidation(csv_dataset):
+    pytest.importorskip('pyarrow')
+    _read_csv(csv_dataset, 'hash1')
+    first_paths = glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')
+    _read_csv(csv_dataset, 'hash2')
+    second_paths = glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')
+
+    assert len(second_paths) == 1
+    assert first_paths != second_paths
+
+
+def test_read_csv_columnar_cache_keeps_parsing_variants(csv_dataset):
+    pytest.importorskip('pyarrow')
+    _read_csv(csv_dataset, 'hash1')
+    _read_csv(csv_dataset, 'hash1', dtype={'f0': 'float32'})
+    assert len(glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')) == 2
+
+    _read_csv(csv_dataset, 'hash2')
+    assert len(glob.glob(csv_dataset[:-len('.csv.gz')] + '.hash2.*.parquet')) == 1
+    assert len(glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')) == 1
+
+
+def test_read_csv_without_columnar_cache(csv_dataset):
+    data = _read_csv(csv_dataset, 'hash1', columnar_cache=False)
+    pd.testing.assert_frame_equal(data, pd.read_csv(csv_dataset))
+    assert not glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')
+
+
+@pytest.fixture
+def local_megafon(tmp_path, monkeypatch):
+    """Serve a small local file in place of the MegaFon dataset."""
+    rng = np.random.RandomState(0)
+    path = str(tmp_path / 'megafon_dataset.csv.gz')
+    data = pd.DataFrame(rng.normal(size=(100, 50)), columns=[f'X_{i}' for i in range(1, 51)])
+    data.insert(0, 'treatment_group', np.where(rng.binomial(1, 0.5, 100), 'treatment', 'control'))
+    data['conversion'] = rng.binomial(1, 0.2, 100)
+    data.to_csv(path, index=False)
+
+    monkeypatch.setattr(datasets, '_get_data', lambda **kwargs: path)
+    monkeypatch.setattr(datasets, '_get_file_hash', lambda path: 'ee8d45a343d4d2cf90bb756c93959ecd')
+    return path
+
+
+def test_fetch_megafon_as_memmap(local_megafon):
+    expected = fetch_megafon(columnar_cache=False)
+    data = fetch_megafon(as_memmap=True)
+
+    assert isinstance(data.data, np.memmap)
+    assert isinstance(data.target, np.memmap)
+    np.testing.assert_array_equal(data.data, expected.data.to_numpy())
+    np.testing.assert_array_equal(data.target, expected.target.to_numpy())
+    np.testing.assert_array_equal(data.treatment, expected.treatment.to_numpy())
+    assert data.feature_names == expected.feature_names
+
+    # the arrays are mapped from the stored files on later calls
+    os.remove(local_megafon)
+    X, y, treatment = fetch_megafon(as_memmap=True, return_X_y_t=True)
+    np.testing.assert_array_equal(X, expected.data.to_numpy())
+
+
+def test_fetch_megafon_memmap_stores_coexist(local_megafon):
+    data = fetch_megafon(as_memmap=True)
+    compact = fetch_megafon(as_memmap=True, compact=True)
+    stores = sorted(glob.glob(local_megafon[:-len('.csv.gz')] + '.*.npy'))
+    assert len(stores) == 2
+
+    # both stores are mapped on later calls, and the arrays returned before stay readable
+    fetch_megafon(as_memmap=True)
+    fetch_megafon(as_memmap=True, compact=True)
+    assert sorted(glob.glob(local_megafon[:-len('.csv.gz')] + '.*.npy')) == stores
+    np.testing.assert_allclose(data.data, compact.data, rtol=1e-6)
+
+
+def test_load_memmap_nullable_labels(csv_dataset):
+    X, labels, feature_names = _load_memmap(csv_dataset, 'hash1', ['group', 'target'], dtype={'target': 'Int8'})
+    assert feature_names == ['f0']
+    assert X.shape == (10, 1)
+    assert labels['target'].dtype == np.int8
+    assert list(labels['group'][:2]) == ['test', 'control']
+
+
+def _load_in_process(load, csv_path, barrier, results):
+    barrier.wait()
+    try:
+        results.put(float(np.asarray(load(csv_path)).sum()))
+    except Exception as e:
+        results.put(repr(e))
+
+
+def _load_memmap_features(csv_path):
+    return _load_memmap(csv_path, 'hash1', ['group', 'target'])[0]
+
+
+def run_in_processes(load, csv_path, n_processes=6):
+    """Call load(csv_path) in several processes started at the same time, return their results."""
+    ctx = multiprocessing.get_context('spawn')
+    barrier, results = ctx.Barrier(n_processes), ctx.Queue()
+    processes = [ctx.Process(target=_load_in_process, args=(load, csv_path, barrier, results))
+                 for _ in range(n_processes)]
+    for process in processes:
+        process.start()
+    outputs = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join()
+    return outputs
+
+
+@pytest.fixture
+def large_csv_dataset(tmp_path):
+    path = str(tmp_path / 'dataset.csv')
+    n = 50000
+    pd.DataFrame({
+        'f0': np.arange(n) / 3,
+        'f1': np.arange(n) % 7,
+        'group': ['test', 'control'] * (n // 2),
+        'target': (np.arange(n) % 3 == 0).astype(int),
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_load_memmap_concurrent_processes(large_csv_dataset):
+    outputs = run_in_processes(_load_memmap_features, large_csv_dataset)
+    expected = float(_load_memmap_features(large_csv_dataset).sum())
+
+    assert outputs == [expected] * len(outputs)
+    assert glob.glob(large_csv_dataset[:-len('.csv')] + '*.tmp') == []
+
+
+def _read_csv_cached(csv_path):
+    return _read_csv(csv_path, 'hash1').drop(columns='group')
+
+
+def test_read_csv_concurrent_processes(large_csv_dataset):
+    pytest.importorskip('pyarrow')
+    outputs = run_in_processes(_read_csv_cached, large_csv_dataset)
+    expected = float(pd.read_csv(large_csv_dataset).drop(columns='group').to_numpy().sum())
+
+    assert outputs == [expected] * len(outputs)
+    assert len(glob.glob(large_csv_dataset[:-len('.csv')] + '.*.parquet')) == 1
+    assert glob.glob(large_csv_dataset[:-len('.csv')] + '*.tmp') == []
+    assert float(_read_csv_cached(large_csv_dataset).to_numpy().sum()) == expected
+
+
+def test_fetch_megafon_chunksize(local_megafon):
+    expected = fetch_megafon(columnar_cache=False)
+    batches = list(fetch_megafon(chunksize=30))
+
+    assert [len(X) for X, _, _ in batches] == [30, 30, 30, 10]
+    pd.testing.assert_frame_equal(pd.concat([X for X, _, _ in batches]), expected.data)
+    pd.testing.assert_series_equal(pd.concat([y for _, y, _ in batches]), expected.target)
+    pd.testing.assert_series_equal(pd.concat([t for _, _, t in batches]), expected.treatment)
+
+
+def test_iter_csv_consistent_dtypes(tmp_path):
+    path = str(tmp_path / 'dataset.csv.gz')
+    pd.DataFrame({
+        'f0': [1, 2, 3, None],
+        'f1': ['a', 'b', None, 'c'],
+        'target': [0, 1, 0, 1],
+        'treatment': [1, 1, 0, 0],
+    }).to_csv(path, index=False)
+
+    batches = list(_iter_csv(path, 2, 'target', 'treatment', ['target', 'treatment']))
+    assert len(batches) == 2
+    for X, y, treatment in batches:
+        assert list(X.dtypes) == [np.float64, object]
+        assert y.dtype == np.int64 and treatment.dtype == np.int64
+
+
+@pytest.mark.parametrize("params", [{'chunksize': 0}, {'chunksize': 1.5}, {'chunksize': 10, 'as_memmap': True}])
+def test_fetch_chunksize_error(params):
+    with pytest.raises(ValueError):
+        fetch_megafon(**params)
+
+
+def test_compact_dtypes():
+    data = pd.DataFrame({
+        'f0': np.linspace(0, 1, 100),
+        'flag': np.arange(100) % 2,
+        'count': np.arange(100) * 10,
+        'group': ['test', 'control'] * 50,
+        'id': [str(i) for i in range(100)],
+    })
+    compact, report = _compact_dtypes(data)
+
+    assert compact.dtypes.to_dict() == {
+        'f0': np.float32, 'flag': np.uint8, 'count': np.uint16, 'group': 'category', 'id': object
+    }
+    np.testing.assert_allclose(compact['f0'], data['f0'], rtol=1e-6)
+    assert report['original_bytes'] == data.memory_usage(deep=True).sum()
+    assert report['ratio'] == report['original_bytes'] / report['compact_bytes'] > 1
+
+
+def test_fetch_megafon_compact(local_megafon):
+    expected = fetch_megafon(columnar_cache=False)
+    data = fetch_megafon(compact=True)
+
+    assert set(data.data.dtypes) == {np.dtype(np.float32)}
+    assert data.target.dtype == np.uint8
+    assert data.treatment.dtype == 'category'
+    assert data.memory_report['ratio'] > 1.5
+    np.testing.assert_allclose(data.data, expected.data, rtol=1e-6)
+
+    assert fetch_megafon(as_memmap=True, compact=True).data.dtype == np.float32
+    X, _, _ = next(fetch_megafon(chunksize=10, compact=True))
+    assert set(X.dtypes) == {np.dtype(np.float32)}
+
+
+def test_fetch_megafon_columns_and_nrows(local_megafon):
+    expected = fetch_megafon(columnar_cache=False)
+    data = fetch_megafon(columns=['X_3', 'X_1'], nrows=40, columnar_cache=False)
+
+    assert data.feature_names == ['X_1', 'X_3']
+    pd.testing.assert_frame_equal(data.data, expected.data[['X_1', 'X_3']].iloc[:40])
+    pd.testing.assert_series_equal(data.target, expected.target.iloc[:40])
+
+
+@pytest.mark.parametrize("columnar_cache", [False, True])
+def test_fetch_megafon_sample_frac(local_megafon, columnar_cache):
+    expected = fetch_megafon(columnar_cache=columnar_cache)
+    data = fetch_megafon(sample_frac=0.3, random_state=1, columnar_cache=columnar_cache)
+
+    assert 10 < len(data.data) < 50
+    pd.testing.assert_frame_equal(data.data, expected.data.loc[data.data.index])
+    # the same rows on every call, whether the file or its columnar copy is read
+    pd.testing.assert_frame_equal(fetch_megafon(sample_frac=0.3, random_state=1, columnar_cache=False).data,
+                                  data.data)
+    assert not data.data.index.equals(fetch_megafon(sample_frac=0.3, random_state=2).data.index)
+
+    batches = list(fetch_megafon(chunksize=30, sample_frac=0.3, random_state=1))
+    pd.testing.assert_frame_equal(pd.concat([X for X, _, _ in batches]), data.data)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {'columns': 'X_1'},
+        {'nrows': 0},
+        {'sample_frac': 0},
+        {'sample_frac': 1.5},
+        {'sample_frac': 0.5, 'random_state': -1},
+        {'nrows': 10, 'as_memmap': True},
+    ]
+)
+def test_fetch_selection_error(params):
+    with pytest.raises(ValueError):
+        fetch_megafon(**params)
+
+
+def test_get_file_hash_manifest(csv_dataset):
+    with open(csv_dataset, 'rb') as f:
+        expected = hashlib.md5(f.read()).hexdigest()
+    assert _get_file_hash(csv_dataset, chunk_size=7) == expected
+
+    manifest_path = os.path.join(os.path.dirname(csv_dataset), 'manifest.json')
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    assert manifest['dataset.csv.gz']['md5'] == expected
+    assert manifest['dataset.csv.gz']['size'] == os.path.getsize(csv_dataset)
+
+    # the recorded hash is trusted while the size and the modification time of the file are unchanged
+    manifest['dataset.csv.gz']['md5'] = 'recorded'
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    assert _get_file_hash(csv_dataset) == 'recorded'
+    assert _get_file_hash(csv_dataset, use_manifest=False) == expected
+
+    stat = os.stat(csv_dataset)
+    os.utime(csv_dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert _get_file_hash(csv_dataset) == expected
+
+
+class RangeRequestHandler(BaseHTTPRequestHandler):
+    """Serve ``server.payload`` with Range support, dropping the first ``server.n_failures`` connections midway."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send_headers(self, status, start, end):
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start))
+        if self.server.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(self.server.payload)}')
+        self.end_headers()
+
+    def do_HEAD(self):
+        if not self.server.allow_head:
+            self.send_error(405)
+            return
+        self._send_headers(200, 0, len(self.server.payload))
+
+    def do_GET(self):
+        start, end, status = 0, len(self.server.payload), 200
+        range_header = self.headers.get('Range')
+        if range_header and self.server.accept_ranges and not self.server.ignore_range:
+            first, last = range_header[len('bytes='):].split('-')
+            start, end, status = int(first), int(last) + 1, 206
+        self._send_headers(status, start, end)
+
+        with self.server.lock:
+            self.server.n_gets += 1
+            fail = self.server.n_failures > 0
+            self.server.n_failures -= fail
+        body = self.server.payload[start:end]
+        if fail:
+            body = body[:len(body) // 2]
+        self.wfile.write(body)
+        with self.server.lock:
+            self.server.served_bytes += len(body)
+        if fail:
+            self.close_connection = True
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeRequestHandler)
+    server.payload = np.random.RandomState(0).bytes(100_000)
+    server.accept_ranges, server.n_failures, server.served_bytes, server.n_gets = True, 0, 0, 0
+    server.allow_head, server.ignore_range = True, False
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("accept_ranges", [True, False])
+def test_download_retries(http_server, tmp_path, accept_ranges):
+    http_server.accept_ranges, http_server.n_failures = accept_ranges, 3
+    dest_path = str(tmp_path / 'data.csv.gz')
+    url = f'http://127.0.0.1:{http_server.server_port}/data.csv.gz'
+    _download(url, dest_path, n_segments=4, backoff_factor=0, chunk_size=4096)
+
+    with open(dest_path, 'rb') as f:
+        assert f.read() == http_server.payload
+    assert os.listdir(str(tmp_path)) == ['data.csv.gz']
+
+
+def test_download_resumes(http_server, tmp_path):
+    http_server.n_failures = 10
+    dest_path = str(tmp_path / 'data.csv.gz')
+    url = f'http://127.0.0.1:{http_server.server_port}/data.csv.gz'
+    with pytest.raises(Exception):
+        _download(url, dest_path, n_segments=2, max_retries=1, backoff_factor=0, chunk_size=4096)
+    assert not os.path.exists(dest_path)
+    assert os.path.exists(dest_path + '.part')
+
+    # the written ranges are not downloaded again
+    http_server.n_failures, http_server.served_bytes = 0, 0
+    _download(url, dest_path, n_segments=2, backoff_factor=0, chunk_size=4096)
+    with open(dest_path, 'rb') as f:
+        assert f.read() == http_server.payload
+    assert http_server.served_bytes < len(http_server.payload) / 2
+    assert os.listdir(str(tmp_path)) == ['data.csv.gz']
+
+
+@pytest.fixture
+def local_x5(tmp_path, monkeypatch):
+    """Serve small local files in place of the X5 RetailHero dataset, recording the loaded files."""
+    client_ids = [f'{i:010x}' for i in range(200)]
+    pd.DataFrame({'client_id': client_ids, 'treatment_flg': np.arange(200) % 2,
+                  'target': (np.arange(200) % 3 == 0).astype(int)}).to_csv(tmp_path / 'uplift_train.csv.gz',
+                                                                          index=False)
+    pd.DataFrame({'client_id': client_ids[::-1], 'age': np.arange(200)}).to_csv(tmp_path / 'clients.csv.gz',
+                                                                               index=False)
+    pd.DataFrame({'client_id': np.repeat(client_ids, 3), 'purchase_sum': np.arange(600) / 10,
+                  'store_id': 'a'}).to_csv(tmp_path / 'purchases.csv.gz', index=False)
+
+    hashes = {
+        'uplift_train.csv.gz': '2720bbb659daa9e0989b2777b6a42d19',
+        'clients.csv.gz': 'b9cdeb2806b732771de03e819b3354c5',
+        'purchases.csv.gz': '48d2de13428e24e8b61d66fef02957a8',
+    }
+    loaded = []
+
+    def get_data(dest_filename, **kwargs):
+        loaded.append(dest_filename)
+        return str(tmp_path / dest_filename)
+
+    monkeypatch.setattr(datasets, '_get_data', get_data)
+    monkeypatch.setattr(datasets, '_get_file_hash', lambda path: hashes[os.path.basename(path)])
+    return loaded
+
+
+def test_fetch_x5_lazy_purchases(local_x5):
+    expected = fetch_x5(columnar_cache=False)
+    assert sorted(local_x5) == ['clients.csv.gz', 'purchases.csv.gz', 'uplift_train.csv.gz']
+    assert expected.feature_names.purchases_features == ['client_id', 'purchase_sum', 'store_id']
+
+    local_x5.clear()
+    data = fetch_x5(lazy_purchases=True, columnar_cache=False)
+    assert 'purchases.csv.gz' not in local_x5
+    pd.testing.assert_frame_equal(data.data.train, expected.data.train)
+    pd.testing.assert_frame_equal(data.data.clients, expected.data.clients)
+
+    assert data.feature_names.purchases_features == expected.feature_names.purchases_features
+    pd.testing.assert_frame_equal(data.data.purchases, expected.data.purchases)
+    assert local_x5.count('purchases.csv.gz') == 1
+
+
+def test_fetch_x5_sample_frac(local_x5):
+    data = fetch_x5(sample_frac=0.3, columns={'purchases': ['purchase_sum']}, compact=True)
+
+    client_ids = set(data.data.train['client_id'])
+    assert 20 < len(client_ids) < 100
+    assert set(data.data.clients['client_id']) == client_ids
+    assert set(data.data.purchases['client_id']) == client_ids
+    assert list(data.data.purchases.columns) == ['client_id', 'purchase_sum']
+    assert data.memory_report['ratio'] > 1
+
+
+def test_fetch_x5_client_features(local_x5, tmp_path):
+    rng = np.random.RandomState(0)
+    n_transactions = 300
+    transactions = pd.DataFrame({
+        'client_id': [f'{i:010x}' for i in rng.randint(0, 250, n_transactions)],
+        'transaction_id': [f't{i}' for i in range(n_transactions)],
+        'transaction_datetime': pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.randint(0, 10 ** 7, n_transactions),
+                                                                             unit='s'),
+        'regular_points_received': rng.exponential(10, n_transactions).round(1),
+        'express_points_received': 0.,
+        'regular_points_spent': -rng.binomial(1, 0.2, n_transactions) * 50.,
+        'express_points_spent': 0.,
+        'purchase_sum': rng.exponential(500, n_transactions).round(2),
+        'store_id': 's1',
+    })
+    lines = transactions.loc[np.repeat(np.arange(n_transactions), rng.randint(1, 5, n_transactions))]
+    lines = lines.assign(product_id='p', product_quantity=rng.randint(1, 3, len(lines)).astype(float),
+                         trn_sum_from_iss=rng.exponential(50, len(lines)).round(2),
+                         trn_sum_from_red=np.where(rng.binomial(1, 0.1, len(lines)), 10., np.nan))
+    lines.to_csv(tmp_path / 'purchases.csv.gz', index=False)
+
+    # transactions are split between chunks
+    features = fetch_x5_client_features(chunksize=7, reference_date='2019-06-01')
+    assert 'clients.csv.gz' not in local_x5
+    train_ids = pd.read_csv(tmp_path / 'uplift_train.csv.gz')['client_id']
+    assert list(features.index) == list(train_ids)
+
+    train_lines = lines[lines['client_id'].isin(train_ids)]
+    train_transactions = train_lines.drop_duplicates('transaction_id').groupby('client_id')
+    expected_count = train_transactions.size().reindex(train_ids, fill_value=0)
+    np.testing.assert_array_equal(features['n_transactions'], expected_count)
+    np.testing.assert_array_equal(features['n_products'],
+                                  train_lines.groupby('client_id').size().reindex(train_ids, fill_value=0))
+    np.testing.assert_allclose(features['purchase_sum'],
+                               train_transactions['purchase_sum'].sum().reindex(train_ids, fill_value=0), rtol=1e-5)
+    np.testing.assert_allclose(features['trn_sum_from_red'],
+                               train_lines.groupby('client_id')['trn_sum_from_red'].sum().reindex(train_ids,
+                                                                                                   fill_value=0))
+    np.testing.assert_allclose(features['purchase_sum_max'],
+                               train_transactions['purchase_sum'].max().reindex(train_ids), rtol=1e-6)
+    expected_recency = (pd.Timestamp('2019-06-01') - pd.to_datetime(train_transactions['transaction_datetime'].max()))
+    np.testing.assert_allclose(features['recency_days'],
+                               (expected_recency.dt.total_seconds() / 86400).reindex(train_ids), rtol=1e-6)
+    assert features['purchase_sum_mean'].isna().sum() == (expected_count == 0).sum() > 0
+
+    pd.testing.assert_frame_equal(fetch_x5_client_features(train_ids[:50], chunksize=1000,
+                                                           reference_date='2019-06-01'),
+                                  features.iloc[:50])
+
+
+def test_client_aggregates_merge():
+    purchases = pd.DataFrame({
+        'client_id': ['a', 'a', 'b', 'c', 'c', 'a'],
+        'transaction_id': ['t1', 't1', 't2', 't3', 't4', 't5'],
+        'transaction_datetime': ['2019-01-01', '2019-01-01', '2019-01-02', '2019-01-03', '2019-01-05', '2019-01-11'],
+        'purchase_sum': [10., 10., 5., 7., 8., 20.],
+        'product_quantity': [1., 2., 1., 1., 3., 1.],
+    })
+    for col in ['regular_points_received', 'express_points_received', 'regular_points_spent',
+                'express_points_spent', 'trn_sum_from_iss', 'trn_sum_from_red']:
+        purchases[col] = 1.
+
+    full = _ClientAggregates(['a', 'b', 'c', 'd']).update(purchases).to_frame()
+    merged = _ClientAggregates(['a', 'b', 'c', 'd']).update(purchases.iloc[:3]).merge(
+        _ClientAggregates(['a', 'b', 'c', 'd']).update(purchases.iloc[3:])).to_frame()
+    pd.testing.assert_frame_equal(merged, full)
+
+    assert list(full['n_transactions']) == [2, 1, 2, 0]
+    assert list(full['n_products']) == [3, 1, 2, 0]
+    assert list(full['purchase_sum']) == [30., 5., 15., 0.]
+    assert list(full['product_quantity']) == [4., 1., 4., 0.]
+    assert list(full['tenure_days'][:3]) == [10., 0., 2.]
+    assert list(full['recency_days'][:3]) == [0., 9., 6.]
+
+
+@pytest.mark.parametrize("make_uplift", [make_uplift_classification, make_uplift_regression])
+def test_make_uplift_chunks_and_memmap(make_uplift, tmp_path):
+    n_samples = 2 ** 16 + 1000
+    X, y, treatment, effect = make_uplift(n_samples=n_samples, n_features=4, n_informative=3, random_state=0)
+    assert X.shape == (n_samples, 4) and y.shape == treatment.shape == effect.shape == (n_samples,)
+
+    chunks = list(make_uplift(n_samples=n_samples, n_features=4, n_informative=3, chunksize=30000, random_state=0))
+    assert [len(chunk[0]) for chunk in chunks] == [30000, 30000, 6536]
+    for expected, array in zip((X, y, treatment, effect), zip(*chunks)):
+        np.testing.assert_array_equal(np.concatenate(array), expected)
+
+    mapped = make_uplift(n_samples=n_samples, n_features=4, n_informative=3, chunksize=10000, memmap_dir=str(tmp_path),
+                         random_state=0)
+    for expected, array in zip((X, y, treatment, effect), mapped):
+        assert isinstance(array, np.memmap)
+        np.testing.assert_array_equal(array, expected)
+
+    assert not np.array_equal(make_uplift(n_samples=100, n_features=4, n_informative=3, random_state=1)[0], X[:100])
+
+
+def test_make_uplift_classification_effects():
+    X, y, treatment, effect = make_uplift_classification(n_samples=200000, treatment_ratio=0.2, base_rate=0.3,
+                                                          average_effect=0.1, random_state=0)
+    assert treatment.mean() == pytest.approx(0.2, abs=0.01)
+    assert set(np.unique(y)) == {0, 1}
+    observed_effect = y[treatment == 1].mean() - y[treatment == 0].mean()
+    assert observed_effect == pytest.approx(effect.mean(), abs=0.01)
+    assert effect.std() > 0.02
+    assert qini_auc_score(y, effect, treatment) > qini_auc_score(y, -effect, treatment)
+
+    _, _, _, constant_effect = make_uplift_classification(n_samples=1000, n_informative=0,
+                                                          effect_heterogeneity=0, random_state=0)
+    np.testing.assert_allclose(constant_effect, 0.05)
+
+
+def test_make_uplift_regression_effects():
+    X, y, treatment, effect = make_uplift_regression(n_samples=100000, average_effect=2., effect_heterogeneity=0.5,
+                                                     dtype=np.float32, random_state=0)
+    assert X.dtype == y.dtype == effect.dtype == np.float32
+    assert effect.mean() == pytest.approx(2., abs=0.05)
+    assert effect.std() == pytest.approx(0.5, rel=0.5)
+    assert y[treatment == 1].mean() - y[treatment == 0].mean() == pytest.approx(effect.mean(), abs=0.05)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {'n_samples': 0},
+        {'n_uplift': 20},
+        {'treatment_ratio': 1},
+        {'effect_heterogeneity': -1},
+        {'base_rate': 0.99},
+        {'chunksize': 0},
+    ]
+)
+def test_make_uplift_classification_errors(params):
+    with pytest.raises(ValueError):
+        make_uplift_classification(**params)
+
+
+@pytest.mark.parametrize("server_params", [{'allow_head': False}, {'ignore_range': True}])
+def test_download_falls_back_to_single_request(http_server, tmp_path, server_params):
+    for key, value in server_params.items():
+        setattr(http_server, key, value)
+    dest_path = str(tmp_path / 'data.csv.gz')
+    _download(f'http://127.0.0.1:{http_server.server_port}/data.csv.gz', dest_path, backoff_factor=0)
+
+    with open(dest_path, 'rb') as f:
+        assert f.read() == http_server.payload
+    assert os.listdir(str(tmp_path)) == ['data.csv.gz']
+
+
+@pytest.mark.parametrize("accept_ranges", [True, False])
+def test_download_retries_once_per_request(http_server, tmp_path, accept_ranges):
+    http_server.accept_ranges, http_server.n_failures = accept_ranges, 1000
+    with pytest.raises(requests.RequestException):
+        _download(f'http://127.0.0.1:{http_server.server_port}/data.csv.gz', str(tmp_path / 'data.csv.gz'),
+                  n_segments=2, max_retries=2, backoff_factor=0, chunk_size=4096)
+    assert http_server.n_gets <= (2 if accept_ranges else 1) * 3
+
+
+def test_fetch_x5_nrows(local_x5):
+    data = fetch_x5(nrows=20)
+
+    assert len(data.data.train) == 20
+    client_ids = set(data.data.train['client_id'])
+    assert set(data.data.clients['client_id']) == client_ids
+    assert set(data.data.purchases['client_id']) == client_ids
+    assert len(data.data.purchases) == 60
+
+
+def test_read_csv_nrows_skips_columnar_cache(csv_dataset):
+    pytest.importorskip('pyarrow')
+    _read_csv(csv_dataset, 'hash1')
+    cache_path, = glob.glob(csv_dataset[:-len('.csv.gz')] + '.*.parquet')
+    with open(cache_path, 'wb') as f:
+        f.write(b'broken')
+
+    pd.testing.assert_frame_equal(_read_csv(csv_dataset, 'hash1', nrows=3), pd.read_csv(csv_dataset, nrows=3))
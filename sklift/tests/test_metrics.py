@@ -9,7 +9,7 @@ from sklearn.utils._testing import assert_array_almost_equal
 
 from ..metrics import make_uplift_scorer
 from ..metrics import uplift_curve, uplift_auc_score, perfect_uplift_curve
-from ..metrics import qini_curve, qini_auc_score, perfect_qini_curve
+from ..metrics import qini_curve, qini_auc_score, perfect_qini_curve, qini_auc_score_by_stage
 from ..metrics import (uplift_at_k, response_rate_by_percentile,
                        weighted_average_uplift, uplift_by_percentile, treatment_balance_curve, average_squared_deviation)
 
@@ -270,6 +270,22 @@ def test_qini_auc_score_error():
 		qini_auc_score(y_true, uplift, treatment, negative_effect=5)        
 
 
+@pytest.mark.parametrize("negative_effect", [True, False])
+def test_qini_auc_score_by_stage(negative_effect):
+    y_true, uplift, treatment = make_predictions(binary=True)
+    staged_uplift = (uplift * k + np.random.RandomState(k).normal(size=len(uplift)) for k in range(3))
+
+    scores = qini_auc_score_by_stage(y_true, staged_uplift, treatment, negative_effect=negative_effect)
+    assert scores.shape == (3,)
+    for k, score in enumerate(scores):
+        expected = qini_auc_score(y_true, uplift * k + np.random.RandomState(k).normal(size=len(uplift)), treatment,
+                                  negative_effect=negative_effect)
+        assert_array_almost_equal(score, expected)
+
+    with pytest.raises(TypeError):
+        qini_auc_score_by_stage(y_true, [uplift], treatment, negative_effect=5)
+
+
 def test_uplift_at_k():
     y_true, uplift, treatment = make_predictions(binary=True)
 
@@ -0,0 +1,236 @@
+import numpy as np
+import pytest
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
+
+from ..metrics import qini_auc_score
+from ..models import SoloModel, TwoModels
+from ..model_selection import UpliftGridSearchCV, UpliftHalvingSearchCV
+from ..model_selection.search import _stratified_order, _uplift_folds
+
+FITTED = []
+
+
+class CountingLogisticRegression(LogisticRegression):
+    def fit(self, X, y, sample_weight=None):
+        FITTED.append(self.C)
+        return super().fit(X, y, sample_weight)
+
+
+@pytest.fixture
+def uplift_dataset():
+    rng = np.random.RandomState(0)
+    n = 2000
+    X = rng.normal(size=(n, 3))
+    treat = rng.binomial(1, 0.5, n)
+    y = rng.binomial(1, 1 / (1 + np.exp(-(X[:, 0] + treat * X[:, 1]))))
+    return X, y, treat
+
+
+@pytest.mark.parametrize(
+    "estimator, param_grid",
+    [
+        (TwoModels(LogisticRegression(), LogisticRegression()), {'estimator_trmnt__C': [0.01, 1.]}),
+        (TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_control'),
+         {'estimator_ctrl__C': [0.01, 1.]}),
+        (SoloModel(LogisticRegression(), method='treatment_interaction'), {'estimator__C': [0.01, 1.]}),
+    ]
+)
+def test_grid_search_results(estimator, param_grid, uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftGridSearchCV(estimator, param_grid, cv=3, random_state=0).fit(X, y, treat)
+
+    assert len(search.cv_results_['params']) == 2
+    assert search.cv_results_['split2_test_score'].shape == (2,)
+    assert search.cv_results_['rank_test_score'][search.best_index_] == 1
+    assert search.best_score_ == np.max(search.cv_results_['mean_test_score'])
+    assert search.predict(X).shape == (X.shape[0],)
+
+
+def test_grid_search_scores_match_manual_cv(uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftGridSearchCV(
+        TwoModels(LogisticRegression(), LogisticRegression()),
+        {'estimator_trmnt__C': [0.01, 1.], 'estimator_ctrl__C': [0.01, 1.]},
+        cv=3, refit=False, random_state=0
+    ).fit(X, y, treat)
+
+    folds = _uplift_folds(y, treat, 3, 0)
+    for params, score in zip(search.cv_results_['params'], search.cv_results_['split1_test_score']):
+        train, test = folds[1]
+        model = TwoModels(LogisticRegression(), LogisticRegression()).set_params(**params)
+        uplift = model.fit(X[train], y[train], treat[train]).predict(X[test])
+        assert score == pytest.approx(qini_auc_score(y[test], uplift, treat[test]))
+
+
+@pytest.mark.parametrize("estimator", [
+    TwoModels(LogisticRegression(), LogisticRegression()),
+    TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_control'),
+])
+def test_grid_search_slices_group_fit_params(estimator, uplift_dataset):
+    X, y, treat = uplift_dataset
+    weight = np.random.RandomState(1).uniform(0.5, 2., len(y))
+    fit_params = {
+        'estimator_trmnt_fit_params': {'sample_weight': weight[treat == 1]},
+        'estimator_ctrl_fit_params': {'sample_weight': weight[treat == 0]},
+    }
+    search = UpliftGridSearchCV(estimator, {'estimator_trmnt__C': [0.01, 1.]}, cv=3, refit=False,
+                                random_state=0).fit(X, y, treat, **fit_params)
+
+    train, test = _uplift_folds(y, treat, 3, 0)[1]
+    w_train, t_train = weight[train], treat[train]
+    for params, score in zip(search.cv_results_['params'], search.cv_results_['split1_test_score']):
+        model = clone(estimator).set_params(**params)
+        uplift = model.fit(
+            X[train], y[train], t_train,
+            estimator_trmnt_fit_params={'sample_weight': w_train[t_train == 1]},
+            estimator_ctrl_fit_params={'sample_weight': w_train[t_train == 0]}
+        ).predict(X[test])
+        assert score == pytest.approx(qini_auc_score(y[test], uplift, treat[test]))
+
+
+def test_grid_search_reuses_fitted_arms(uplift_dataset):
+    X, y, treat = uplift_dataset
+    FITTED.clear()
+    UpliftGridSearchCV(
+        TwoModels(CountingLogisticRegression(), CountingLogisticRegression()),
+        {'estimator_trmnt__C': [0.1, 1., 10.], 'estimator_ctrl__C': [0.1, 1., 10.]},
+        cv=3, refit=False
+    ).fit(X, y, treat)
+
+    # 3 configurations of each arm on each of 3 folds instead of 2 * 9 * 3 fits
+    assert len(FITTED) == 2 * 3 * 3
+
+
+def test_grid_search_parallel(uplift_dataset):
+    X, y, treat = uplift_dataset
+    param_grid = {'estimator_trmnt__C': [0.1, 1.], 'estimator_ctrl__C': [0.1, 1.]}
+    estimator = TwoModels(LogisticRegression(), LogisticRegression())
+
+    sequential = UpliftGridSearchCV(estimator, param_grid, scoring='uplift_at_k',
+                                    scoring_params={'strategy': 'overall'}, cv=3, random_state=0).fit(X, y, treat)
+    parallel = UpliftGridSearchCV(estimator, param_grid, scoring='uplift_at_k',
+                                  scoring_params={'strategy': 'overall'}, cv=3, random_state=0,
+                                  n_jobs=2).fit(X, y, treat)
+    np.testing.assert_allclose(sequential.cv_results_['mean_test_score'], parallel.cv_results_['mean_test_score'])
+
+
+def test_grid_search_scoring_error(uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftGridSearchCV(TwoModels(LogisticRegression(), LogisticRegression()),
+                                {'estimator_trmnt__C': [1.]}, scoring='auc')
+    with pytest.raises(ValueError):
+        search.fit(X, y, treat)
+
+
+def test_halving_search_rungs(uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftHalvingSearchCV(
+        TwoModels(LogisticRegression(), LogisticRegression()),
+        {'estimator_trmnt__C': [0.001, 0.01, 0.1, 1., 10.], 'estimator_ctrl__C': [0.01, 1.]},
+        factor=3, cv=3, random_state=0
+    ).fit(X, y, treat)
+
+    assert search.n_candidates_ == [10, 4, 2]
+    assert search.n_resources_[-1] == X.shape[0]
+    assert all(r * 3 == r_next for r, r_next in zip(search.n_resources_[:-2], search.n_resources_[1:-1]))
+    assert len(search.cv_results_['params']) == sum(search.n_candidates_)
+    assert search.cv_results_['iter'][search.best_index_] == search.n_iterations_ - 1
+    assert search.predict(X).shape == (X.shape[0],)
+
+
+def test_halving_search_keeps_best_candidates(uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftHalvingSearchCV(
+        SoloModel(LogisticRegression(), method='treatment_interaction'),
+        {'estimator__C': [0.001, 0.01, 0.1, 1.]},
+        factor=2, min_resources=500, scoring='uplift_at_k', scoring_params={'strategy': 'overall'},
+        cv=3, refit=False, random_state=0
+    ).fit(X, y, treat)
+
+    results = search.cv_results_
+    first = results['iter'] == 0
+    kept = [results['params'][pos] for pos in np.flatnonzero(results['iter'] == 1)]
+    best = [results['params'][pos] for pos in np.flatnonzero(first) if results['rank_test_score'][pos] <= 2]
+    assert sorted(p['estimator__C'] for p in kept) == sorted(p['estimator__C'] for p in best)
+    assert search.n_resources_ == [500, 1000, 2000][:search.n_iterations_]
+
+
+@pytest.mark.parametrize("factor", [np.int64(3), 1.5])
+def test_halving_search_factor_types(factor, uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftHalvingSearchCV(
+        TwoModels(LogisticRegression(), LogisticRegression()),
+        {'estimator_trmnt__C': [0.001, 0.01, 0.1, 1.], 'estimator_ctrl__C': [0.01, 1.]},
+        factor=factor, cv=3, refit=False, random_state=0
+    ).fit(X, y, treat)
+
+    assert all(isinstance(n, int) for n in search.n_resources_)
+    assert search.n_resources_[-1] == X.shape[0]
+    assert search.n_candidates_[1] == int(np.ceil(8 / factor))
+
+
+def test_stratified_order_prefixes(uplift_dataset):
+    _, y, treat = uplift_dataset
+    order = _stratified_order(y, treat, 0)
+    assert np.array_equal(np.sort(order), np.arange(len(y)))
+    strata = 2 * treat + y
+    for n in (100, 1000):
+        np.testing.assert_allclose(np.bincount(strata[order[:n]], minlength=4) / n,
+                                   np.bincount(strata, minlength=4) / len(y), atol=0.02)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {'factor': 1},
+        {'factor': 0.5},
+        {'factor': '3'},
+        {'max_resources': 10 ** 6},
+        {'min_resources': 1500, 'max_resources': 1000},
+    ]
+)
+def test_halving_search_params_error(params, uplift_dataset):
+    X, y, treat = uplift_dataset
+    search = UpliftHalvingSearchCV(TwoModels(LogisticRegression(), LogisticRegression()),
+                                   {'estimator_trmnt__C': [1.]}, **params)
+    with pytest.raises(ValueError):
+        search.fit(X, y, treat)
+
+
+def test_halving_search_imbalanced_treatment():
+    rng = np.random.RandomState(0)
+    n = 3000
+    X = rng.normal(size=(n, 3))
+    treat = rng.binomial(1, 0.02, n)
+    y = rng.binomial(1, 1 / (1 + np.exp(-(X[:, 0] - 1 + treat * X[:, 1]))))
+    search = UpliftHalvingSearchCV(
+        TwoModels(LogisticRegression(), LogisticRegression()),
+        {'estimator_trmnt__C': [0.001, 0.01, 0.1, 1.], 'estimator_ctrl__C': [0.01, 0.1, 1.]},
+        factor=3, cv=3, refit=False, random_state=0
+    ).fit(X, y, treat)
+
+    rows = np.sort(_stratified_order(y, treat, 0)[:search.n_resources_[0]])
+    assert np.bincount(2 * treat[rows] + y[rows], minlength=4).min() >= 2 * 3
+    assert np.isfinite(search.cv_results_['mean_test_score']).all()
+
+
+class NanClassifier(LogisticRegression):
+    def predict_proba(self, X):
+        return np.full((len(X), 2), np.nan)
+
+
+def test_grid_search_ranks_nan_scores_last(uplift_dataset):
+    X, y, treat = uplift_dataset
+
+    def scoring(y_true, uplift, treatment):
+        return np.nan if np.isnan(uplift).any() else qini_auc_score(y_true, uplift, treatment)
+
+    search = UpliftGridSearchCV(TwoModels(LogisticRegression(), LogisticRegression()),
+                                {'estimator_trmnt': [NanClassifier(), LogisticRegression()]},
+                                scoring=scoring, cv=3, refit=False, random_state=0)
+    with pytest.warns(UserWarning, match='nan scores'):
+        search.fit(X, y, treat)
+
+    assert search.best_index_ == 1
+    assert list(search.cv_results_['rank_test_score']) == [2, 1]
@@ -3,15 +3,40 @@ import warnings
 import pytest
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LogisticRegression, LinearRegression
+from sklearn.base import clone
+from sklearn.linear_model import (
+    LogisticRegression, LinearRegression, Ridge, SGDClassifier, SGDRegressor, PoissonRegressor, TweedieRegressor
+)
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.model_selection import StratifiedKFold, cross_val_predict, cross_validate
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+from sklearn.ensemble import (
+    RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier,
+    GradientBoostingClassifier, GradientBoostingRegressor
+)
 
 from ..models import (
     SoloModel,
     ClassTransformation,
-    TwoModels
+    ClassTransformationReg,
+    TwoModels,
+    MultiTreatmentTwoModels,
+    MultiTreatmentSoloModel,
+    UpliftTreeClassifier,
+    UpliftRandomForestClassifier,
+    XLearner,
+    RLearner,
+    DRLearner,
+    NuisanceCache,
+    UpliftPipeline,
+    make_uplift_pipeline,
+    UpliftDistiller
 )
+from ..models.models import _downsample
+from ..metrics import make_uplift_scorer, qini_auc_score, qini_auc_score_by_stage
 
 
 @pytest.mark.parametrize(
@@ -105,5 +130,669 @@ def test_same_estimator_error():
 )
 def test_input_data(X, y, treatment):
     model = TwoModels(LinearRegression(), LinearRegression())
-    with pytest.warns(UserWarning):
-        model.fit(X, y, treatment)
\ No newline at end of file
+    with pytest.warns(UserWarning, match="matched by position"):
+        model.fit(X, y, treatment)
+
+
+@pytest.mark.parametrize("method", ['vanilla', 'ddr_control', 'ddr_treatment'])
+def test_twomodels_fit_split(method, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = TwoModels(LogisticRegression(), LogisticRegression(), method=method).fit(X, y, treat)
+
+    trmnt_mask, ctrl_mask = np.asarray(treat) == 1, np.asarray(treat) == 0
+    X_arr, y_arr = np.asarray(X), np.asarray(y)
+    model_split = TwoModels(LogisticRegression(), LogisticRegression(), method=method).fit_split(
+        X_arr[trmnt_mask], y_arr[trmnt_mask], X_arr[ctrl_mask], y_arr[ctrl_mask]
+    )
+    np.testing.assert_allclose(model.predict(X_arr), model_split.predict(X_arr))
+
+
+def test_twomodels_fit_sorted_by_treatment_uses_views():
+    X = np.arange(20, dtype=float).reshape(10, 2)
+    y = np.array([0, 1, 0, 1, 1, 0, 1, 0, 1, 1])
+    treat = np.array([0, 0, 0, 0, 0, 1, 1, 1, 1, 1])
+
+    fitted = []
+
+    class RecordingRegression(LinearRegression):
+        def fit(self, X, y, sample_weight=None):
+            fitted.append(X)
+            return super().fit(X, y, sample_weight)
+
+    TwoModels(RecordingRegression(), RecordingRegression()).fit(X, y, treat)
+    assert all(np.shares_memory(X, X_group) for X_group in fitted)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(LogisticRegression(), method='dummy', store_predictions=False),
+        SoloModel(LogisticRegression(), method='treatment_interaction', store_predictions=False),
+        TwoModels(LogisticRegression(), LogisticRegression(), method='vanilla', store_predictions=False),
+        TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_control', store_predictions=False),
+        TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_treatment', store_predictions=False),
+    ]
+)
+def test_predict_components_is_stateless(model, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    model.fit(X, y, treat)
+    uplift, trmnt_preds, ctrl_preds = model.predict_components(X)
+
+    np.testing.assert_allclose(uplift, trmnt_preds - ctrl_preds)
+    np.testing.assert_allclose(model.predict(X), uplift)
+    assert model.trmnt_preds_ is None and model.ctrl_preds_ is None
+
+    model.set_params(store_predictions=True).predict(X)
+    np.testing.assert_allclose(model.trmnt_preds_, trmnt_preds)
+    np.testing.assert_allclose(model.ctrl_preds_, ctrl_preds)
+
+
+@pytest.fixture
+def multi_treatment_dataset():
+    rng = np.random.RandomState(42)
+    X = rng.normal(size=(300, 3))
+    treat = rng.choice(['No E-Mail', 'Mens E-Mail', 'Womens E-Mail'], size=300)
+    y = (X[:, 0] + (treat == 'Mens E-Mail') + rng.normal(size=300) > 0.5).astype(int)
+    return X, y, treat
+
+
+@pytest.mark.parametrize("dataset_type", ['numpy', 'pandas'])
+@pytest.mark.parametrize(
+    "model",
+    [
+        MultiTreatmentTwoModels(LogisticRegression(), LogisticRegression(), control_value='No E-Mail', n_jobs=2),
+        MultiTreatmentSoloModel(LogisticRegression(), control_value='No E-Mail'),
+    ]
+)
+def test_multi_treatment_shape(model, dataset_type, multi_treatment_dataset):
+    X, y, treat = multi_treatment_dataset
+    if dataset_type == 'pandas':
+        X, y, treat = pd.DataFrame(X, columns=['a', 'b', 'c']), pd.Series(y), pd.Series(treat)
+
+    uplift, trmnt_preds, ctrl_preds = model.fit(X, y, treat).predict_components(X)
+    assert list(model.treatment_groups_) == ['Mens E-Mail', 'Womens E-Mail']
+    assert uplift.shape == trmnt_preds.shape == (300, 2)
+    assert ctrl_preds.shape == (300,)
+    np.testing.assert_allclose(model.predict(X), trmnt_preds - ctrl_preds.reshape(-1, 1))
+
+
+def test_multi_treatment_two_models_matches_binary(multi_treatment_dataset):
+    X, y, treat = multi_treatment_dataset
+    multi = MultiTreatmentTwoModels(LogisticRegression(), LogisticRegression(), control_value='No E-Mail')
+    uplift = multi.fit(X, y, treat).predict(X)
+
+    for pos, group in enumerate(multi.treatment_groups_):
+        mask = np.isin(treat, [group, 'No E-Mail'])
+        binary = TwoModels(LogisticRegression(), LogisticRegression())
+        binary.fit(X[mask], y[mask], (treat[mask] == group).astype(int))
+        np.testing.assert_allclose(uplift[:, pos], binary.predict(X))
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        MultiTreatmentTwoModels(LogisticRegression(), LogisticRegression(), control_value='control'),
+        MultiTreatmentSoloModel(LogisticRegression(), control_value='control'),
+    ]
+)
+def test_multi_treatment_control_value_error(model, multi_treatment_dataset):
+    X, y, treat = multi_treatment_dataset
+    with pytest.raises(ValueError):
+        model.fit(X, y, treat)
+
+
+def test_classtransformationreg_cross_fitted_propensity(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = ClassTransformationReg(LinearRegression(), propensity_estimator=LogisticRegression(),
+                                   propensity_cv=3, n_jobs=2)
+    model.fit(X, y, treat)
+
+    expected = cross_val_predict(LogisticRegression(), X, treat, cv=StratifiedKFold(3), method='predict_proba')[:, 1]
+    np.testing.assert_allclose(model.propensity_, expected)
+    assert len(model.propensity_estimators_) == 3
+    assert model.predict_propensity(X).shape == (y.shape[0],)
+
+
+def test_classtransformationreg_propensity_cache(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = ClassTransformationReg(LinearRegression(), propensity_estimator=LogisticRegression(), propensity_cv=3)
+    propensity_estimators = model.fit(X, y, treat).propensity_estimators_
+
+    model.set_params(estimator=Ridge()).fit(X, y, treat)
+    assert model.propensity_estimators_ is propensity_estimators
+
+    model.fit(X + 1, y, treat)
+    assert model.propensity_estimators_ is not propensity_estimators
+    propensity_estimators = model.propensity_estimators_
+
+    model.set_params(propensity_estimator=LogisticRegression(C=0.1)).fit(X + 1, y, treat)
+    assert model.propensity_estimators_ is not propensity_estimators
+
+
+def test_classtransformationreg_propensity_cache_after_constant(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    propensity_estimator = LogisticRegression()
+    model = ClassTransformationReg(LinearRegression(), propensity_estimator=propensity_estimator, propensity_cv=5)
+    cross_fitted = model.fit(X, y, treat).propensity_.copy()
+
+    model.set_params(propensity_estimator=None, propensity_val=0.5).fit(X, y, treat)
+    assert model.propensity_ == 0.5
+
+    model.set_params(propensity_estimator=propensity_estimator, propensity_val=None).fit(X, y, treat)
+    np.testing.assert_allclose(model.propensity_, cross_fitted)
+
+
+def check_compiled_predictions(model, X, y, treat):
+    X = np.asarray(X)
+    model.fit(X, y, treat)
+    expected = model.predict_components(X)
+    actual = model.compile().predict_components(X)
+
+    for actual_preds, expected_preds in zip(actual, expected):
+        np.testing.assert_allclose(actual_preds, expected_preds, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(LogisticRegression(), method='dummy'),
+        SoloModel(LogisticRegression(), method='treatment_interaction'),
+        TwoModels(LogisticRegression(), LogisticRegression(), method='vanilla'),
+        TwoModels(LogisticRegression(multi_class='multinomial'), LogisticRegression(), method='vanilla'),
+    ]
+)
+def test_compile_linear_classification(model, random_xyt_dataset_clf):
+    check_compiled_predictions(model, *random_xyt_dataset_clf)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(LinearRegression(), method='dummy'),
+        SoloModel(LinearRegression(), method='treatment_interaction'),
+        TwoModels(LinearRegression(), LinearRegression(), method='vanilla'),
+    ]
+)
+def test_compile_linear_regression(model, random_xy_dataset_regr):
+    check_compiled_predictions(model, *random_xy_dataset_regr)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(PoissonRegressor(), method='dummy'),
+        SoloModel(PoissonRegressor(), method='treatment_interaction'),
+        TwoModels(PoissonRegressor(), PoissonRegressor(), method='vanilla'),
+        TwoModels(TweedieRegressor(power=1.5), TweedieRegressor(power=1.5), method='vanilla'),
+        TwoModels(TweedieRegressor(power=0), Ridge(), method='vanilla'),
+    ]
+)
+def test_compile_glm(model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    rng = np.random.RandomState(0)
+    counts = rng.poisson(np.exp(0.3 * np.asarray(X)[:, 0] + 0.2 * np.asarray(treat))) + 0.1
+    check_compiled_predictions(model, X, counts, treat)
+
+
+@pytest.mark.parametrize("model", [
+    TwoModels(PoissonRegressor(), LinearRegression(), method='vanilla'),
+    SoloModel(KNeighborsRegressor()),
+])
+def test_compile_link_error(model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model.fit(np.asarray(X), np.asarray(y) + 1., treat)
+    with pytest.raises(ValueError):
+        model.compile()
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        TwoModels(DecisionTreeClassifier(max_depth=4, random_state=0),
+                  DecisionTreeClassifier(random_state=0)),
+        TwoModels(RandomForestClassifier(n_estimators=5, random_state=0),
+                  ExtraTreesClassifier(n_estimators=3, min_samples_leaf=5, random_state=0)),
+    ]
+)
+def test_compile_trees_classification(model, random_xyt_dataset_clf):
+    check_compiled_predictions(model, *random_xyt_dataset_clf)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        TwoModels(DecisionTreeRegressor(random_state=0), DecisionTreeRegressor(max_depth=3, random_state=0)),
+        TwoModels(RandomForestRegressor(n_estimators=5, random_state=0), DecisionTreeRegressor(random_state=0)),
+    ]
+)
+def test_compile_trees_regression(model, random_xy_dataset_regr):
+    check_compiled_predictions(model, *random_xy_dataset_regr)
+
+
+TREES_SUPPORT_MISSING = hasattr(DecisionTreeRegressor().fit([[0.], [1.]], [0., 1.]).tree_, 'missing_go_to_left')
+
+
+@pytest.mark.skipif(not TREES_SUPPORT_MISSING, reason="trees support missing values since scikit-learn 1.3")
+def test_compile_trees_missing_values(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    X = np.array(X, dtype=np.float64)
+    X[::7, 0] = np.nan
+    X[::5, 1] = np.nan
+    model = TwoModels(DecisionTreeClassifier(max_depth=4, random_state=0), DecisionTreeClassifier(random_state=0))
+    check_compiled_predictions(model, X, y, treat)
+
+
+@pytest.mark.skipif(TREES_SUPPORT_MISSING, reason="trees support missing values since scikit-learn 1.3")
+def test_compile_trees_missing_values_error(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    X = np.array(X, dtype=np.float64)
+    predictor = TwoModels(DecisionTreeClassifier(random_state=0), DecisionTreeClassifier(random_state=0)) \
+        .fit(X, y, treat).compile()
+    X[0, 0] = np.nan
+    with pytest.raises(ValueError, match='NaN'):
+        predictor.predict(X)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_control'),
+        SoloModel(DecisionTreeClassifier(), method='dummy'),
+    ]
+)
+def test_compile_error(model, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    model.fit(X, y, treat)
+    with pytest.raises(ValueError):
+        model.compile()
+
+
+@pytest.mark.parametrize(
+    "model, partial_model",
+    [
+        (SoloModel(MultinomialNB()), SoloModel(MultinomialNB())),
+        (SoloModel(MultinomialNB(), method='treatment_interaction'),
+         SoloModel(MultinomialNB(), method='treatment_interaction')),
+        (ClassTransformation(MultinomialNB()), ClassTransformation(MultinomialNB())),
+        (TwoModels(MultinomialNB(), MultinomialNB()), TwoModels(MultinomialNB(), MultinomialNB())),
+    ]
+)
+def test_partial_fit_matches_fit(model, partial_model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    X, y, treat = np.abs(np.asarray(X)), np.asarray(y), np.asarray(treat)
+    model, partial_model = clone(model), clone(partial_model)
+    model.fit(X, y, treat)
+
+    for start in range(0, X.shape[0], 30):
+        chunk = slice(start, start + 30)
+        partial_model.partial_fit(X[chunk], y[chunk], treat[chunk], classes=np.array([0, 1]))
+
+    np.testing.assert_allclose(partial_model.predict(X), model.predict(X))
+
+
+def test_classtransformation_partial_fit_classes(sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    X = np.abs(np.asarray(X))
+    model = ClassTransformation(MultinomialNB())
+    model.partial_fit(X, y, treat, estimator_partial_fit_params={'classes': [0, 1]})
+    model.partial_fit(X, y, treat, classes=[1, 0])
+    np.testing.assert_array_equal(model.estimator.classes_, [0, 1])
+
+    for params in ({'classes': [0, 1, 2]}, {'estimator_partial_fit_params': {'classes': [1, 2]}}):
+        with pytest.raises(ValueError):
+            model.partial_fit(X, y, treat, **params)
+
+
+def test_classtransformationreg_partial_fit(random_xy_dataset_regr):
+    X, y, treat = random_xy_dataset_regr
+    X, y, treat = np.asarray(X), np.asarray(y), np.asarray(treat)
+    model = ClassTransformationReg(SGDRegressor(random_state=0),
+                                   propensity_estimator=SGDClassifier(loss='log_loss', alpha=1., random_state=0))
+    for start in range(0, X.shape[0], 50):
+        chunk = slice(start, start + 50)
+        model.partial_fit(X[chunk], y[chunk], treat[chunk])
+    assert model.predict(X).shape == y.shape
+    assert model.predict_propensity(X).shape == y.shape
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(LogisticRegression()),
+        TwoModels(SGDClassifier(), SGDClassifier(), method='ddr_control'),
+    ]
+)
+def test_partial_fit_error(model, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    with pytest.raises((TypeError, ValueError)):
+        model.partial_fit(X, y, treat, classes=[0, 1])
+
+
+@pytest.fixture(scope="module")
+def heterogeneous_uplift_dataset():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(4000, 4))
+    treat = rng.randint(0, 2, 4000)
+    y = (rng.rand(4000) < 0.3 + 0.3 * treat * (X[:, 0] > 0)).astype(int)
+    return X, y, treat
+
+
+@pytest.mark.parametrize("criterion", ['KL', 'ED', 'Chi', 'DDP'])
+def test_uplift_tree(criterion, heterogeneous_uplift_dataset):
+    X, y, treat = heterogeneous_uplift_dataset
+    tree = UpliftTreeClassifier(criterion=criterion, max_depth=3, min_samples_leaf=50, random_state=0)
+    uplift, trmnt_preds, ctrl_preds = tree.fit(X, y, treat).predict_components(X)
+
+    assert uplift.shape == (X.shape[0],)
+    assert tree.feature_[0] == 0
+    assert np.all((trmnt_preds >= 0) & (trmnt_preds <= 1) & (ctrl_preds >= 0) & (ctrl_preds <= 1))
+    assert np.mean(uplift[X[:, 0] > 0.5]) > np.mean(uplift[X[:, 0] < -0.5])
+
+
+def test_uplift_random_forest(heterogeneous_uplift_dataset):
+    X, y, treat = heterogeneous_uplift_dataset
+    forest = UpliftRandomForestClassifier(n_estimators=4, max_depth=3, min_samples_leaf=50, n_jobs=2,
+                                          random_state=0)
+    uplift = forest.fit(X, y, treat).predict(X)
+    assert len(forest.estimators_) == 4
+    assert qini_auc_score(y, uplift, treat) > 0.05
+
+    forest_same_seed = UpliftRandomForestClassifier(n_estimators=4, max_depth=3, min_samples_leaf=50, random_state=0)
+    np.testing.assert_allclose(forest_same_seed.fit(X, y, treat).predict(X), uplift)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        UpliftTreeClassifier(criterion='criterion'),
+        UpliftTreeClassifier(max_bins=1),
+        UpliftRandomForestClassifier(max_features='max_features'),
+    ]
+)
+def test_uplift_tree_params_error(model, heterogeneous_uplift_dataset):
+    X, y, treat = heterogeneous_uplift_dataset
+    with pytest.raises(ValueError):
+        model.fit(X, y, treat)
+
+
+def test_uplift_tree_sample_weight(heterogeneous_uplift_dataset):
+    X, y, treat = heterogeneous_uplift_dataset
+    # few distinct values, so that the bins do not depend on the repeated rows
+    X = np.round(X * 4)
+    weights = np.random.RandomState(0).randint(1, 4, X.shape[0])
+    tree = UpliftTreeClassifier(max_depth=3, min_samples_leaf=50, random_state=0)
+    repeated = np.repeat(np.arange(X.shape[0]), weights)
+    tree_repeated = clone(tree).fit(X[repeated], y[repeated], treat[repeated])
+    np.testing.assert_allclose(tree.fit(X, y, treat, sample_weight=weights).predict(X), tree_repeated.predict(X))
+
+    for sample_weight in (weights[:-1], -weights):
+        with pytest.raises(ValueError):
+            tree.fit(X, y, treat, sample_weight=sample_weight)
+
+
+def test_uplift_tree_with_uplift_scorer(heterogeneous_uplift_dataset):
+    X, y, treat = heterogeneous_uplift_dataset
+    X, y, treat = pd.DataFrame(X), pd.Series(y), pd.Series(treat)
+    scores = cross_validate(UpliftTreeClassifier(max_depth=2, min_samples_leaf=50), X, y,
+                            fit_params={'treatment': treat}, scoring=make_uplift_scorer('qini_auc_score', treat), cv=3)
+    assert scores['test_score'].shape == (3,)
+
+
+@pytest.fixture(scope="module")
+def known_effect_dataset():
+    rng = np.random.RandomState(0)
+    X = rng.normal(size=(2000, 3))
+    treat = (rng.rand(2000) < 1 / (1 + np.exp(-(1.5 + X[:, 2])))).astype(int)
+    y = X[:, 0] + treat * (1 + X[:, 1]) + 0.5 * rng.normal(size=2000)
+    return X, y, treat
+
+
+@pytest.mark.parametrize("learner", [XLearner, RLearner, DRLearner])
+def test_meta_learners(learner, known_effect_dataset):
+    X, y, treat = known_effect_dataset
+    model = learner(LinearRegression(), LinearRegression(), LogisticRegression(), cv=3, n_jobs=2, random_state=0)
+    uplift = model.fit(X, y, treat).predict(X)
+    assert uplift.shape == y.shape
+    assert np.corrcoef(uplift, 1 + X[:, 1])[0, 1] > 0.95
+
+
+def test_meta_learners_share_nuisance_cache(known_effect_dataset):
+    X, y, treat = known_effect_dataset
+    cache = NuisanceCache()
+    x_learner = XLearner(LinearRegression(), LinearRegression(), LogisticRegression(), cv=3, cache=cache)
+    x_learner.fit(X, y, treat)
+    assert len(cache) == 3
+
+    dr_learner = clone(DRLearner(LinearRegression(), Ridge(), LogisticRegression(), cv=3, cache=cache))
+    dr_learner.fit(X, y, treat)
+    assert len(cache) == 3
+    for name in ('outcome_trmnt', 'outcome_ctrl', 'propensity'):
+        assert dr_learner.nuisances_[name] is x_learner.nuisances_[name]
+
+    RLearner(LinearRegression(), LinearRegression(), LogisticRegression(), cv=3, cache=cache).fit(X, y, treat)
+    assert len(cache) == 4
+
+    x_learner.fit(X + 1, y, treat)
+    assert len(cache) == 7
+
+
+def test_meta_learner_propensity_error(known_effect_dataset):
+    X, y, treat = known_effect_dataset
+    with pytest.raises(ValueError):
+        DRLearner(LinearRegression(), LinearRegression()).fit(X, y, treat)
+
+
+@pytest.mark.parametrize("method", ['dummy', 'treatment_interaction'])
+@pytest.mark.parametrize("dataset_type", ['numpy', 'pandas'])
+def test_solomodel_counterfactual_matrix(method, dataset_type, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    if dataset_type == 'numpy':
+        X, y, treat = X.values, y.values, treat.values
+    model = SoloModel(LogisticRegression(), method=method).fit(X, y, treat)
+
+    X_mod = model._add_counterfactual_treatment(X)
+    n = X.shape[0]
+    np.testing.assert_allclose(np.asarray(X_mod)[:n], np.asarray(model._add_treatment(X, np.ones(n))))
+    np.testing.assert_allclose(np.asarray(X_mod)[n:], np.asarray(model._add_treatment(X, np.zeros(n))))
+
+
+class CountingScaler(StandardScaler):
+    n_fits = 0
+
+    def fit(self, X, y=None, sample_weight=None):
+        CountingScaler.n_fits += 1
+        return super().fit(X, y, sample_weight)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(LogisticRegression(), method='treatment_interaction'),
+        TwoModels(LogisticRegression(), LogisticRegression()),
+        ClassTransformation(LogisticRegression()),
+    ]
+)
+def test_uplift_pipeline_matches_manual_transform(model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    X = np.asarray(X)
+    pipeline = make_uplift_pipeline(StandardScaler(), 'passthrough', clone(model)).fit(X, y, treat)
+
+    X_scaled = StandardScaler().fit_transform(X)
+    expected = clone(model).fit(X_scaled, y, treat).predict(X_scaled)
+    np.testing.assert_allclose(pipeline.predict(X), expected)
+
+
+def test_uplift_pipeline_fit_params_and_components(sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    pipeline = UpliftPipeline([('scaler', StandardScaler()), ('sm', SoloModel(LogisticRegression()))])
+    pipeline.set_params(sm__estimator__C=0.5).fit(X.values, y, treat, sm__estimator_fit_params={})
+
+    uplift, trmnt_preds, ctrl_preds = pipeline.predict_components(X.values)
+    np.testing.assert_allclose(uplift, trmnt_preds - ctrl_preds)
+    assert pipeline.named_steps['sm'].estimator.C == 0.5
+
+    with pytest.raises(ValueError):
+        pipeline.fit(X.values, y, treat, estimator_fit_params={})
+
+
+def test_uplift_pipeline_slicing_and_verbose(capsys, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    pipeline = make_uplift_pipeline(StandardScaler(), SoloModel(LogisticRegression()), verbose=True)
+
+    head = pipeline[:1]
+    assert isinstance(head, UpliftPipeline)
+    assert head.verbose and [name for name, _ in head.steps] == ['standardscaler']
+    assert clone(pipeline).get_params()['verbose']
+
+    pipeline.fit(X, y, treat)
+    out = capsys.readouterr().out
+    assert '(step 1 of 2) Processing standardscaler' in out and '(step 2 of 2) Processing solomodel' in out
+
+
+@pytest.mark.parametrize("method", ['fit_transform', 'fit_predict', 'predict_proba', 'score', 'transform'])
+def test_uplift_pipeline_methods_without_treatment(method, sensitive_classification_dataset):
+    X, y, treat = sensitive_classification_dataset
+    pipeline = make_uplift_pipeline(StandardScaler(), SoloModel(LogisticRegression())).fit(X, y, treat)
+
+    assert not hasattr(pipeline, method)
+    with pytest.raises(AttributeError, match='needs the treatment'):
+        getattr(pipeline, method)(X, y)
+
+
+def test_uplift_pipeline_memory(tmp_path, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    X = np.asarray(X)
+    CountingScaler.n_fits = 0
+    pipeline = UpliftPipeline([('scaler', CountingScaler()), ('tm', TwoModels(LogisticRegression(),
+                                                                              LogisticRegression()))],
+                              memory=str(tmp_path))
+    first = pipeline.fit(X, y, treat).predict(X)
+    second = pipeline.set_params(tm__estimator_trmnt__C=0.1).fit(X, y, treat).predict(X)
+
+    assert CountingScaler.n_fits == 1
+    assert not np.allclose(first, second)
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        SoloModel(GradientBoostingClassifier(n_estimators=5, random_state=0), method='dummy'),
+        SoloModel(GradientBoostingClassifier(n_estimators=5, random_state=0), method='treatment_interaction'),
+        TwoModels(GradientBoostingClassifier(n_estimators=5, random_state=0),
+                  GradientBoostingClassifier(n_estimators=3, random_state=0)),
+    ]
+)
+def test_staged_predict(model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = clone(model).fit(X, y, treat)
+    staged = list(model.staged_predict(X))
+
+    assert len(staged) == 5
+    np.testing.assert_allclose(staged[-1], model.predict(X))
+
+    scores = qini_auc_score_by_stage(y, model.staged_predict(X), treat)
+    np.testing.assert_allclose(scores[-1], qini_auc_score(y, model.predict(X), treat))
+
+
+def test_staged_predict_regression(random_xy_dataset_regr):
+    X, y, treat = random_xy_dataset_regr
+    model = TwoModels(GradientBoostingRegressor(n_estimators=5, random_state=0),
+                      GradientBoostingRegressor(n_estimators=5, random_state=0)).fit(X, y, treat)
+    staged = list(model.staged_predict(X))
+
+    assert len(staged) == 5
+    np.testing.assert_allclose(staged[-1], model.predict(X))
+
+
+def test_staged_predict_errors(random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = TwoModels(GradientBoostingClassifier(n_estimators=2), GradientBoostingClassifier(n_estimators=2),
+                      method='ddr_control').fit(X, y, treat)
+    with pytest.raises(ValueError):
+        next(model.staged_predict(X))
+
+    model = SoloModel(LogisticRegression()).fit(X, y, treat)
+    with pytest.raises(TypeError):
+        next(model.staged_predict(X))
+
+
+@pytest.mark.parametrize("downsample_by", ['treatment', 'target'])
+def test_downsample_weights(downsample_by):
+    rng = np.random.RandomState(0)
+    treat = rng.binomial(1, 0.9, 10000)
+    y = rng.binomial(1, 0.1, 10000)
+    idx, weights = _downsample(y, treat, 2., downsample_by, 0)
+
+    assert np.all(np.diff(idx) > 0)
+    for group in ([treat == 1, treat == 0] if downsample_by == 'treatment' else
+                  [(treat == t) & (y == k) for t in (0, 1) for k in (0, 1)]):
+        # weighted size of every group is kept
+        assert weights[group[idx]].sum() == pytest.approx(group.sum())
+    if downsample_by == 'treatment':
+        assert (treat[idx] == 1).sum() == 2 * (treat == 0).sum()
+    else:
+        assert np.all((y[idx] == 1) | (weights > 1))
+
+
+@pytest.mark.parametrize(
+    "model",
+    [
+        TwoModels(LogisticRegression(), LogisticRegression(), downsample_ratio=1., random_state=0),
+        TwoModels(LogisticRegression(), LogisticRegression(), method='ddr_control', downsample_ratio=1.,
+                  downsample_by='target', random_state=0),
+        ClassTransformation(LogisticRegression(), downsample_ratio=1., random_state=0),
+        ClassTransformation(LogisticRegression(), downsample_ratio=2., downsample_by='target', random_state=0),
+    ]
+)
+def test_downsample_fit(model, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    model = clone(model).fit(X, y, treat)
+    assert model.predict(X).shape == (X.shape[0],)
+
+
+def test_downsample_sample_weight():
+    X = np.arange(20, dtype=float).reshape(10, 2)
+    y = np.array([0, 1, 0, 1, 1, 0, 1, 0, 1, 1])
+    treat = np.array([1, 1, 1, 1, 1, 1, 1, 0, 0, 0])
+    user_weights = np.arange(1., 8.)
+
+    fitted = []
+
+    class RecordingRegression(LinearRegression):
+        def fit(self, X, y, sample_weight=None):
+            fitted.append((X, sample_weight))
+            return super().fit(X, y, sample_weight)
+
+    TwoModels(RecordingRegression(), RecordingRegression(), downsample_ratio=1., random_state=0).fit(
+        X, y, treat, estimator_trmnt_fit_params={'sample_weight': user_weights})
+    (X_ctrl, weights_ctrl), (X_trmnt, weights_trmnt) = fitted
+
+    assert X_trmnt.shape[0] == 3
+    # rows of X are (2i, 2i + 1), the user weight of i-th treatment row is i + 1
+    np.testing.assert_allclose(weights_trmnt, (X_trmnt[:, 0] / 2 + 1) * 7 / 3)
+    np.testing.assert_allclose(weights_ctrl, np.ones(3))
+
+
+@pytest.mark.parametrize("params", [{'downsample_ratio': 0}, {'downsample_ratio': 1., 'downsample_by': 'arm'}])
+def test_downsample_params_error(params, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    with pytest.raises(ValueError):
+        TwoModels(LogisticRegression(), LogisticRegression(), **params).fit(X, y, treat)
+
+
+@pytest.mark.parametrize("student", [DecisionTreeRegressor(max_depth=3), LinearRegression()])
+def test_uplift_distiller(student, random_xyt_dataset_clf):
+    X, y, treat = random_xyt_dataset_clf
+    teacher = TwoModels(RandomForestClassifier(n_estimators=10, random_state=0),
+                        RandomForestClassifier(n_estimators=10, random_state=0)).fit(X, y, treat)
+    distiller = UpliftDistiller(teacher, clone(student)).fit(X)
+    # the fitted teacher is not modified
+    assert teacher.trmnt_preds_ is None and teacher.ctrl_preds_ is None
+
+    np.testing.assert_allclose(distiller.predict(X), distiller.student.predict(X))
+    report = distiller.report(X, y, treat, n_repeats=3)
+    assert report['qini_gap'] == pytest.approx(report['teacher_qini'] - report['student_qini'])
+    assert teacher.trmnt_preds_ is None and teacher.ctrl_preds_ is None
+    assert report['teacher_qini'] == pytest.approx(qini_auc_score(y, teacher.predict(X), treat))
+    assert report['teacher_latency'] > 0 and report['student_latency'] > 0
+    assert -1 <= report['uplift_correlation'] <= 1